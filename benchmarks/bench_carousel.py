@@ -0,0 +1,85 @@
+# benchmarks/bench_carousel.py
+"""
+Times showing carousel slides with and without the shared carousel cache.
+
+    python -m benchmarks.bench_carousel --rows 2000 20000 --viewers 20
+
+"per rerun" repeats what every rerun used to do for one slide: split the
+filtered rows by terminal and ship no., then render and count the current
+slide. "build" builds every slide once per snapshot version, and "lookup"
+is what each rerun of each viewer costs after that.
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_workbook import COLUMNS, generate_rows
+from dashboard_app.carousel import CarouselCache, key_metrics
+from dashboard_app.table_renderer import TableRenderer
+from data_processing import cleaning, diffing, parsing
+from data_processing.indexing import SnapshotIndex, page_offsets
+
+ROWS_PER_PAGE = 7
+
+
+def _snapshot(row_count):
+    raw = pd.DataFrame(list(generate_rows(row_count)), columns=COLUMNS)[parsing.REQUIRED_COLUMNS]
+    df = cleaning.normalize_shipments(cleaning.clean_data(parsing.apply_column_dtypes(raw)))
+    df.index = diffing.row_keys(df)
+    df = cleaning.compact_snapshot(df)
+    return df, SnapshotIndex(df)
+
+
+def _per_rerun(df, index, positions, renderer, slide_number):
+    items = []
+    for _, terminal_positions in index.split_by_terminal(positions):
+        pages = page_offsets(len(terminal_positions), ROWS_PER_PAGE)
+        items.extend((terminal_positions, rows) for rows in pages)
+    for _, ship_positions in index.split_by_ship_no(positions):
+        items.append((ship_positions, (0, len(ship_positions))))
+    item_positions, (start_row, end_row) = items[slide_number % len(items)]
+    renderer.render(df.iloc[item_positions[start_row:end_row]], 1)
+    key_metrics(df.iloc[item_positions])
+    return len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[2000, 20_000])
+    parser.add_argument('--viewers', type=int, default=20)
+    parser.add_argument('--reruns', type=int, default=50, help='slides shown per viewer')
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'slides':>7} {'per rerun':>11} {'build':>9} {'lookup':>10} "
+          f"{f'{args.viewers} viewers, before':>24} {f'{args.viewers} viewers, cached':>24}")
+    for row_count in args.rows:
+        df, index = _snapshot(row_count)
+        positions = index.filter(index.min_date, index.max_date)
+        renderer = TableRenderer()
+        renderer.render(df, 1)  # row fragments are cached in both cases
+
+        started = time.perf_counter()
+        for slide_number in range(args.reruns):
+            slide_count = _per_rerun(df, index, positions, renderer, slide_number)
+        per_rerun = (time.perf_counter() - started) / args.reruns
+
+        cache = CarouselCache()
+        key = (1, index.min_date, index.max_date, None, None, ROWS_PER_PAGE)
+        started = time.perf_counter()
+        cache.get(key, df, index, positions, 1, ROWS_PER_PAGE)
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for slide_number in range(args.reruns):
+            slides = cache.get(key, df, index, positions, 1, ROWS_PER_PAGE)
+            slides[slide_number % len(slides)]
+        lookup = (time.perf_counter() - started) / args.reruns
+
+        shows = args.viewers * args.reruns
+        print(f"{row_count:>8} {slide_count:>7} {per_rerun * 1e3:>8.2f} ms {build:>7.2f} s {lookup * 1e6:>7.1f} us "
+              f"{shows * per_rerun:>22.2f} s {build + shows * lookup:>22.2f} s")
+
+
+if __name__ == '__main__':
+    main()
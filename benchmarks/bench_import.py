@@ -0,0 +1,56 @@
+# benchmarks/bench_import.py
+"""
+Measures the cold-start import time of the data pipeline, each module in a fresh interpreter.
+
+    python -m benchmarks.bench_import --repeat 5
+
+The headless pipeline (config, onedrive_api, data_processing and its
+command line) must not import Streamlit; the last column shows whether it
+did. The dashboard is listed for comparison.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    'config',
+    'onedrive_api.files',
+    'data_processing.parsing',
+    'data_processing.snapshot',
+    'data_processing.__main__',
+    'dashboard_app.streamlit_app',
+]
+
+_PROBE = "import sys, {module}; print('streamlit' in sys.modules)"
+
+
+def _import_time(module):
+    """Returns (cumulative import time in seconds, whether streamlit was imported)."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE.format(module=module)],
+        capture_output=True, text=True, check=True,
+    )
+    # The last importtime line is the module itself: "import time: self | cumulative | name"
+    lines = [line for line in result.stderr.splitlines() if line.startswith('import time:')]
+    cumulative_us = int(lines[-1].split('|')[1])
+    return cumulative_us / 1e6, result.stdout.strip() == 'True'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    args = parser.parse_args()
+
+    print(f"{'module':<30} {'median':>9} {'min':>9}  streamlit")
+    for module in args.modules:
+        runs = [_import_time(module) for _ in range(args.repeat)]
+        seconds = [elapsed for elapsed, _ in runs]
+        imported_streamlit = any(streamlit for _, streamlit in runs)
+        print(f"{module:<30} {statistics.median(seconds):>7.3f} s {min(seconds):>7.3f} s  "
+              f"{'yes' if imported_streamlit else 'no'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# benchmarks/bench_memory.py
+"""
+Reports the memory of one snapshot before and after compaction, and sizes a server for many viewers.
+
+    python -m benchmarks.bench_memory --rows 2000 20000 100000 --viewers 50
+
+"copies" is the old model, where every session kept its own
+copy of the frame and every rerun copied it again before filtering. With
+the shared snapshot each session only holds the row positions it shows.
+"""
+import argparse
+
+import pandas as pd
+
+from benchmarks.synthetic_workbook import COLUMNS, generate_rows
+from data_processing import cleaning, diffing, parsing
+from data_processing.indexing import SnapshotIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[2000, 20_000, 100_000])
+    parser.add_argument('--viewers', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'before':>10} {'after':>10} {'index':>8} "
+          f"{f'{args.viewers} viewers, copies':>24} {f'{args.viewers} viewers, shared':>24}")
+    for row_count in args.rows:
+        raw = pd.DataFrame(list(generate_rows(row_count)), columns=COLUMNS)[parsing.REQUIRED_COLUMNS]
+        df = cleaning.normalize_shipments(cleaning.clean_data(parsing.apply_column_dtypes(raw)))
+        df.index = diffing.row_keys(df)
+        before = cleaning.frame_memory_bytes(df)
+
+        compact = cleaning.compact_snapshot(df)
+        after = cleaning.frame_memory_bytes(compact)
+        index_bytes = SnapshotIndex(compact).nbytes
+
+        # Old: a copy in session state plus a copy per rerun for filtering
+        copies = args.viewers * 2 * before
+        # Shared: one snapshot and index, plus filtered positions and the row keys on screen per session
+        shared = after + index_bytes + args.viewers * row_count * (8 + 8)
+        print(f"{row_count:>8} {before / 1e6:>8.1f}MB {after / 1e6:>8.1f}MB {index_bytes / 1e6:>6.1f}MB "
+              f"{copies / 1e6:>22.1f}MB {shared / 1e6:>22.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
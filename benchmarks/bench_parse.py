@@ -0,0 +1,60 @@
+# benchmarks/bench_parse.py
+"""
+Compares the workbook parse paths on a synthetic shipping-board workbook.
+
+    python -m benchmarks.bench_parse --rows 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_workbook import write_workbook
+from data_processing import parsing
+
+SHEET_NAME = 'Databaseshippingboard'
+
+
+def _time(label, func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<40} {best:8.3f} s  ({len(result)} rows, {len(result.columns)} columns)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'synthetic.xlsx')
+        started = time.perf_counter()
+        write_workbook(path, args.rows, sheet_name=SHEET_NAME)
+        print(f"Generated {args.rows} rows ({os.path.getsize(path) / 1e6:.1f} MB) in {time.perf_counter() - started:.1f} s")
+
+        _time("read_excel, whole sheet (old path)",
+              lambda: pd.read_excel(path, sheet_name=SHEET_NAME, engine='openpyxl'), args.repeat)
+        for engine in parsing.PARSE_ENGINES:
+            try:
+                _time(f"parse_workbook engine={engine}",
+                      lambda: parsing.parse_workbook(path, sheet_name=SHEET_NAME, engine=engine), args.repeat)
+            except ImportError as e:
+                print(f"parse_workbook engine={engine:<23} skipped ({e})")
+
+        df = parsing.parse_workbook(path, sheet_name=SHEET_NAME)
+        parquet_path = os.path.join(directory, 'snapshot.parquet')
+        df.to_parquet(parquet_path, engine='pyarrow', index=False)
+        _time("read_parquet (cached version)",
+              lambda: pd.read_parquet(parquet_path, engine='pyarrow'), max(args.repeat, 3))
+
+
+if __name__ == '__main__':
+    main()
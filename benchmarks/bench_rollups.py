@@ -0,0 +1,81 @@
+# benchmarks/bench_rollups.py
+"""
+Times route KPIs recomputed from every row against the incrementally updated rollups.
+
+    python -m benchmarks.bench_rollups --rows 20000 200000 --changes 50
+
+"recompute" is what a refresh costs when the KPIs are grouped from all
+rows of the history. "update" applies one snapshot version with `--changes`
+edited rows to the rollup store. "week query" answers the route KPIs of
+the last seven days from the rollups, which is what a dashboard rerun pays
+whatever the length of the history; "all query" groups the whole history.
+"""
+import argparse
+import datetime
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_workbook import COLUMNS, generate_rows
+from data_processing import parsing, rollups
+from data_processing.snapshot import SnapshotStore, prepare_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[20_000, 200_000])
+    parser.add_argument('--changes', type=int, default=50, help='rows edited per snapshot version')
+    parser.add_argument('--versions', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'days':>5} {'groups':>7} {'first load':>11} {'recompute':>11} {'update':>10} "
+          f"{'week query':>11} {'all query':>10}")
+    for row_count in args.rows:
+        raw = pd.DataFrame(list(generate_rows(row_count)), columns=COLUMNS)[parsing.REQUIRED_COLUMNS]
+        raw = parsing.apply_column_dtypes(raw)
+        state = {'raw': raw}
+        store = SnapshotStore(fetch=lambda known: (prepare_frame(state['raw'].copy()), None))
+
+        with tempfile.TemporaryDirectory() as directory:
+            history = rollups.RollupStore(directory)
+            snapshot = store.refresh()
+            started = time.perf_counter()
+            history.apply(snapshot)
+            first_load = time.perf_counter() - started
+
+            last_day = snapshot.index.max_date
+            week = {'start_date': last_day - datetime.timedelta(days=6), 'end_date': last_day, 'by': ('route',)}
+            recompute = update = week_query = all_query = 0.0
+            for version in range(args.versions):
+                edited = state['raw'].copy()
+                rows = edited.index[version * args.changes:(version + 1) * args.changes]
+                edited.loc[rows, 'Status Loading'] = 'Delay' if version % 2 == 0 else 'Finished'
+                state['raw'] = edited
+                snapshot = store.refresh()
+
+                started = time.perf_counter()
+                rollups.kpi_frame(rollups.aggregate(rollups.row_facts(snapshot.data))
+                                  .groupby('Truck Route')[rollups.MEASURE_COLUMNS].sum())
+                recompute += time.perf_counter() - started
+
+                started = time.perf_counter()
+                history.apply(snapshot)
+                update += time.perf_counter() - started
+
+                started = time.perf_counter()
+                history.kpis(**week)
+                week_query += time.perf_counter() - started
+
+                started = time.perf_counter()
+                history.kpis(by=('route',))
+                all_query += time.perf_counter() - started
+
+            gauges = history.gauges()
+            print(f"{row_count:>8} {gauges['history_days']:>5} {gauges['history_groups']:>7} {first_load:>9.2f} s "
+                  f"{recompute / args.versions * 1e3:>8.1f} ms {update / args.versions * 1e3:>7.1f} ms "
+                  f"{week_query / args.versions * 1e3:>8.1f} ms {all_query / args.versions * 1e3:>7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_throttling.py
+"""
+Runs the snapshot poller against a fake Graph server that throttles on demand.
+
+    python -m benchmarks.bench_throttling --rows 2000
+
+It checks that the poller waits as long as Retry-After asks, keeps serving
+the last good snapshot (marked stale) while throttled, picks up the next
+change afterwards, and shortens its interval while the file keeps changing.
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.fake_graph import FakeGraphServer
+from benchmarks.synthetic_workbook import write_workbook
+from config import settings
+
+SHEET_NAME = 'Databaseshippingboard'
+
+
+def _workbook_bytes(rows, seed):
+    buffer = io.BytesIO()
+    write_workbook(buffer, rows, sheet_name=SHEET_NAME, seed=seed)
+    return buffer.getvalue()
+
+
+def _wait_until(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _check(label, ok):
+    print(f"{'ok ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--retry-after', type=int, default=2)
+    parser.add_argument('--throttled-requests', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir, FakeGraphServer(_workbook_bytes(args.rows, seed=1)) as graph:
+        graph.configure(settings, EXCEL_SHEET_NAME=SHEET_NAME, SNAPSHOT_CACHE_DIR=os.path.join(cache_dir, 'cache'))
+
+        # Imported after configuring so the Graph client is built for the fake server
+        from data_processing.poller import SnapshotPoller
+        from data_processing.snapshot import SnapshotStore
+
+        store = SnapshotStore()
+        poller = SnapshotPoller(store, interval_seconds=0.4, min_interval_seconds=0.1, max_interval_seconds=1.0)
+        results = []
+
+        poller.poll_once()
+        first = store.current()
+        results.append(_check(f"initial load: version {first.version}, {len(first.data)} rows", first is not None))
+
+        # Throttle: the poller must keep the snapshot and wait for Retry-After between attempts
+        graph.throttle(args.throttled_requests, retry_after=args.retry_after)
+        poller.start()
+        started = time.monotonic()
+        results.append(_check(
+            "stale while throttled",
+            _wait_until(lambda: store.is_stale, timeout=5) and store.current() is first,
+        ))
+        results.append(_check(
+            "recovered after throttling",
+            _wait_until(lambda: not store.is_stale and poller.consecutive_failures == 0,
+                        timeout=args.retry_after * args.throttled_requests * 2 + 5),
+        ))
+        throttled = [(at, status) for at, route, status in graph.request_log if at >= started and route == 'metadata']
+        gaps = [later[0] - earlier[0] for earlier, later in zip(throttled, throttled[1:]) if earlier[1] == 429]
+        results.append(_check(
+            f"Retry-After honoured: gaps after 429 {', '.join(f'{gap:.2f}' for gap in gaps)} s "
+            f"(asked {args.retry_after} s)",
+            bool(gaps) and min(gaps) >= args.retry_after,
+        ))
+
+        # Changes: the poller publishes each one and polls faster while they keep coming
+        slow_interval = poller.interval.seconds
+        for seed in (2, 3, 4):
+            previous = poller.published_version
+            graph.set_workbook(_workbook_bytes(args.rows, seed=seed))
+            poller.request_refresh()
+            _wait_until(lambda: poller.published_version != previous, timeout=10)
+        results.append(_check(
+            f"new versions published: now version {poller.published_version}",
+            poller.published_version == first.version + 3,
+        ))
+        results.append(_check(
+            f"interval adapts: {slow_interval:.2f} s -> {poller.interval.seconds:.2f} s",
+            poller.interval.seconds < slow_interval,
+        ))
+        poller.stop()
+
+        print(f"Graph requests: {dict(graph.requests)}")
+        print(f"Store: {store.stats()}")
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_workbook_api.py
+"""
+Compares the binary download with Graph workbook API range reads on a fake Graph server.
+
+    python -m benchmarks.bench_workbook_api --rows 100000 --archive-rows 100000 --mbps 50
+
+Each path reads the board sheet into the dashboard frame. The workbook API
+paths are checked to return the same frame as the download path. After
+that, rows are appended to the sheet and the paths are timed again,
+including the read that only asks for the appended rows.
+"""
+import argparse
+import io
+import time
+
+import pandas as pd
+
+from benchmarks.fake_graph import FakeGraphServer
+from benchmarks.synthetic_workbook import write_workbook
+from config import settings
+
+SHEET_NAME = 'Databaseshippingboard'
+
+
+def _workbook_bytes(rows, archive_rows):
+    buffer = io.BytesIO()
+    write_workbook(buffer, rows, sheet_name=SHEET_NAME, archive_rows=archive_rows)
+    return buffer.getvalue()
+
+
+def _measure(label, graph, func):
+    bytes_before = sum(graph.bytes_sent.values())
+    requests_before = sum(graph.requests.values())
+    started = time.perf_counter()
+    df = func()
+    elapsed = time.perf_counter() - started
+    sent = sum(graph.bytes_sent.values()) - bytes_before
+    requests = sum(graph.requests.values()) - requests_before
+    print(f"{label:<34} {elapsed:8.2f} s {sent / 1e6:9.1f} MB {requests:5d} requests  {len(df)} rows")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--archive-rows', type=int, default=100_000)
+    parser.add_argument('--appended-rows', type=int, default=200)
+    parser.add_argument('--mbps', type=float, default=None, help='bandwidth limit in MB/s (default: none)')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every Graph request')
+    args = parser.parse_args()
+
+    bytes_per_second = args.mbps * 1e6 if args.mbps else None
+    content = _workbook_bytes(args.rows, args.archive_rows)
+    print(f"Workbook: {args.rows} board rows, {args.archive_rows} archive rows, {len(content) / 1e6:.1f} MB")
+
+    with FakeGraphServer(content, latency_seconds=args.latency, bytes_per_second=bytes_per_second) as graph:
+        graph.configure(settings, EXCEL_SHEET_NAME=SHEET_NAME)
+
+        from data_processing import parsing
+        from onedrive_api import files
+        from onedrive_api.workbook import WorkbookRangeReader
+
+        reader = WorkbookRangeReader(sheet_name=SHEET_NAME)
+
+        def download():
+            stream, _ = files.get_onedrive_file_content_if_changed()
+            with stream:
+                return parsing.parse_workbook(stream, sheet_name=SHEET_NAME)
+
+        def workbook_read(appended_only=False):
+            version = files.get_onedrive_file_metadata()
+            header, rows = reader.read(version, parsing.REQUIRED_COLUMNS, appended_only=appended_only)
+            return parsing.frame_from_values(header, rows)
+
+        files.get_onedrive_file_metadata()  # acquire the token outside the timings
+        graph.sheets()  # the fake server decodes the workbook once, outside the timings
+
+        print(f"{'':<34} {'time':>10} {'sent':>12} {'':>14}")
+        downloaded = _measure("download + parse", graph, download)
+        from_api = _measure("workbook API, used range", graph, workbook_read)
+        pd.testing.assert_frame_equal(from_api, downloaded)
+
+        graph.set_workbook(_workbook_bytes(args.rows + args.appended_rows, args.archive_rows))
+        graph.sheets()
+        print(f"After appending {args.appended_rows} rows:")
+        downloaded = _measure("download + parse", graph, download)
+        appended = _measure("workbook API, appended rows only", graph, lambda: workbook_read(appended_only=True))
+        from_api = _measure("workbook API, used range", graph, workbook_read)
+        pd.testing.assert_frame_equal(from_api, downloaded)
+        pd.testing.assert_frame_equal(appended, downloaded)
+        print(f"Frames match. Workbook sessions opened: {reader.session.sessions_created}")
+
+
+if __name__ == '__main__':
+    main()
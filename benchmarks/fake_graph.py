@@ -0,0 +1,442 @@
+# benchmarks/fake_graph.py
+"""
+A local stand-in for the Azure AD token endpoint and the Graph driveItem endpoints.
+
+It serves one workbook over HTTPS (MSAL only accepts https authorities) with
+a throwaway certificate authority, and can add latency, limit bandwidth and
+answer with 429/503 throttling responses on demand.
+"""
+import collections
+import datetime
+import io
+import ipaddress
+import json
+import os
+import re
+import ssl
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _write_certificates(directory):
+    """Creates a CA and a server certificate for 127.0.0.1; returns (ca_path, cert_path, key_path)."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    valid_from, valid_to = now - datetime.timedelta(days=1), now + datetime.timedelta(days=7)
+
+    ca_key = ec.generate_private_key(ec.SECP256R1())
+    ca_name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'Fake Graph CA')])
+    ca_cert = (
+        x509.CertificateBuilder()
+        .subject_name(ca_name).issuer_name(ca_name)
+        .public_key(ca_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(valid_from).not_valid_after(valid_to)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .add_extension(x509.KeyUsage(False, False, False, False, False, True, True, False, False), critical=True)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(ca_key.public_key()), critical=False)
+        .sign(ca_key, hashes.SHA256())
+    )
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, '127.0.0.1')]))
+        .issuer_name(ca_name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(valid_from).not_valid_after(valid_to)
+        .add_extension(x509.SubjectAlternativeName([
+            x509.IPAddress(ipaddress.ip_address('127.0.0.1')), x509.DNSName('localhost'),
+        ]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .add_extension(x509.ExtendedKeyUsage([x509.oid.ExtendedKeyUsageOID.SERVER_AUTH]), critical=False)
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()), critical=False)
+        .sign(ca_key, hashes.SHA256())
+    )
+
+    paths = [os.path.join(directory, name) for name in ('ca.pem', 'server.pem', 'server.key')]
+    with open(paths[0], 'wb') as f:
+        f.write(ca_cert.public_bytes(serialization.Encoding.PEM))
+    with open(paths[1], 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(paths[2], 'wb') as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+        ))
+    return paths
+
+
+class FakeGraphServer:
+    """
+    Serves one workbook the way Graph does.
+
+    Routes:
+        GET  /{tenant}/v2.0/.well-known/openid-configuration
+        POST /{tenant}/oauth2/v2.0/token
+        GET  /v1.0/users/{user}/drive/root:{path}:            driveItem metadata
+        GET  /v1.0/users/{user}/drive/root:{path}:/content    302 to /download/...
+        GET  /download/{version}                              content, with Range support
+        POST /v1.0/users/{user}/drive/root:{path}:/workbook/createSession (and closeSession)
+        GET  .../workbook/worksheets
+        GET  .../workbook/worksheets/{name}/usedRange(valuesOnly=true)
+        GET  .../workbook/worksheets/{name}/range(address='A1:B2')
+
+    Args:
+        workbook (bytes): The .xlsx content to serve.
+        latency_seconds (float): Delay added to every Graph request.
+        bytes_per_second (int, optional): Bandwidth limit for response bodies.
+    """
+
+    tenant = 'fake-tenant'
+    user_id = 'fake-user'
+    file_path = '/Shipping/Board.xlsx'
+
+    def __init__(self, workbook=b'', latency_seconds=0.0, bytes_per_second=None):
+        self.latency_seconds = latency_seconds
+        self.bytes_per_second = bytes_per_second
+        self.requests = collections.Counter()
+        self.bytes_sent = collections.Counter()
+        self.request_log = []  # (monotonic time, route, status)
+        self._lock = threading.Lock()
+        self._throttles = collections.deque()
+        self._version = 0
+        self._sessions = 0
+        self._sheets = None
+        self._server = None
+        self._directory = None
+        self.set_workbook(workbook)
+
+    # --- control ---
+
+    def set_workbook(self, content):
+        """Replaces the served workbook, which gives it a new eTag and cTag."""
+        with self._lock:
+            self._version += 1
+            self.content = content
+            self._sheets = None
+            self.ctag = f'"c:{{FAKE-ITEM}},{self._version}"'
+            self.etag = f'"{{FAKE-ITEM}},{self._version}"'
+            self.last_modified = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def throttle(self, count=1, retry_after=1, status=429):
+        """Answers the next `count` Graph requests with `status` and a Retry-After header."""
+        with self._lock:
+            self._throttles.extend([(status, retry_after)] * count)
+
+    def _next_throttle(self):
+        with self._lock:
+            return self._throttles.popleft() if self._throttles else None
+
+    def sheets(self):
+        """Returns {sheet name: rows of raw cell values} the way the workbook API reports them."""
+        with self._lock:
+            if self._sheets is None:
+                self._sheets = _read_raw_values(self.content)
+            return self._sheets
+
+    def start(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.ca_path, cert_path, key_path = _write_certificates(self._directory.name)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+
+        handler = type('Handler', (_Handler,), {'graph': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        threading.Thread(target=self._server.serve_forever, name='fake-graph', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._directory is not None:
+            self._directory.cleanup()
+            self._directory = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self):
+        return f"https://127.0.0.1:{self._server.server_address[1]}"
+
+    def configure(self, settings, **overrides):
+        """Points the application settings at this server."""
+        values = {
+            'CLIENT_ID': 'fake-client',
+            'CLIENT_SECRET': 'fake-secret',
+            'TENANT_ID': self.tenant,
+            'AUTHORITY_HOST': self.url,
+            'AUTHORITY': f"{self.url}/{self.tenant}",
+            'GRAPH_BASE_URL': f"{self.url}/v1.0",
+            'CA_BUNDLE': self.ca_path,
+            'ONEDRIVE_USER_ID': self.user_id,
+            'TARGET_FILE_PATH': self.file_path,
+            'TOKEN_CACHE_PATH': None,
+            # Fake data must not replace the real last good snapshot or enter the KPI history
+            'WARM_START_PATH': '',
+            'HISTORY_DIR': '',
+        }
+        values.update(overrides)
+        for name, value in values.items():
+            setattr(settings, name, value)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    graph = None  # set on the per-server subclass
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='application/json', headers=None):
+        self._count_bytes(len(body))
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body or status not in (204, 304):
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+            if self.graph.bytes_per_second:
+                time.sleep(len(body) / self.graph.bytes_per_second)
+
+    def _send_json(self, obj, status=200):
+        self._send(status, json.dumps(obj).encode('utf-8'))
+
+    def _count_bytes(self, size):
+        with self.graph._lock:
+            self.graph.bytes_sent[getattr(self, 'route', 'other')] += size
+
+    def _record(self, route, status):
+        graph = self.graph
+        with graph._lock:
+            graph.requests[route] += 1
+            graph.request_log.append((time.monotonic(), route, status))
+
+    def _throttled(self, route):
+        throttle = self.graph._next_throttle()
+        if throttle is None:
+            return False
+        status, retry_after = throttle
+        self._record(route, status)
+        body = {'error': {'code': 'TooManyRequests' if status == 429 else 'ServiceUnavailable',
+                          'message': 'Fake throttling'}}
+        self._send(status, json.dumps(body).encode('utf-8'), headers={'Retry-After': str(retry_after)})
+        return True
+
+    def _authorized(self, route):
+        graph = self.graph
+        self.route = route
+        if graph.latency_seconds:
+            time.sleep(graph.latency_seconds)
+        if self.headers.get('Authorization') != 'Bearer fake-access-token':
+            self._record(route, 401)
+            self._send_json({'error': {'code': 'InvalidAuthenticationToken'}}, status=401)
+            return False
+        return not self._throttled(route)
+
+    def do_POST(self):
+        graph = self.graph
+        self.route = 'auth'
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        workbook_prefix = f"/v1.0/users/{graph.user_id}/drive/root:{graph.file_path}:/workbook"
+
+        if path.startswith(f"/{graph.tenant}/oauth2/v2.0/token"):
+            self._record('token', 200)
+            self._send_json({'token_type': 'Bearer', 'expires_in': 3600, 'access_token': 'fake-access-token'})
+        elif path == f"{workbook_prefix}/createSession":
+            if self._authorized('workbook'):
+                with graph._lock:
+                    graph._sessions += 1
+                    session_id = f"fake-session-{graph._sessions}"
+                self._record('workbook', 201)
+                self._send_json({'id': session_id, 'persistChanges': False}, status=201)
+        elif path == f"{workbook_prefix}/closeSession":
+            if self._authorized('workbook'):
+                self._record('workbook', 204)
+                self._send(204)
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_GET(self):
+        graph = self.graph
+        self.route = 'auth'
+        parsed = urllib.parse.urlsplit(self.path)
+        path = urllib.parse.unquote(parsed.path)
+
+        if path == f"/{graph.tenant}/v2.0/.well-known/openid-configuration":
+            base = f"{graph.url}/{graph.tenant}"
+            self._record('discovery', 200)
+            return self._send_json({
+                'issuer': f"{base}/v2.0",
+                'authorization_endpoint': f"{base}/oauth2/v2.0/authorize",
+                'token_endpoint': f"{base}/oauth2/v2.0/token",
+            })
+
+        match = re.fullmatch(r'/download/(\d+)', path)
+        if match:
+            return self._download(int(match.group(1)))
+
+        item_prefix = f"/v1.0/users/{graph.user_id}/drive/root:{graph.file_path}:"
+        if path.startswith(item_prefix):
+            route = self._graph_route(path[len(item_prefix):])
+            if route is None:
+                return self._send_json({'error': {'code': 'itemNotFound'}}, status=404)
+            if not self._authorized(route):
+                return
+            return getattr(self, f"_route_{route}")(path[len(item_prefix):], parse_qs(parsed.query))
+
+        self._send_json({'error': {'code': 'itemNotFound'}}, status=404)
+
+    def _graph_route(self, rest):
+        if rest == '':
+            return 'metadata'
+        if rest == '/content':
+            return 'content'
+        if rest.startswith('/workbook/'):
+            return 'workbook'
+        return None
+
+    def _route_metadata(self, rest, query):
+        graph = self.graph
+        if self.headers.get('If-None-Match') == graph.etag:
+            self._record('metadata', 304)
+            return self._send(304)
+        self._record('metadata', 200)
+        self._send_json({
+            'eTag': graph.etag,
+            'cTag': graph.ctag,
+            'lastModifiedDateTime': graph.last_modified,
+            'size': len(graph.content),
+        })
+
+    def _route_content(self, rest, query):
+        graph = self.graph
+        if self.headers.get('If-None-Match') in (graph.ctag, graph.etag):
+            self._record('content', 304)
+            return self._send(304)
+        self._record('content', 302)
+        self._send(302, headers={'Location': f"{graph.url}/download/{graph._version}"})
+
+    def _route_workbook(self, rest, query):
+        sheets = self.graph.sheets()
+        if rest == '/workbook/worksheets':
+            self._record('workbook', 200)
+            return self._send_json({'value': [
+                {'name': name, 'position': position} for position, name in enumerate(sheets)
+            ]})
+
+        match = re.fullmatch(r"/workbook/worksheets/([^/]+)/(usedRange\(valuesOnly=true\)|range\(address='([^']+)'\))", rest)
+        if match is None or match.group(1) not in sheets:
+            self._record('workbook', 404)
+            return self._send_json({'error': {'code': 'itemNotFound'}}, status=404)
+        name, rows = match.group(1), sheets[match.group(1)]
+        width = max((len(row) for row in rows), default=0)
+        if match.group(3) is None:
+            address = f"{name}!A1:{_column_letter(width - 1)}{len(rows)}" if rows else f"{name}!A1"
+            self._record('workbook', 200)
+            return self._send_json({'address': address})
+
+        first, _, last = match.group(3).partition(':')
+        first_col, first_row = _split_cell(first)
+        last_col, last_row = _split_cell(last or first)
+        values = []
+        for row in rows[first_row - 1:last_row]:
+            row = row + [''] * (last_col + 1 - len(row))
+            values.append(row[first_col:last_col + 1])
+        values.extend([[''] * (last_col - first_col + 1)] * (last_row - first_row + 1 - len(values)))
+        self._record('workbook', 200)
+        self._send_json({'address': f"{name}!{match.group(3)}", 'values': values})
+
+    def _download(self, version):
+        graph = self.graph
+        self.route = 'download'
+        content = graph.content
+        start = 0
+        status = 200
+        headers = {'ETag': graph.etag, 'Accept-Ranges': 'bytes'}
+        range_header = self.headers.get('Range')
+        if range_header and self.headers.get('If-Range') in (None, graph.etag):
+            start = int(range_header.split('=', 1)[1].split('-', 1)[0])
+            status = 206
+            headers['Content-Range'] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+        body = content[start:]
+        self._record('download', status)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        chunk_size = 256 * 1024
+        for offset in range(0, len(body), chunk_size):
+            chunk = body[offset:offset + chunk_size]
+            self.wfile.write(chunk)
+            self._count_bytes(len(chunk))
+            if graph.bytes_per_second:
+                time.sleep(len(chunk) / graph.bytes_per_second)
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def _split_cell(cell):
+    letters = cell.rstrip('0123456789')
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1, int(cell[len(letters):])
+
+
+def _raw_value(value):
+    """Converts an openpyxl cell value to what the workbook API returns for it."""
+    from openpyxl.utils.datetime import to_excel
+
+    if value is None:
+        return ''
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return to_excel(value)
+    return value
+
+
+def _read_raw_values(content):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        return {
+            sheet.title: [[_raw_value(value) for value in row] for row in sheet.iter_rows(values_only=True)]
+            for sheet in workbook.worksheets
+        }
+    finally:
+        workbook.close()
+
+
+def parse_qs(query):
+    return {key: values[-1] for key, values in urllib.parse.parse_qs(query).items()}
@@ -0,0 +1,303 @@
+# benchmarks/suite.py
+"""
+Runs the pipeline benchmarks at several sizes and saves the results as JSON.
+
+    python -m benchmarks.suite --rows 1000 10000 100000 1000000 --output results.json
+    python -m benchmarks.suite --rows 1000 10000 --baseline results.json
+
+Every size runs in its own process, against a fake Graph server with the
+given latency, bandwidth and throttling, and reports:
+
+- refresh latency: cold (token, download, parse, clean, index), from the
+  Parquet cache, and for an unchanged file (metadata request only);
+- the time until fresh data arrives when the first requests are throttled;
+- per-stage p50/p95 from the instrumentation spans;
+- peak resident memory of the process and the snapshot's own memory;
+- table render time per carousel page (first render and cached) and for
+  the whole table, and the carousel build.
+
+Synthetic workbooks are generated once per size and seed and kept in
+--workbook-dir, so runs on different commits read identical files. With
+--baseline, each figure is compared with an earlier results file.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_workbook import write_workbook
+
+SHEET_NAME = 'Databaseshippingboard'
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Carousel pages timed per size; spread evenly over all pages
+RENDER_SAMPLE_PAGES = 200
+
+# (label, path in a size's results, unit) of the figures printed and compared
+SUMMARY_FIGURES = [
+    ("cold refresh", ('refresh_cold', 'p50'), 's'),
+    ("cached refresh", ('refresh_cached', 'p50'), 's'),
+    ("unchanged", ('refresh_unchanged', 'p50'), 's'),
+    ("throttled", ('refresh_throttled', 'seconds'), 's'),
+    ("parse p50", ('stages', 'parse', 'p50'), 's'),
+    ("clean p50", ('stages', 'clean', 'p50'), 's'),
+    ("page render", ('render', 'page_cold_ms'), 'ms'),
+    ("page cached", ('render', 'page_warm_ms'), 'ms'),
+    ("peak RSS", ('peak_rss_bytes',), 'MB'),
+]
+
+
+def _summary(values):
+    return {
+        'p50': statistics.median(values),
+        'min': min(values),
+        'max': max(values),
+        'runs': len(values),
+    }
+
+
+def _timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def _peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _render_timings(snapshot, rows_per_page):
+    from dashboard_app import carousel
+    from dashboard_app.table_renderer import TableRenderer
+    from data_processing.indexing import page_offsets
+
+    df, index = snapshot.data, snapshot.index
+    positions = index.filter(index.min_date, index.max_date)
+    pages = page_offsets(len(positions), rows_per_page)
+    step = max(1, len(pages) // RENDER_SAMPLE_PAGES)
+    sample = [df.iloc[positions[start:end]] for start, end in pages[::step]]
+
+    renderer = TableRenderer()
+    _, cold = _timed(lambda: [renderer.render(page, snapshot.version) for page in sample])
+    _, warm = _timed(lambda: [renderer.render(page, snapshot.version) for page in sample])
+
+    full_renderer = TableRenderer()
+    rows = df.iloc[positions]
+    _, full_cold = _timed(lambda: full_renderer.render(rows, snapshot.version))
+    _, full_warm = _timed(lambda: full_renderer.render(rows, snapshot.version))
+    slides, build = _timed(lambda: carousel.build_slides(df, index, positions, snapshot.version, rows_per_page))
+    return {
+        'pages_timed': len(sample),
+        'page_cold_ms': cold / len(sample) * 1e3 if sample else None,
+        'page_warm_ms': warm / len(sample) * 1e3 if sample else None,
+        'full_table_cold_s': full_cold,
+        'full_table_warm_s': full_warm,
+        'carousel_build_s': build,
+        'carousel_slides': len(slides),
+    }
+
+
+def run_size(config):
+    """
+    Benchmarks one workbook size. Runs in a fresh process, started by `main`.
+
+    Returns:
+        dict: The results of this size.
+    """
+    from benchmarks.fake_graph import FakeGraphServer
+    from config import settings
+    from instrumentation import metrics
+
+    with open(config['workbook'], 'rb') as f:
+        content = f.read()
+    result = {'rows': config['rows'], 'workbook_bytes': len(content), 'baseline_rss_bytes': _peak_rss_bytes()}
+    bytes_per_second = config['mbps'] * 1e6 if config['mbps'] else None
+
+    with tempfile.TemporaryDirectory() as cache_root, \
+            FakeGraphServer(content, latency_seconds=config['latency'], bytes_per_second=bytes_per_second) as graph:
+        graph.configure(settings, EXCEL_SHEET_NAME=SHEET_NAME, SNAPSHOT_CACHE_DIR=os.path.join(cache_root, 'warmup'))
+
+        # Imported after configuring so the Graph client is built for the fake server
+        from data_processing.poller import SnapshotPoller
+        from data_processing.snapshot import SnapshotStore
+
+        # Every cold run gets an empty Parquet cache, so it downloads and parses
+        metrics.reset()
+        cold = []
+        for run in range(config['repeat']):
+            settings.SNAPSHOT_CACHE_DIR = os.path.join(cache_root, f'cold-{run}')
+            store = SnapshotStore()
+            snapshot, seconds = _timed(store.refresh)
+            cold.append(seconds)
+        result['refresh_cold'] = _summary(cold)
+        result['stages'] = {
+            stage: {'p50': stats['p50'], 'p95': stats['p95'], 'runs': stats['count']}
+            for stage, stats in metrics.stage_stats().items()
+        }
+        result['download_bytes'] = metrics.counters().get('download_bytes', 0) // config['repeat']
+
+        # The same file again: one metadata request
+        result['refresh_unchanged'] = _summary([_timed(store.refresh)[1] for _ in range(config['repeat'])])
+        # A new process finding the version in the Parquet cache
+        result['refresh_cached'] = _summary([_timed(SnapshotStore().refresh)[1] for _ in range(config['repeat'])])
+
+        if config['throttle']:
+            settings.SNAPSHOT_CACHE_DIR = os.path.join(cache_root, 'throttled')
+            poller = SnapshotPoller(SnapshotStore())
+            graph.throttle(config['throttle'], retry_after=config['retry_after'])
+            started = time.perf_counter()
+            polls = 1
+            while True:
+                delay = poller.poll_once()
+                if poller.last_error is None:
+                    break
+                polls += 1
+                time.sleep(delay)
+            result['refresh_throttled'] = {
+                'seconds': time.perf_counter() - started,
+                'polls': polls,
+                'throttled_requests': config['throttle'],
+            }
+
+        result['snapshot_memory_bytes'] = snapshot.memory_bytes
+        result['render'] = _render_timings(snapshot, config['rows_per_page'])
+    result['peak_rss_bytes'] = _peak_rss_bytes()
+    return result
+
+
+def _workbook_path(directory, rows, seed):
+    path = os.path.join(directory, f"shipping-board-{rows}-seed{seed}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        print(f"Generating {rows} rows ...", end=' ', flush=True)
+        _, seconds = _timed(lambda: write_workbook(f"{path}.tmp", rows, sheet_name=SHEET_NAME, seed=seed))
+        os.replace(f"{path}.tmp", path)
+        print(f"{os.path.getsize(path) / 1e6:.1f} MB in {seconds:.0f} s")
+    return path
+
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ['git', *args], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _figure(result, path):
+    value = result
+    for key in path:
+        if not isinstance(value, dict) or value.get(key) is None:
+            return None
+        value = value[key]
+    return value
+
+
+def _format(value, unit):
+    if value is None:
+        return '-'
+    if unit == 'MB':
+        return f"{value / 1e6:.0f} MB"
+    if unit == 'ms':
+        return f"{value:.2f} ms"
+    return f"{value:.3f} s"
+
+
+def _print_results(results, baseline=None):
+    baseline_by_rows = {result['rows']: result for result in (baseline or {}).get('results', [])}
+    for result in results:
+        print(f"\n{result['rows']:,} rows")
+        if 'error' in result:
+            print(f"  failed: {result['error']}")
+            continue
+        before = baseline_by_rows.get(result['rows'])
+        for label, path, unit in SUMMARY_FIGURES:
+            value = _figure(result, path)
+            line = f"  {label:<16} {_format(value, unit):>12}"
+            old = _figure(before, path) if before else None
+            if value is not None and old:
+                line += f"   baseline {_format(old, unit):>12}  ({value / old:.2f}x)"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every Graph request')
+    parser.add_argument('--mbps', type=float, default=None, help='bandwidth limit in MB/s (default: none)')
+    parser.add_argument('--throttle', type=int, default=2, help='Graph requests answered with 429 (0: none)')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--rows-per-page', type=int, default=7)
+    parser.add_argument('--workbook-dir', default='.bench_workbooks')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare with')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_size(json.loads(args.worker))))
+        return
+
+    results = []
+    for rows in args.rows:
+        config = {
+            'rows': rows,
+            'workbook': _workbook_path(args.workbook_dir, rows, args.seed),
+            'latency': args.latency,
+            'mbps': args.mbps,
+            'throttle': args.throttle,
+            'retry_after': args.retry_after,
+            'repeat': args.repeat,
+            'rows_per_page': args.rows_per_page,
+        }
+        print(f"Benchmarking {rows:,} rows ...", flush=True)
+        # A fresh process per size, so peak memory and the metrics belong to this size alone
+        worker = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.suite', '--worker', json.dumps(config)],
+            capture_output=True, text=True,
+        )
+        if worker.returncode == 0:
+            results.append(json.loads(worker.stdout.strip().splitlines()[-1]))
+        else:
+            print(worker.stderr, file=sys.stderr)
+            # A worker killed for memory (SIGKILL) leaves no stderr, only its exit code
+            lines = worker.stderr.strip().splitlines()
+            results.append({'rows': rows, 'error': lines[-1] if lines else f"exit code {worker.returncode}"})
+
+    report = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'commit': _git('rev-parse', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {name: value for name, value in vars(args).items() if name not in ('worker', 'output', 'baseline')},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    _print_results(results, baseline)
+    print(f"\nSaved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/synthetic_workbook.py
+import datetime
+import random
+
+# The dashboard columns plus a few the real sheet has but the dashboard ignores
+COLUMNS = [
+    'Completion time', 'Ter.', 'Ship no.', 'Dock Code', 'Truck Route',
+    'Preparation Start', 'Preparation End', 'Loading Start', 'Loading End',
+    'Status Preparation', 'Status Loading',
+    'Driver', 'Truck Plate', 'Pallets', 'Remark',
+]
+
+STATUSES = ['Finished', 'Finished', 'On Process', 'Delay(F)', None]
+
+
+def _time_cell(rng, minutes):
+    value = datetime.time(minutes // 60 % 24, minutes % 60)
+    # Real sheets mix proper time cells with typed-in text
+    return value if rng.random() < 0.7 else value.strftime('%H:%M')
+
+
+def generate_rows(row_count, seed=0, start_date=datetime.datetime(2024, 1, 1)):
+    """
+    Yields rows that look like the shipping-board sheet.
+
+    Args:
+        row_count (int): Number of data rows.
+        seed (int, optional): Seed for the random generator, so runs are repeatable.
+        start_date (datetime.datetime, optional): Completion time of the first rows.
+    """
+    rng = random.Random(seed)
+    ships_per_day = max(1, min(row_count // 30, 400))
+    for i in range(row_count):
+        day = start_date + datetime.timedelta(days=i // (ships_per_day * 5))
+        prep_start = rng.randrange(6 * 60, 20 * 60)
+        prep_end = prep_start + rng.randrange(10, 90)
+        load_start = prep_end + rng.randrange(0, 30)
+        load_end = load_start + rng.randrange(10, 60)
+        yield [
+            day + datetime.timedelta(minutes=load_end),
+            rng.randrange(1, 7),
+            1000 + i // 5,
+            f"D{rng.randrange(1, 40):02d}",
+            f"R-{rng.randrange(100, 400)}",
+            _time_cell(rng, prep_start),
+            _time_cell(rng, prep_end) if rng.random() < 0.9 else None,
+            _time_cell(rng, load_start),
+            _time_cell(rng, load_end) if rng.random() < 0.8 else None,
+            rng.choice(STATUSES),
+            rng.choice(STATUSES),
+            f"Driver {rng.randrange(1, 200)}",
+            f"{rng.randrange(10, 99)}-{rng.randrange(1000, 9999)}",
+            rng.randrange(1, 30),
+            'Checked' if rng.random() < 0.1 else None,
+        ]
+
+
+def write_workbook(path, row_count, sheet_name='Databaseshippingboard', seed=0, archive_rows=0):
+    """
+    Writes a synthetic shipping-board workbook with `row_count` data rows.
+
+    With `archive_rows`, a second 'Archive' sheet of that many rows is added,
+    like the older shipments real workbooks keep next to the board.
+    """
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(COLUMNS)
+    for row in generate_rows(row_count, seed=seed):
+        sheet.append(row)
+    if archive_rows:
+        archive = workbook.create_sheet('Archive')
+        archive.append(COLUMNS)
+        for row in generate_rows(archive_rows, seed=seed + 1, start_date=datetime.datetime(2023, 1, 1)):
+            archive.append(row)
+    workbook.save(path)
+    return path
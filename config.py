@@ -1,32 +1,191 @@
 # config.py
+import os
+import sys
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    tomllib = None
+
+# A TOML file with the settings; its path can be changed with this environment variable
+SETTINGS_FILE_ENV = "DASHBOARD_SETTINGS_FILE"
+DEFAULT_SETTINGS_FILE = "settings.toml"
+
+# Where Streamlit looks for secrets, lowest priority first
+STREAMLIT_SECRETS_FILES = [
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+    os.path.join(".streamlit", "secrets.toml"),
+]
+
+
+def _read_toml(path):
+    if not os.path.isfile(path):
+        return {}
+    if tomllib is not None:
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    import toml  # installed with Streamlit
+    return toml.load(path)
+
+
+class EnvironmentSource:
+    """Reads settings from environment variables of the same name."""
+
+    def get(self, name):
+        return os.environ.get(name)
+
+
+class TomlFileSource:
+    """Reads settings from the top-level keys of a TOML file, if the file exists."""
+
+    def __init__(self, path):
+        self.path = path
+        self._values = None
+
+    def get(self, name):
+        if self._values is None:
+            self._values = _read_toml(self.path)
+        return self._values.get(name)
+
+
+class StreamlitSecretsSource:
+    """
+    Reads settings from Streamlit's secrets.
+
+    Inside a running Streamlit app this is `st.secrets`. Anywhere else, the
+    same secrets.toml files are read directly, so scripts and workers get the
+    same configuration without importing Streamlit.
+    """
+
+    def __init__(self, paths=STREAMLIT_SECRETS_FILES):
+        self.paths = paths
+        self._values = None
+
+    def get(self, name):
+        if 'streamlit' in sys.modules:
+            try:
+                return sys.modules['streamlit'].secrets.get(name)
+            except Exception:
+                # No secrets file; fall back to the files below, which are then missing too
+                pass
+        if self._values is None:
+            self._values = {}
+            for path in self.paths:
+                self._values.update(_read_toml(path))
+        return self._values.get(name)
+
+
+def default_sources():
+    """Environment variables, then the settings file, then Streamlit's secrets."""
+    return [
+        EnvironmentSource(),
+        TomlFileSource(os.environ.get(SETTINGS_FILE_ENV, DEFAULT_SETTINGS_FILE)),
+        StreamlitSecretsSource(),
+    ]
 
-import streamlit as st
 
 class Settings:
     """
-    Application configuration settings loaded from Streamlit's secrets management.
+    Application configuration settings.
+
+    Every setting is looked up in each source in turn, and the first value
+    found wins. By default the sources are environment variables, a TOML
+    settings file and Streamlit's secrets (see `default_sources`). None of
+    them needs Streamlit, so the data pipeline can run from cron or worker
+    processes.
     """
-    # Get secrets from st.secrets dictionary
-    CLIENT_ID = st.secrets.get("CLIENT_ID")
-    CLIENT_SECRET = st.secrets.get("CLIENT_SECRET")
-    TENANT_ID = st.secrets.get("TENANT_ID")
-    
-    # Construct the authority URL from the tenant ID
-    AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
-    
-    # Define the required API scopes
-    GRAPH_API_SCOPES = ["https://graph.microsoft.com/.default"]
-    
-    # Get OneDrive/SharePoint specific settings
-    ONEDRIVE_USER_ID = st.secrets.get("ONEDRIVE_USER_ID")
-    TARGET_FILE_PATH = st.secrets.get("TARGET_FILE_PATH")
-    EXCEL_SHEET_NAME = st.secrets.get("EXCEL_SHEET_NAME")
 
-# Create a single instance of the settings to be used throughout the app
-settings = Settings()
+    # Settings without which nothing can be fetched
+    REQUIRED = ("CLIENT_ID", "CLIENT_SECRET", "TENANT_ID")
+
+    def __init__(self, sources=None):
+        self._sources = sources if sources is not None else default_sources()
+        get = self.get
+
+        self.CLIENT_ID = get("CLIENT_ID")
+        self.CLIENT_SECRET = get("CLIENT_SECRET")
+        self.TENANT_ID = get("TENANT_ID")
+
+        # Construct the authority URL from the tenant ID
+        self.AUTHORITY_HOST = get("AUTHORITY_HOST", "https://login.microsoftonline.com")
+        self.AUTHORITY = f"{self.AUTHORITY_HOST}/{self.TENANT_ID}"
+
+        # Define the required API scopes
+        self.GRAPH_API_SCOPES = ["https://graph.microsoft.com/.default"]
+
+        # Graph endpoint, and an optional CA bundle for TLS (only needed for a local stand-in server)
+        self.GRAPH_BASE_URL = get("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0")
+        self.CA_BUNDLE = get("CA_BUNDLE")
+
+        # Get OneDrive/SharePoint specific settings
+        self.ONEDRIVE_USER_ID = get("ONEDRIVE_USER_ID")
+        self.TARGET_FILE_PATH = get("TARGET_FILE_PATH")
+        self.EXCEL_SHEET_NAME = get("EXCEL_SHEET_NAME")
+
+        # Several workbooks or sheets, one per site, as a TOML array of tables (or the same as JSON):
+        #   [[SOURCES]]
+        #   site = "north"
+        #   file_path = "/Shipping/North.xlsx"
+        #   sheet_name = "Databaseshippingboard"   # optional, defaults to EXCEL_SHEET_NAME
+        #   user_id = "..."                        # optional, defaults to ONEDRIVE_USER_ID
+        # Without it, the single file above is read (see data_processing.sources).
+        self.SOURCES = get("SOURCES")
+        # Threads that fetch the sources at the same time, processes that parse downloaded
+        # workbooks (0 parses in the fetching threads), and how long a refresh waits for slow
+        # sites before publishing the others (their data then follows in a later refresh)
+        self.FETCH_WORKERS = int(get("FETCH_WORKERS", 4))
+        self.PARSE_PROCESSES = int(get("PARSE_PROCESSES", 2))
+        self.SITE_FETCH_TIMEOUT_SECONDS = float(get("SITE_FETCH_TIMEOUT_SECONDS", 30))
+
+        # Optional file to persist the MSAL token cache between restarts
+        self.TOKEN_CACHE_PATH = get("TOKEN_CACHE_PATH")
+
+        # Excel parse engine ('auto', 'calamine', 'streaming' or 'openpyxl') and where parsed versions are cached
+        self.PARSE_ENGINE = get("PARSE_ENGINE", "auto")
+        self.SNAPSHOT_CACHE_DIR = get("SNAPSHOT_CACHE_DIR", ".snapshot_cache")
 
-# Optional: Add a check to ensure secrets are loaded when running on the cloud
-if not all([settings.CLIENT_ID, settings.CLIENT_SECRET, settings.TENANT_ID]):
-    # This message will show up in the logs on Streamlit Cloud if secrets are missing
-    st.error("Authentication secrets (CLIENT_ID, CLIENT_SECRET, TENANT_ID) are not set. Please add them to your Streamlit Cloud secrets.")
+        # The last good snapshot is kept in this file and shown right after a restart, unless it
+        # was loaded longer ago than the maximum age. An empty path turns this off.
+        self.WARM_START_PATH = get("WARM_START_PATH", os.path.join(self.SNAPSHOT_CACHE_DIR, "last_good.arrow"))
+        self.WARM_START_MAX_AGE_SECONDS = int(get("WARM_START_MAX_AGE_SECONDS", 24 * 60 * 60))
 
+        # Day-partitioned history of shipment facts and KPI rollups, updated from every new
+        # snapshot version (see data_processing.rollups). An empty path turns it off.
+        self.HISTORY_DIR = get("HISTORY_DIR", os.path.join(self.SNAPSHOT_CACHE_DIR, "history"))
+
+        # How the sheet is fetched: 'download' (the whole .xlsx file), 'workbook' (the used range
+        # through the Graph workbook API) or 'workbook_append' (only rows added since the last read)
+        self.FETCH_MODE = get("FETCH_MODE", "download")
+
+        # How often the background poller checks OneDrive for a new version (seconds)
+        self.POLL_INTERVAL_SECONDS = int(get("POLL_INTERVAL_SECONDS", 60))
+        # The poller speeds up while the file changes often and slows down when it does not
+        self.POLL_MIN_INTERVAL_SECONDS = int(get("POLL_MIN_INTERVAL_SECONDS", 15))
+        self.POLL_MAX_INTERVAL_SECONDS = int(get("POLL_MAX_INTERVAL_SECONDS", 600))
+
+        # Port and address of a Prometheus /metrics endpoint in the Streamlit process (off when
+        # no port is set), and whether the sidebar shows a panel with the pipeline timings and counters
+        self.METRICS_PORT = int(get("METRICS_PORT", 0)) or None
+        self.METRICS_HOST = get("METRICS_HOST", "127.0.0.1")
+        self.DEBUG_PANEL = str(get("DEBUG_PANEL", "false")).lower() in ("1", "true", "yes")
+
+        # Address of the read-only wallboard API (python -m dashboard_api)
+        self.API_HOST = get("API_HOST", "127.0.0.1")
+        self.API_PORT = int(get("API_PORT", 8502))
+
+    def get(self, name, default=None):
+        """Returns the first value any source has for `name`, or `default`."""
+        for source in self._sources:
+            value = source.get(name)
+            if value is not None:
+                return value
+        return default
+
+    @property
+    def missing_required(self):
+        """Names of the REQUIRED settings that have no value."""
+        return [name for name in self.REQUIRED if not getattr(self, name)]
+
+
+# Create a single instance of the settings to be used throughout the app
+settings = Settings()
@@ -0,0 +1,34 @@
+# dashboard_api/__main__.py
+"""
+Serves the read-only wallboard API and page.
+
+    python -m dashboard_api --port 8502
+
+Open http://<host>:<port>/ on a wallboard, optionally with filters such as
+/?terminal=1 or /?ship_no=1042&start=2025-06-01. Settings are read as
+described in config.py; API_HOST and API_PORT set the default address.
+"""
+import argparse
+import logging
+
+
+def main(argv=None):
+    from config import settings
+
+    parser = argparse.ArgumentParser(prog='python -m dashboard_api', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=settings.API_HOST)
+    parser.add_argument('--port', type=int, default=settings.API_PORT)
+    args = parser.parse_args(argv)
+    if settings.missing_required:
+        parser.error(f"Missing settings: {', '.join(settings.missing_required)}")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    from dashboard_api.app import create_app
+
+    app = create_app()
+    # One thread per connection; event streams spend their time waiting on the poller's condition
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
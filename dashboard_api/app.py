@@ -0,0 +1,331 @@
+# dashboard_api/app.py
+import collections
+import datetime
+import gzip
+import hashlib
+import json
+import threading
+
+import numpy as np
+from flask import Flask, Response, jsonify, request
+
+from dashboard_app.table_renderer import TABLE_COLUMNS
+from data_processing import rollups
+from data_processing.cleaning import display_column, status_code_column
+from data_processing.poller import get_poller
+from data_processing.snapshot import snapshot_store
+from instrumentation import PROMETHEUS_CONTENT_TYPE, metrics
+
+# Keys of the query string that select rows; the response cache is keyed by these
+FILTER_PARAMS = ('start', 'end', 'site', 'terminal', 'ship_no')
+ARROW_MIME_TYPE = 'application/vnd.apache.arrow.stream'
+# How long an event stream may be silent before a comment is sent to keep proxies from closing it
+EVENTS_KEEPALIVE_SECONDS = 15
+# Tells browsers how long to wait before reconnecting a dropped event stream (milliseconds)
+EVENTS_RETRY_MS = 5000
+# Responses smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+_DISPLAY_COLUMNS = [display_column(col) for col, _ in TABLE_COLUMNS]
+_STATUS_CODE_COLUMNS = [status_code_column('Status Preparation'), status_code_column('Status Loading')]
+
+
+class BadRequest(ValueError):
+    """A query parameter that cannot be used."""
+
+
+class ResponseCache:
+    """
+    Encoded responses of the newest snapshot versions, shared by every client.
+
+    Wallboards showing the same filters get the same bytes, so each
+    (version, filters, format) combination is filtered and encoded once.
+    The least recently used entries are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def gauges(self):
+        """Returns the cache counters as metric gauges, for `instrumentation.metrics`."""
+        return {'api_response_cache_hits': self.hits, 'api_response_cache_misses': self.misses}
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        # Built outside the lock; two clients may build the same entry once each
+        entry = build()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"'{name}' must be a date like 2025-06-30, not '{value}'") from None
+
+
+# Filter value that is not in the current snapshot, so it selects no rows
+_NOT_PRESENT = object()
+
+
+def _option_text(option):
+    # A column with blank cells is float, but the board shows 1.0 as '1'
+    if isinstance(option, (float, np.floating)) and float(option).is_integer():
+        return str(int(option))
+    return str(option)
+
+
+def _option(options, value):
+    # Query values are text; match them against the index options by their display text
+    if value is None:
+        return None
+    for option in options:
+        if _option_text(option) == value:
+            return option
+    return _NOT_PRESENT
+
+
+def filter_positions(snapshot, params):
+    """
+    Finds the snapshot rows selected by the query parameters, like the dashboard's filters.
+
+    Without 'start' and 'end', the whole date range of the snapshot is used. A site,
+    terminal or ship no. that is not in the snapshot selects no rows, so a wallboard
+    showing one that dropped out shows an empty board rather than an error.
+
+    Returns:
+        np.ndarray: Row positions in their original order.
+
+    Raises:
+        BadRequest: If a date is malformed.
+    """
+    index = snapshot.index
+    start = _parse_date(params['start'], 'start') if params.get('start') else index.min_date
+    end = _parse_date(params['end'], 'end') if params.get('end') else index.max_date
+    site = _option(index.site_options, params.get('site'))
+    terminal = _option(index.terminal_options, params.get('terminal'))
+    ship_no = _option(index.ship_no_options, params.get('ship_no'))
+    if start is None or end is None or any(value is _NOT_PRESENT for value in (site, terminal, ship_no)):
+        # No row has a completion time, or a filter value has no rows
+        return np.empty(0, dtype=np.intp)
+    return index.filter(start, end, terminal=terminal, ship_no=ship_no, site=site)
+
+
+def snapshot_info(snapshot, store=snapshot_store):
+    """The version and freshness of a snapshot, as sent with every response and event."""
+    return {
+        'version': snapshot.version,
+        'loaded_at': snapshot.loaded_at.isoformat() if snapshot.loaded_at else None,
+        'checked_at': snapshot.checked_at.isoformat() if snapshot.checked_at else None,
+        'restored': snapshot.restored,
+        'stale': store.is_stale,
+    }
+
+
+def encode_json(snapshot, positions, store=snapshot_store):
+    """
+    Encodes rows as compact JSON: the column names once, then one array of display strings per row.
+
+    `status` holds the preparation and loading status codes of each row,
+    which select the cell colours, and `keys` the row keys.
+    """
+    rows = snapshot.data.iloc[positions]
+    body = {
+        **snapshot_info(snapshot, store),
+        'columns': [col for col, _ in TABLE_COLUMNS],
+        'keys': rows.index.tolist(),
+        'rows': rows[_DISPLAY_COLUMNS].astype(str).to_numpy().tolist(),
+        'status': rows[_STATUS_CODE_COLUMNS].astype(str).to_numpy().tolist(),
+    }
+    return json.dumps(body, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def encode_arrow(snapshot, positions):
+    """Encodes rows, with all their typed and display columns and the row key, as an Arrow IPC stream."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(snapshot.data.iloc[positions], preserve_index=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _build_entry(snapshot, params, output_format, store):
+    positions = filter_positions(snapshot, params)
+    with metrics.span(f'api_encode_{output_format}'):
+        if output_format == 'arrow':
+            body, mimetype, compressed = encode_arrow(snapshot, positions), ARROW_MIME_TYPE, None
+        else:
+            body, mimetype = encode_json(snapshot, positions, store), 'application/json'
+            compressed = gzip.compress(body, compresslevel=5) if len(body) >= GZIP_MIN_BYTES else None
+    etag = hashlib.sha1(body).hexdigest()[:20]
+    return {'body': body, 'gzip': compressed, 'mimetype': mimetype, 'etag': etag, 'rows': len(positions)}
+
+
+def encode_kpis(kpis):
+    """Encodes a `RollupStore.kpis` result as JSON records, with days as ISO dates and missing values as null."""
+    frame = kpis.reset_index()
+    if 'Day' in frame.columns:
+        frame['Day'] = frame['Day'].dt.date.astype(str)
+    frame = frame.astype(object).where(frame.notna(), None)
+    body = {'columns': list(frame.columns), 'rows': frame.to_dict(orient='records')}
+    return json.dumps(body, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _sse_event(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def create_app(store=snapshot_store, poller=None, response_cache=None, rollup_store=None):
+    """
+    Creates the read-only wallboard API.
+
+    - `GET /api/snapshot` returns the current snapshot, filtered by the
+      optional `start`, `end` (dates), `site`, `terminal` and `ship_no` parameters,
+      as compact JSON or, with `format=arrow`, as an Arrow IPC stream.
+      Responses carry an ETag, so an unchanged view costs a 304.
+    - `GET /api/events` is a Server-Sent Events stream with a `version`
+      event whenever the snapshot version or its freshness changes.
+    - `GET /api/kpis` returns KPIs from the history rollups: shipments, average
+      prep and load minutes and delay rates, grouped by `by` (a comma-separated
+      list of day, site, terminal and route; default route), for the optional
+      `start` and `end` dates and `site`, `terminal` and `route`.
+    - `GET /metrics` exports the pipeline metrics for Prometheus.
+    - `GET /` is a static wallboard page that uses the snapshot and events routes.
+
+    No request fetches from OneDrive; the poller does that in the background
+    for the whole process, and every client reads the same shared snapshot.
+
+    Args:
+        store (SnapshotStore, optional): Store to serve. Defaults to the shared store.
+        poller (SnapshotPoller, optional): Poller that refreshes `store`. Defaults to the shared poller.
+        response_cache (ResponseCache, optional): Cache of encoded responses.
+        rollup_store (RollupStore, optional): History for `/api/kpis`. Defaults to the shared one, if enabled.
+
+    Returns:
+        Flask: The application.
+    """
+    app = Flask(__name__, static_folder='static', static_url_path='/static')
+    poller = poller if poller is not None else get_poller()
+    response_cache = response_cache if response_cache is not None else ResponseCache()
+    rollup_store = rollup_store if rollup_store is not None else rollups.get_rollup_store()
+    app.extensions['response_cache'] = response_cache
+    metrics.register_collector(response_cache.gauges)
+
+    def _no_snapshot():
+        response = jsonify(error="No data has been loaded yet", detail=str(store.last_error or ''))
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    @app.get('/')
+    def wallboard():
+        return app.send_static_file('wallboard.html')
+
+    @app.get('/metrics')
+    def metrics_text():
+        return Response(metrics.prometheus_text(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+    @app.get('/api/snapshot')
+    def snapshot():
+        metrics.increment('api_snapshot_requests')
+        current = store.current()
+        if current is None:
+            return _no_snapshot()
+        output_format = request.args.get('format', 'json')
+        if output_format not in ('json', 'arrow'):
+            return jsonify(error="'format' must be 'json' or 'arrow'"), 400
+
+        params = {name: request.args.get(name) or None for name in FILTER_PARAMS}
+        key = (current.version, current.restored, store.is_stale, output_format,
+               *(params[name] for name in FILTER_PARAMS))
+        try:
+            entry = response_cache.get_or_build(key, lambda: _build_entry(current, params, output_format, store))
+        except BadRequest as e:
+            return jsonify(error=str(e)), 400
+
+        response = Response(mimetype=entry['mimetype'])
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['X-Snapshot-Version'] = str(current.version)
+        response.headers['X-Row-Count'] = str(entry['rows'])
+        use_gzip = entry['gzip'] is not None and 'gzip' in request.accept_encodings
+        # The compressed body is a different representation, so it gets its own ETag
+        response.set_etag(f"{entry['etag']}-gz" if use_gzip else entry['etag'])
+        if request.if_none_match.contains(response.get_etag()[0]):
+            metrics.increment('api_not_modified')
+            response.status_code = 304
+            return response
+        if use_gzip:
+            response.set_data(entry['gzip'])
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response.set_data(entry['body'])
+        return response
+
+    @app.get('/api/kpis')
+    def kpis():
+        if rollup_store is None:
+            return jsonify(error="The KPI history is turned off (HISTORY_DIR is empty)"), 404
+        try:
+            start = _parse_date(request.args['start'], 'start') if request.args.get('start') else None
+            end = _parse_date(request.args['end'], 'end') if request.args.get('end') else None
+            by = [name.strip() for name in request.args.get('by', 'route').split(',') if name.strip()]
+            result = rollup_store.kpis(
+                start, end, by=by, site=request.args.get('site') or None,
+                terminal=request.args.get('terminal') or None, route=request.args.get('route') or None,
+            )
+        except ValueError as e:
+            # BadRequest is a ValueError too
+            return jsonify(error=str(e)), 400
+        response = Response(encode_kpis(result), mimetype='application/json')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    @app.get('/api/events')
+    def events():
+        def stream():
+            metrics.increment('api_event_streams')
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            sent = None
+            while True:
+                # Read before the snapshot, so a version published in between ends the wait at once
+                published = poller.published_version
+                current = store.current()
+                if current is not None:
+                    info = snapshot_info(current, store)
+                    state = (info['version'], info['restored'], info['stale'])
+                    if state != sent:
+                        sent = state
+                        yield _sse_event('version', info, event_id=info['version'])
+                # Each client waits on the poller's condition until its next publish
+                if poller.wait_for_version(published, timeout=EVENTS_KEEPALIVE_SECONDS) is None:
+                    yield ": keepalive\n\n"
+
+        response = Response(stream(), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        # Keeps reverse proxies such as nginx from buffering the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    return app
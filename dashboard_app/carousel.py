@@ -0,0 +1,195 @@
+# dashboard_app/carousel.py
+import collections
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from dashboard_app.table_renderer import TABLE_CSS, TABLE_HEAD, TABLE_TAIL, table_renderer
+from data_processing.indexing import page_offsets
+from instrumentation import metrics
+
+# (label, status column, status text) of the key metrics after 'Total Shipments', in display order
+STATUS_METRICS = [
+    ("Prep On Process", 'Status Preparation', 'On Process'),
+    ("Prep Delayed", 'Status Preparation', 'Delay'),
+    ("Prep Finished", 'Status Preparation', 'Finished'),
+    ("Load On Process", 'Status Loading', 'On Process'),
+    ("Load Delayed", 'Status Loading', 'Delay'),
+    ("Load Finished", 'Status Loading', 'Finished'),
+]
+
+
+@dataclass(frozen=True)
+class Slide:
+    """
+    One carousel slide: a page of one terminal's rows, or all rows of one ship no.
+
+    `positions` are the snapshot rows shown on the slide and `html` is their
+    rendered table. `metrics` are the (label, value) pairs of the key metrics,
+    computed over the whole terminal for terminal pages.
+    """
+    kind: str
+    value: object
+    page: int
+    pages: int
+    positions: np.ndarray
+    header: str
+    metrics_header: str
+    html: str
+    metrics: tuple
+
+
+def key_metrics(df):
+    """
+    Counts the shipments of `df` by preparation and loading status.
+
+    Returns:
+        tuple: (label, value) pairs, starting with ("Total Shipments", row count).
+    """
+    counts = {col: df[col].value_counts() for col in {col for _, col, _ in STATUS_METRICS}}
+    return (("Total Shipments", len(df)),) + tuple(
+        (label, int(counts[col].get(status, 0))) for label, col, status in STATUS_METRICS
+    )
+
+
+class _StatusCounter:
+    """Counts the key-metric statuses of any set of rows with one comparison per metric."""
+
+    def __init__(self, df):
+        self._matches = [
+            (label, (df[col] == status).to_numpy(dtype=bool) if col in df.columns else np.zeros(len(df), bool))
+            for label, col, status in STATUS_METRICS
+        ]
+
+    def metrics(self, positions):
+        return (("Total Shipments", len(positions)),) + tuple(
+            (label, int(np.count_nonzero(matches[positions]))) for label, matches in self._matches
+        )
+
+
+def build_slides(df, index, positions, version, rows_per_page, delta=None):
+    """
+    Builds every slide of the carousel for the filtered rows of one snapshot.
+
+    The terminal pages come first, in terminal order, followed by one slide
+    per ship no. Each slide's table HTML and metrics are computed here, so
+    showing a slide does no work beyond looking it up.
+
+    Args:
+        df (pd.DataFrame): The snapshot data; its index is the row key.
+        index (SnapshotIndex): The snapshot's index.
+        positions (np.ndarray): Filtered row positions, in their original order.
+        version: The snapshot version, for the shared row fragment cache.
+        rows_per_page (int): Rows per terminal page.
+        delta (SnapshotDelta, optional): Changes from the previous version.
+
+    Returns:
+        tuple: The slides, in carousel order.
+    """
+    # Every filtered row is rendered (or taken from the shared cache) once, then looked up by position
+    fragments = np.empty(len(df), dtype=object)
+    fragments[positions] = table_renderer.render_rows(df.iloc[positions], version, delta)
+    counter = _StatusCounter(df)
+
+    def table_html(slide_positions):
+        return TABLE_CSS + TABLE_HEAD + ''.join(fragments[slide_positions]) + TABLE_TAIL
+
+    slides = []
+    for terminal, terminal_positions in index.split_by_terminal(positions):
+        pages = page_offsets(len(terminal_positions), rows_per_page)
+        metrics = counter.metrics(terminal_positions)
+        display_val = int(terminal)
+        for page, (start_row, end_row) in enumerate(pages):
+            page_positions = terminal_positions[start_row:end_row]
+            page_indicator = f" (Page {page + 1}/{len(pages)})" if len(pages) > 1 else ""
+            slides.append(Slide(
+                kind='terminal',
+                value=terminal,
+                page=page,
+                pages=len(pages),
+                positions=page_positions,
+                header=f"Shipment Details for: Ter. {display_val}{page_indicator}",
+                metrics_header=f"Key Metrics for: Ter. {display_val}",
+                html=table_html(page_positions),
+                metrics=metrics,
+            ))
+
+    for ship_no, ship_positions in index.split_by_ship_no(positions):
+        slides.append(Slide(
+            kind='shipment',
+            value=ship_no,
+            page=0,
+            pages=1,
+            positions=ship_positions,
+            header=f"Shipment Details for: Ship no. {ship_no}",
+            metrics_header=f"Key Metrics for: Ship no. {ship_no}",
+            html=table_html(ship_positions),
+            metrics=counter.metrics(ship_positions),
+        ))
+    return tuple(slides)
+
+
+class CarouselCache:
+    """
+    Built carousels shared by every session, keyed by snapshot version, filters and rows per page.
+
+    Sessions with the same settings get the same slides, so a carousel is
+    built once per snapshot version no matter how many wallboards show it,
+    and advancing a slide is an index lookup. Builds run one at a time, so
+    sessions asking for the same carousel together wait for one build. The
+    least recently used carousels are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, key, df, index, positions, version, rows_per_page, delta=None):
+        """
+        Returns the slides for `key`, building them with `build_slides` the first time.
+
+        Args:
+            key (tuple): Identifies the carousel; must include the version, filters and rows per page.
+            Other arguments: As for `build_slides`.
+
+        Returns:
+            tuple: The slides, in carousel order.
+        """
+        slides = self._lookup(key)
+        if slides is not None:
+            return slides
+        with self._build_lock:
+            # Another session may have built it while this one waited
+            slides = self._lookup(key)
+            if slides is not None:
+                return slides
+            with metrics.span('carousel_build'):
+                slides = build_slides(df, index, positions, version, rows_per_page, delta)
+            with self._lock:
+                self.builds += 1
+                self._entries[key] = slides
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return slides
+
+    def gauges(self):
+        """Returns the cache counters as metric gauges, for `instrumentation.metrics`."""
+        return {'carousel_cache_hits': self.hits, 'carousel_builds': self.builds, 'carousel_cached': len(self._entries)}
+
+    def _lookup(self, key):
+        with self._lock:
+            slides = self._entries.get(key)
+            if slides is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return slides
+
+
+# A single cache shared by every session in this server process
+carousel_cache = CarouselCache()
+metrics.register_collector(carousel_cache.gauges)
@@ -0,0 +1,60 @@
+# dashboard_app/live_table.py
+import os
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from dashboard_app.table_renderer import table_renderer
+
+_component = components.declare_component(
+    "live_table", path=os.path.join(os.path.dirname(__file__), "live_table_frontend")
+)
+
+
+def live_table(df, version, delta=None, key="shipment_table", html=None):
+    """
+    Shows the shipment table in a frame that stays open between reruns and is patched in place.
+
+    The first time, and whenever the frame cannot be patched, the whole
+    table is sent. After that only the rows that left the view, the rows
+    that are new to it and the rows the snapshot delta changed are sent, so
+    a refresh that flips a few status cells sends a few rows instead of the
+    whole table. When nothing changed, only the current token is sent.
+
+    Args:
+        df (pd.DataFrame): Rows of a normalized snapshot to show; its index is the row key.
+        version: The snapshot version of `df`.
+        delta (SnapshotDelta, optional): Changes from the previous snapshot version.
+        key (str, optional): Widget key of the table. Defaults to "shipment_table".
+        html (str, optional): The full table of `df`, if it was already rendered.
+
+    Returns:
+        dict: The message that was sent to the frame.
+    """
+    state_key = f"{key}_state"
+    if state_key not in st.session_state:
+        st.session_state[state_key] = {'token': 0, 'version': None, 'keys': None, 'resync': None}
+    state = st.session_state[state_key]
+
+    # The frame asks for the whole table by setting a new resync value
+    value = st.session_state.get(key) or {}
+    resync = value.get('resync')
+    patch = None
+    if state['keys'] is not None and resync == state['resync']:
+        patch = table_renderer.render_patch(df, version, state['version'], state['keys'], delta)
+    state['resync'] = resync
+
+    if patch is not None and not patch['remove'] and not patch['rows'] and patch['order'] is None:
+        message = {'token': state['token'], 'base': state['token']}
+    else:
+        token = state['token'] + 1
+        if patch is None:
+            if html is None:
+                html = table_renderer.render(df, version, delta)
+            message = {'token': token, 'base': None, 'html': html}
+        else:
+            message = {'token': token, 'base': state['token'], **patch}
+        state.update(token=token, version=version, keys=df.index.tolist())
+
+    _component(message=message, key=key, default=None)
+    return message
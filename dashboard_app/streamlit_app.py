@@ -4,73 +4,32 @@ import streamlit as st
 import pandas as pd
 import datetime
 import time
-import numpy as np # Import numpy to handle NaN values
-import streamlit.components.v1 as components # Import for rendering raw HTML
 
 # These imports are still needed to load the data
-from data_processing import loader, cleaning
+from dashboard_app.carousel import carousel_cache, key_metrics
+from dashboard_app.live_table import live_table
+from data_processing import rollups
+from data_processing.parsing import REQUIRED_COLUMNS
+from data_processing.poller import get_poller
+from data_processing.snapshot import snapshot_store
 from onedrive_api.errors import OneDriveError
+from config import settings
+from instrumentation import metrics, start_metrics_server
 
-def get_status_style(status_text):
-    """
-    Returns a background and text color based on the status text from Excel.
-    """
-    status = str(status_text).strip()
-    if 'Finished' in status:
-        return 'background-color: #28a745; color: white; font-weight: bold;'
-    elif 'Delay' in status:
-        return 'background-color: #dc3545; color: white; font-weight: bold;'
-    elif 'On Process' in status:
-        return 'background-color: #ffc107; color: black; font-weight: bold;'
-    return 'background-color: white; color: black; font-weight: bold;' # Default style
-
-def format_time_display(value):
-    """
-    Helper function to format time values from Excel into HH:MM strings.
-    Returns '-' if the value is not a valid time. This version is more robust.
-    """
-    if pd.isna(value):
-        return '-'
-    try:
-        # This will attempt to convert strings like '16:25' or '09:20:00 AM'
-        # and also handle existing datetime/time objects.
-        # The format string %H:%M ensures we only get hours and minutes.
-        return pd.to_datetime(str(value), errors='raise').strftime('%H:%M')
-    except (ValueError, TypeError):
-        # If any conversion fails, return a dash
-        return '-'
-
-def format_value_display(value):
-    """
-    Helper function to format values for display.
-    - Shows integers for numbers like Ter. and Ship no.
-    - Shows a dash for blank cells.
-    - Shows other values as they are.
-    """
-    if pd.isna(value):
-        return '-'
-    if isinstance(value, float) and value.is_integer():
-        return str(int(value))
-    return str(value)
+# Timers that fire slightly early still count as due
+SCHEDULE_TOLERANCE = datetime.timedelta(milliseconds=500)
+# How often a board showing a snapshot restored from disk checks whether fresh data has arrived
+RESTORED_RECHECK_SECONDS = 3
 
 
-def format_status_display(status_value):
-    """
-    Helper function to format the status text with icons.
-    Returns '-' if the status is blank or NaN.
-    """
-    if pd.isna(status_value) or status_value == '':
-        return '-'
-    
-    status = str(status_value).strip()
-    if status == 'On Process':
-        return f"⏳ {status}"
-    elif status == 'Delay(F)':
-        return f"❗ {status}"
-    elif status == 'Finished':
-        return f"✅ {status}"
-    return status # Return the value as-is if it's something unexpected
-
+def format_age(delta):
+    """Formats a timedelta as a short age such as '45 s', '12 min' or '3 h 5 min'."""
+    seconds = int(delta.total_seconds())
+    if seconds < 60:
+        return f"{seconds} s"
+    if seconds < 3600:
+        return f"{seconds // 60} min"
+    return f"{seconds // 3600} h {seconds % 3600 // 60} min"
 
 def main_dashboard():
     """
@@ -78,6 +37,13 @@ def main_dashboard():
     """
     st.set_page_config(layout="wide")
 
+    # Shown in the app and in the logs on Streamlit Cloud when secrets are missing
+    if settings.missing_required:
+        st.error(
+            f"Authentication secrets ({', '.join(settings.missing_required)}) are not set. "
+            "Please add them to your Streamlit Cloud secrets, a settings.toml file or environment variables."
+        )
+
     # --- CUSTOM CSS INJECTION ---
     st.markdown("""
     <style>
@@ -102,34 +68,69 @@ def main_dashboard():
         st.session_state.error = None
     if 'last_load_time' not in st.session_state:
         st.session_state.last_load_time = None
+    if 'data_version' not in st.session_state:
+        st.session_state.data_version = None
+    if 'data_index' not in st.session_state:
+        st.session_state.data_index = None
+    if 'data_delta' not in st.session_state:
+        st.session_state.data_delta = None
+    if 'data_restored' not in st.session_state:
+        st.session_state.data_restored = False
     if 'carousel_index' not in st.session_state:
         st.session_state.carousel_index = 0
     if 'next_update' not in st.session_state:
         st.session_state.next_update = datetime.datetime.now()
     if 'next_carousel_slide' not in st.session_state:
         st.session_state.next_carousel_slide = datetime.datetime.now()
+    if 'rerun_count' not in st.session_state:
+        st.session_state.rerun_count = 0
+    if 'board_rerun_count' not in st.session_state:
+        st.session_state.board_rerun_count = 0
+
+    st.session_state.rerun_count += 1
+    metrics.increment('dashboard_reruns')
+
 
+    # One background poller per server process fetches new versions for every session.
+    # After a restart it first restores the last good snapshot from disk.
+    get_poller()
+    if settings.METRICS_PORT:
+        start_metrics_server(settings.METRICS_PORT, host=settings.METRICS_HOST)
 
     # --- DATA LOADING FUNCTION ---
+    # All sessions share one snapshot. Sessions only pick up the latest published
+    # version; they fetch themselves only before the first one exists or on demand.
     def load_data_from_onedrive(force_rerun=False):
         with st.spinner("Connecting to OneDrive and fetching data..."):
             try:
-                raw_df = loader.load_excel_from_onedrive()
-                cleaned_df = cleaning.clean_data(raw_df)
-                
-                if 'Completion time' in cleaned_df.columns:
-                    cleaned_df['Completion time'] = pd.to_datetime(cleaned_df['Completion time'], errors='coerce')
+                if force_rerun:
+                    snapshot = snapshot_store.refresh()
+                else:
+                    snapshot = snapshot_store.current() or snapshot_store.get()
 
-                st.session_state.data = cleaned_df
+                st.session_state.data = snapshot.data
+                st.session_state.data_version = snapshot.version
+                st.session_state.data_index = snapshot.index
+                st.session_state.data_delta = snapshot.delta
+                st.session_state.data_restored = snapshot.restored
                 st.session_state.error = None
-                st.session_state.last_load_time = datetime.datetime.now()
+                st.session_state.last_load_time = snapshot.loaded_at
             except Exception as e:
                 st.session_state.error = f"An error occurred: {e}"
-                st.session_state.data = None
+                # Keep showing the last good snapshot if there is one; it is marked as stale
+                if snapshot_store.current() is None:
+                    st.session_state.data = None
         
         if force_rerun:
             st.rerun()
 
+    # Defaults for the controls that are only shown in some states
+    selected_site = 'All'
+    selected_terminal = 'All'
+    selected_ship_no = 'All'
+    carousel_interval = None
+    rows_per_page = None
+
     # --- SIDEBAR FOR CONTROLS ---
     with st.sidebar:
         st.header("🚚 Actions & Settings")
@@ -138,9 +139,15 @@ def main_dashboard():
 
         if st.session_state.last_load_time:
             st.caption(f"Data last loaded: {st.session_state.last_load_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            if st.session_state.data is not None and snapshot_store.current() is not None:
+                st.caption(f"Last checked for changes: {snapshot_store.current().checked_at.strftime('%Y-%m-%d %H:%M:%S')}")
+            st.caption(f"Shared snapshot fetches avoided: {snapshot_store.fetches_avoided}, unchanged downloads skipped: {snapshot_store.unchanged_fetches}")
+            if snapshot_store.current() is not None and snapshot_store.current().memory_bytes:
+                st.caption(f"Snapshot memory (shared by all sessions): {snapshot_store.current().memory_bytes / 1e6:.1f} MB")
         
         st.header("Self-Update")
         # The toggle has been removed. Self-update is now always on.
+        # This is how often the board looks for a new version; the server polls OneDrive on its own schedule.
         refresh_interval = st.number_input("Refresh interval (s)", min_value=10, max_value=3600, value=60)
         
         st.divider()
@@ -148,9 +155,11 @@ def main_dashboard():
         # --- NEW COLLAPSIBLE FILTER SECTION ---
         with st.expander("📊 Data Filters", expanded=True):
             # --- SMART DATE FILTER ---
-            if st.session_state.data is not None and not st.session_state.data.empty and 'Completion time' in st.session_state.data:
-                min_date = st.session_state.data['Completion time'].dropna().min().date()
-                max_date = st.session_state.data['Completion time'].dropna().max().date()
+            # Date bounds and dropdown options come from the snapshot's prebuilt index
+            data_index = st.session_state.data_index
+            if st.session_state.data is not None and data_index is not None and data_index.min_date is not None:
+                min_date = data_index.min_date
+                max_date = data_index.max_date
             else:
                 min_date = datetime.date.today() - datetime.timedelta(days=30)
                 max_date = datetime.date.today()
@@ -162,11 +171,15 @@ def main_dashboard():
                 st.error("Error: End date must be after start date.")
             
             # --- FILTERS WITH SELECTBOX (DROPDOWN) ---
-            if st.session_state.data is not None:
-                all_terminals = ['All'] + sorted(st.session_state.data['Ter.'].dropna().unique())
+            if st.session_state.data is not None and data_index is not None:
+                # Only a snapshot merged from several sites has sites to choose from
+                if data_index.site_options:
+                    selected_site = st.selectbox("Filter by Site", options=['All'] + data_index.site_options)
+
+                all_terminals = ['All'] + data_index.terminal_options
                 selected_terminal = st.selectbox("Filter by Terminal", options=all_terminals)
 
-                all_ship_nos = ['All'] + sorted(st.session_state.data['Ship no.'].dropna().unique())
+                all_ship_nos = ['All'] + data_index.ship_no_options
                 selected_ship_no = st.selectbox("Filter by Ship no.", options=all_ship_nos)
         
         st.divider()
@@ -177,178 +190,170 @@ def main_dashboard():
             carousel_interval = st.number_input("Carousel interval (seconds)", min_value=5, max_value=60, value=10)
             rows_per_page = st.number_input("Rows per page", min_value=1, max_value=50, value=7)
 
+        # --- DEBUG PANEL ---
+        if settings.DEBUG_PANEL:
+            with st.expander("🔧 Pipeline metrics", expanded=False):
+                st.caption(f"This session: {st.session_state.rerun_count} reruns, "
+                           f"{st.session_state.board_rerun_count} board updates")
+                stages = metrics.stage_stats()
+                if stages:
+                    st.dataframe(pd.DataFrame([
+                        {'Stage': stage, 'Runs': stats['count'], 'Last (ms)': stats['last'] * 1e3,
+                         'p50 (ms)': stats['p50'] * 1e3, 'p95 (ms)': stats['p95'] * 1e3}
+                        for stage, stats in stages.items()
+                    ]).set_index('Stage').round(1))
+                counters = {**metrics.counters(), **metrics.gauges()}
+                st.dataframe(pd.Series({name: str(value) for name, value in counters.items()}, name='Value'))
+
     # --- Initial Data Load ---
     if st.session_state.data is None:
         load_data_from_onedrive()
+        # Rebuild the sidebar with the loaded data's date range and dropdowns
+        if st.session_state.data is not None:
+            st.rerun()
 
-    # --- STABLE SELF-UPDATE LOGIC ---
-    now = datetime.datetime.now()
-    if now >= st.session_state.next_update:
-        load_data_from_onedrive()
-        st.session_state.next_update = now + datetime.timedelta(seconds=refresh_interval)
-        st.rerun()
-
-    # --- MAIN DASHBOARD DISPLAY ---
-    if st.session_state.data is not None:
-        df = st.session_state.data.copy()
-
-        # --- DATA VALIDATION ---
-        required_cols = ['Completion time', 'Ter.', 'Dock Code', 'Truck Route', 'Status Preparation', 'Status Loading', 'Ship no.', 'Preparation Start', 'Preparation End', 'Loading Start', 'Loading End']
-        if not all(col in df.columns for col in required_cols):
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            st.error(f"Error: The following required columns are missing from the Excel file: {', '.join(missing_cols)}")
-            st.warning("Please check the 'Databaseshippingboard' sheet in your Excel file.")
-            st.subheader("Columns Found:")
-            st.write(list(df.columns))
-        else:
-            # Filter by date range using 'Completion time'
-            start_datetime = datetime.datetime.combine(start_date, datetime.time.min)
-            end_datetime = datetime.datetime.combine(end_date, datetime.time.max)
-            date_mask = (df['Completion time'] >= start_datetime) & (df['Completion time'] <= end_datetime)
-            filtered_df = df.loc[date_mask].copy()
-
-            # Apply single-select filters
-            if 'selected_terminal' in locals() and selected_terminal != 'All':
-                filtered_df = filtered_df[filtered_df['Ter.'] == selected_terminal]
-            if 'selected_ship_no' in locals() and selected_ship_no != 'All':
-                filtered_df = filtered_df[filtered_df['Ship no.'] == selected_ship_no]
-            
-            if filtered_df.empty:
-                st.info("No shipping data found for the selected filters.")
-                
+    # --- EVENT-DRIVEN REFRESH SCHEDULING ---
+    # The board below is a fragment that Streamlit wakes on a timer, so between
+    # user interactions only the board reruns, and only when the next data
+    # check or carousel slide is due, instead of the whole script every second.
+    wake_interval = min(refresh_interval, carousel_interval) if carousel_enabled else refresh_interval
+    if st.session_state.data_restored:
+        # Pick up the fresh snapshot soon after the background fetch finishes
+        wake_interval = min(wake_interval, RESTORED_RECHECK_SECONDS)
+
+    @st.fragment(run_every=datetime.timedelta(seconds=wake_interval))
+    def shipping_board():
+        now = datetime.datetime.now()
+        started = time.perf_counter()
+        slides = ()
+        st.session_state.board_rerun_count += 1
+        metrics.increment('board_reruns')
+
+        # --- STABLE SELF-UPDATE LOGIC ---
+        if st.session_state.data_restored or now >= st.session_state.next_update - SCHEDULE_TOLERANCE:
+            rendered_version = st.session_state.data_version
+            was_restored = st.session_state.data_restored
+            load_data_from_onedrive()
+            st.session_state.next_update = now + datetime.timedelta(seconds=refresh_interval)
+            # New data can change the sidebar's date range and dropdowns, and a confirmed
+            # restored snapshot no longer needs the quick recheck, so rerun the whole page
+            if st.session_state.data_version != rendered_version or was_restored != st.session_state.data_restored:
+                st.rerun(scope="app")
+
+        # --- WARM START NOTICE ---
+        if st.session_state.data is not None and st.session_state.data_restored:
+            age = format_age(now - st.session_state.last_load_time)
+            st.info(
+                f"Showing the last saved data, loaded at {st.session_state.last_load_time.strftime('%Y-%m-%d %H:%M:%S')} "
+                f"({age} ago). Fresh data is being fetched in the background."
+            )
+
+        # --- STALE DATA NOTICE ---
+        if st.session_state.data is not None and snapshot_store.is_stale:
+            st.warning(
+                f"Showing data loaded at {st.session_state.last_load_time.strftime('%H:%M:%S')}. "
+                f"The latest refresh failed and will be retried: {snapshot_store.last_error}"
+            )
+
+        # --- MAIN DASHBOARD DISPLAY ---
+        if st.session_state.data is not None:
+            # The snapshot is shared between sessions, so read it without copying.
+            df = st.session_state.data
+            data_index = st.session_state.data_index
+
+            # --- DATA VALIDATION ---
+            required_cols = REQUIRED_COLUMNS
+            if not all(col in df.columns for col in required_cols):
+                missing_cols = [col for col in required_cols if col not in df.columns]
+                st.error(f"Error: The following required columns are missing from the Excel file: {', '.join(missing_cols)}")
+                st.warning("Please check the 'Databaseshippingboard' sheet in your Excel file.")
+                st.subheader("Columns Found:")
+                st.write(list(df.columns))
             else:
-                # --- CAROUSEL LOGIC WITH PAGINATION ---
-                carousel_items = []
-                if carousel_enabled:
-                    # First, add paginated views for each terminal
-                    unique_terminals = sorted(filtered_df['Ter.'].dropna().unique())
-                    for terminal in unique_terminals:
-                        terminal_df = filtered_df[filtered_df['Ter.'] == terminal]
-                        num_shipments = len(terminal_df)
-                        num_pages = int(np.ceil(num_shipments / rows_per_page))
-                        for page in range(num_pages):
-                            carousel_items.append({'type': 'terminal', 'value': terminal, 'page': page})
-                    
-                    # Then, add views for each individual shipment number
-                    unique_shipments = sorted(filtered_df['Ship no.'].dropna().unique())
-                    for ship_no in unique_shipments:
-                        carousel_items.append({'type': 'shipment', 'value': ship_no, 'page': 0})
-
-
-                display_df = filtered_df
-                metrics_df = filtered_df
-                metrics_header_text = "Key Metrics for Filtered Data"
+                # Filter by date range, site, terminal and ship no. using the snapshot index.
+                # Only the matching rows are taken from the frame; nothing else is copied.
+                site_filter = selected_site if selected_site != 'All' else None
+                terminal_filter = selected_terminal if selected_terminal != 'All' else None
+                ship_no_filter = selected_ship_no if selected_ship_no != 'All' else None
+                with metrics.span('filter'):
+                    filtered_positions = data_index.filter(
+                        start_date, end_date, terminal=terminal_filter, ship_no=ship_no_filter, site=site_filter,
+                    )
+                filtered_df = df.iloc[filtered_positions]
+            
+                if filtered_df.empty:
+                    st.info("No shipping data found for the selected filters.")
                 
-                if carousel_enabled and carousel_items:
-                    if st.session_state.carousel_index >= len(carousel_items):
-                        st.session_state.carousel_index = 0
-                    
-                    current_item = carousel_items[st.session_state.carousel_index]
-                    item_type = current_item['type']
-                    item_value = current_item['value']
-                    
-                    if item_type == 'terminal':
-                        current_page = current_item['page']
-                        terminal_df = filtered_df[filtered_df['Ter.'] == item_value]
-                        start_row = current_page * rows_per_page
-                        end_row = start_row + rows_per_page
-                        display_df = terminal_df.iloc[start_row:end_row]
-                        metrics_df = terminal_df
-                        
-                        display_val = int(item_value)
-                        total_pages = int(np.ceil(len(terminal_df) / rows_per_page))
-                        page_indicator = f" (Page {current_page + 1}/{total_pages})" if total_pages > 1 else ""
-                        st.markdown(f"<p class='big-header'>Shipment Details for: Ter. {display_val}{page_indicator}</p>", unsafe_allow_html=True)
-                        metrics_header_text = f"Key Metrics for: Ter. {display_val}"
-                    
-                    elif item_type == 'shipment':
-                        display_df = filtered_df[filtered_df['Ship no.'] == item_value]
-                        metrics_df = display_df
-                        st.markdown(f"<p class='big-header'>Shipment Details for: Ship no. {item_value}</p>", unsafe_allow_html=True)
-                        metrics_header_text = f"Key Metrics for: Ship no. {item_value}"
-
                 else:
-                    st.markdown("<p class='big-header'>Shipment Details</p>", unsafe_allow_html=True)
-
-                # --- BUILD CUSTOM HTML TABLE ---
-                html_table = """
-                <table style="width: 100%; border-collapse: collapse; border: 1px solid #ddd;">
-                    <thead style="background-color: #F0F4FF; color: #1E3A8A;">
-                        <tr>
-                            <th style="font-size: 1.8rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">Ter.</th>
-                            <th style="font-size: 1.8rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">Ship no.</th>
-                            <th style="font-size: 1.8rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">Dock Code</th>
-                            <th style="font-size: 1.8rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">Truck Route</th>
-                            <th style="font-size: 1.8rem; font-weight: bold; padding: 0.2rem; text-align: center; border: 1px solid #ddd;">Preparation Start</th>
-                            <th style="font-size: 1.8rem; font-weight: bold; padding: 0.2rem; text-align: center; border: 1px solid #ddd;">Preparation End</th>
-                            <th style="font-size: 1.8rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">Loading Start</th>
-                            <th style="font-size: 1.8rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">Loading End</th>
-                            <th style="font-size: 1.8rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">Status Preparation</th>
-                            <th style="font-size: 1.8rem; font-weight: bold; padding: 2rem; text-align: center; border: 1px solid #ddd;">Status Loading</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                """
-                for _, row in display_df.iterrows():
-                    ter_display = format_value_display(row['Ter.'])
-                    ship_no_display = format_value_display(row['Ship no.'])
-                    prep_start_display = format_time_display(row['Preparation Start'])
-                    prep_end_display = format_time_display(row['Preparation End'])
-                    load_start_display = format_time_display(row['Loading Start'])
-                    load_end_display = format_time_display(row['Loading End'])
-                    
-                    prep_status_text = format_status_display(row['Status Preparation'])
-                    load_status_text = format_status_display(row['Status Loading'])
-                    
-                    prep_style = get_status_style(row['Status Preparation'])
-                    load_style = get_status_style(row['Status Loading'])
-                    
-                    html_table += f"""
-                    <tr style="border-bottom: 1px solid #ddd;">
-                        <td style="font-size: 1.5rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">{ter_display}</td>
-                        <td style="font-size: 1.5rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">{ship_no_display}</td>
-                        <td style="font-size: 1.5rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">{format_value_display(row['Dock Code'])}</td>
-                        <td style="font-size: 1.5rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">{format_value_display(row['Truck Route'])}</td>
-                        <td style="font-size: 1.5rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">{prep_start_display}</td>
-                        <td style="font-size: 1.5rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">{prep_end_display}</td>
-                        <td style="font-size: 1.5rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">{load_start_display}</td>
-                        <td style="font-size: 1.5rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd;">{load_end_display}</td>
-                        <td style="{prep_style}; font-size: 1.5rem; padding: 1rem; text-align: center; border: 2px solid #ddd;">{prep_status_text}</td>
-                        <td style="{load_style}; font-size: 1.5rem; padding: 1rem; text-align: center; border: 1px solid #ddd;">{load_status_text}</td>
-                    </tr>
-                    """
-                html_table += "</tbody></table>"
-                
-                table_height = (len(display_df) * 120) + 80
-                components.html(html_table, height=table_height, scrolling=True)
-
-                # --- KEY METRICS ---
-                st.markdown(f"<p class='big-header'>{metrics_header_text}</p>", unsafe_allow_html=True)
-                total_shipments = len(metrics_df)
-                prep_counts = metrics_df['Status Preparation'].value_counts()
-                load_counts = metrics_df['Status Loading'].value_counts()
-                col1, col2, col3, col4 = st.columns(4)
-                col1.metric("Total Shipments", total_shipments)
-                col2.metric("Prep On Process", prep_counts.get('On Process', 0))
-                col3.metric("Prep Delayed", prep_counts.get('Delay', 0))
-                col4.metric("Prep Finished", prep_counts.get('Finished', 0))
-                col5, col6, col7, _ = st.columns(4)
-                col5.metric("Load On Process", load_counts.get('On Process', 0))
-                col6.metric("Load Delayed", load_counts.get('Delay', 0))
-                col7.metric("Load Finished", load_counts.get('Finished', 0))
-
-    elif st.session_state.error:
-        st.error(f"Could not display dashboard due to a previous error: {st.session_state.error}")
-    else:
-        st.info("Click the 'Load/Refresh Data' button in the sidebar to start.")
-
-    # --- STABLE TIMING LOGIC ---
-    if carousel_enabled and 'carousel_items' in locals() and carousel_items:
-        if now >= st.session_state.next_carousel_slide:
-            st.session_state.carousel_index = (st.session_state.carousel_index + 1) % len(carousel_items)
-            st.session_state.next_carousel_slide = now + datetime.timedelta(seconds=carousel_interval)
-            st.rerun()
-    
-    # This keeps the app alive for the timers to work
-    time.sleep(1)
-    st.rerun()
+                    # --- CAROUSEL LOGIC WITH PAGINATION ---
+                    # Every slide (the pages of each terminal, then each ship no.) is built once
+                    # per snapshot version, filters and page size, and shared by all sessions.
+                    if carousel_enabled:
+                        carousel_key = (st.session_state.data_version, start_date, end_date,
+                                        site_filter, terminal_filter, ship_no_filter, rows_per_page)
+                        slides = carousel_cache.get(
+                            carousel_key, df, data_index, filtered_positions,
+                            st.session_state.data_version, rows_per_page, st.session_state.data_delta,
+                        )
+
+                    if carousel_enabled and slides:
+                        if st.session_state.carousel_index >= len(slides):
+                            st.session_state.carousel_index = 0
+
+                        slide = slides[st.session_state.carousel_index]
+                        display_df = df.iloc[slide.positions]
+                        table_html = slide.html
+                        metric_values = slide.metrics
+                        metrics_header_text = slide.metrics_header
+                        st.markdown(f"<p class='big-header'>{slide.header}</p>", unsafe_allow_html=True)
+
+                    else:
+                        display_df = filtered_df
+                        table_html = None
+                        metric_values = key_metrics(filtered_df)
+                        metrics_header_text = "Key Metrics for Filtered Data"
+                        st.markdown("<p class='big-header'>Shipment Details</p>", unsafe_allow_html=True)
+
+                    # --- BUILD CUSTOM HTML TABLE ---
+                    # Row fragments are cached per snapshot version and shared by all sessions;
+                    # the table on screen is patched with only the rows that changed.
+                    with metrics.span('render_table'):
+                        live_table(display_df, st.session_state.data_version, st.session_state.data_delta, html=table_html)
+
+                    # --- KEY METRICS ---
+                    st.markdown(f"<p class='big-header'>{metrics_header_text}</p>", unsafe_allow_html=True)
+                    for row_metrics in (metric_values[:4], metric_values[4:]):
+                        for column, (label, value) in zip(st.columns(4), row_metrics):
+                            column.metric(label, value)
+
+                    # --- HISTORY KPIS ---
+                    # Answered from the pre-aggregated rollups, so longer history costs nothing here
+                    rollup_store = rollups.get_rollup_store()
+                    if not carousel_enabled and rollup_store is not None:
+                        with st.expander("📈 Route KPIs for the selected dates"):
+                            route_kpis = rollup_store.kpis(
+                                start_date, end_date, by=('Truck Route',), site=site_filter, terminal=terminal_filter,
+                            )
+                            if route_kpis.empty:
+                                st.caption("No history for these dates yet.")
+                            else:
+                                st.dataframe(route_kpis.style.format({
+                                    'Avg Prep (min)': '{:.0f}', 'Avg Load (min)': '{:.0f}',
+                                    'Prep Delay Rate': '{:.0%}', 'Load Delay Rate': '{:.0%}',
+                                }, na_rep='-'))
+
+        elif st.session_state.error:
+            st.error(f"Could not display dashboard due to a previous error: {st.session_state.error}")
+        else:
+            st.info("Click the 'Load/Refresh Data' button in the sidebar to start.")
+
+        # --- STABLE TIMING LOGIC ---
+        # The next slide is shown when the fragment wakes up again
+        if carousel_enabled and slides:
+            if now >= st.session_state.next_carousel_slide - SCHEDULE_TOLERANCE:
+                st.session_state.carousel_index = (st.session_state.carousel_index + 1) % len(slides)
+                st.session_state.next_carousel_slide = now + datetime.timedelta(seconds=carousel_interval)
+
+        metrics.observe('board_render', time.perf_counter() - started)
+
+    shipping_board()
@@ -0,0 +1,190 @@
+# dashboard_app/table_renderer.py
+import html
+import threading
+
+from data_processing.cleaning import STATUS_STYLES, display_column, status_code_column
+from instrumentation import metrics
+
+# (column, extra header class) in display order
+TABLE_COLUMNS = [
+    ('Ter.', ''),
+    ('Ship no.', ''),
+    ('Dock Code', ''),
+    ('Truck Route', ''),
+    ('Preparation Start', 'narrow'),
+    ('Preparation End', 'narrow'),
+    ('Loading Start', ''),
+    ('Loading End', ''),
+    ('Status Preparation', ''),
+    ('Status Loading', 'wide'),
+]
+
+# Every style is defined once here instead of inline on every cell
+TABLE_CSS = """
+<style>
+    table.shipments { width: 100%; border-collapse: collapse; border: 1px solid #ddd; }
+    table.shipments thead { background-color: #F0F4FF; color: #1E3A8A; }
+    table.shipments th { font-size: 1.8rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd; }
+    table.shipments th.narrow { padding: 0.2rem; }
+    table.shipments th.wide { padding: 2rem; }
+    table.shipments tr { border-bottom: 1px solid #ddd; }
+    table.shipments td { font-size: 1.5rem; font-weight: bold; padding: 1rem; text-align: center; border: 1px solid #ddd; }
+    table.shipments td.prep-status { border-width: 2px; }
+""" + "".join(
+    f"    table.shipments td.status-{code} {{ {style} }}\n" for code, style in STATUS_STYLES.items()
+) + "</style>\n"
+
+TABLE_HEAD = (
+    '<table class="shipments"><thead><tr>'
+    + "".join(
+        f'<th class="{css_class}">{html.escape(col)}</th>' if css_class else f'<th>{html.escape(col)}</th>'
+        for col, css_class in TABLE_COLUMNS
+    )
+    + '</tr></thead><tbody>'
+)
+TABLE_TAIL = '</tbody></table>'
+
+_ROW_COLUMNS = [display_column(col) for col, _ in TABLE_COLUMNS] + [
+    status_code_column('Status Preparation'),
+    status_code_column('Status Loading'),
+]
+
+
+def render_row(values, key=None):
+    """
+    Renders one table row from its precomputed display values and status codes.
+
+    The row key is written to a data-key attribute, so the row can be found
+    and replaced in the browser.
+    """
+    *cells, prep_code, load_code = values
+    *plain_cells, prep_status, load_status = [html.escape(str(cell)) for cell in cells]
+    return (
+        (f'<tr data-key="{html.escape(str(key))}">' if key is not None else '<tr>')
+        + ''.join(f'<td>{cell}</td>' for cell in plain_cells)
+        + f'<td class="prep-status status-{prep_code}">{prep_status}</td>'
+        + f'<td class="status-{load_code}">{load_status}</td>'
+        + '</tr>'
+    )
+
+
+class TableRenderer:
+    """
+    Renders the shipment table from cached row fragments.
+
+    Each row is rendered once per snapshot version and cached under its row
+    key, so showing the same data again only joins strings. The cache is
+    shared by every session and keeps fragments for the newest few versions.
+
+    When a new version comes with a delta from the previous one, the
+    fragments of the rows it did not change are carried over, so only the
+    changed rows are rendered again.
+    """
+
+    def __init__(self, max_versions=2):
+        self.max_versions = max_versions
+        self._fragments = {}  # version -> {row key: html}
+        self._lock = threading.Lock()
+        self.rendered_rows = 0
+        self.cached_rows = 0
+        self.carried_rows = 0
+
+    def _version_cache(self, version, delta=None):
+        with self._lock:
+            cache = self._fragments.get(version)
+            if cache is None:
+                cache = self._fragments[version] = {}
+                previous = self._fragments.get(delta.from_version) if delta is not None else None
+                if previous is not None and delta.to_version == version:
+                    changed = delta.changed
+                    cache.update((key, fragment) for key, fragment in previous.items() if key not in changed)
+                    self.carried_rows += len(cache)
+                for old_version in sorted(self._fragments)[:-self.max_versions]:
+                    if old_version != version:
+                        del self._fragments[old_version]
+            return cache
+
+    def render_rows(self, df, version, delta=None):
+        """
+        Returns the row fragments of `df`, rendering only rows not cached for this version.
+        """
+        cache = self._version_cache(version, delta)
+        missing = [key for key in df.index if key not in cache]
+        if missing:
+            rows = df.loc[missing, _ROW_COLUMNS].itertuples(index=True, name=None)
+            for key, *values in rows:
+                cache[key] = render_row(values, key)
+            self.rendered_rows += len(missing)
+        self.cached_rows += len(df) - len(missing)
+        return [cache[key] for key in df.index]
+
+    def gauges(self):
+        """Returns the row fragment counters as metric gauges, for `instrumentation.metrics`."""
+        return {
+            'table_rows_rendered': self.rendered_rows,
+            'table_rows_cached': self.cached_rows,
+            'table_rows_carried': self.carried_rows,
+        }
+
+    def render(self, df, version, delta=None):
+        """
+        Renders the full table for the rows of `df`.
+
+        Args:
+            df (pd.DataFrame): Rows of a normalized snapshot; its index is the row key.
+            version: The snapshot version the rows belong to.
+            delta (SnapshotDelta, optional): Changes from the previous version.
+
+        Returns:
+            str: The table HTML including its stylesheet.
+        """
+        return TABLE_CSS + TABLE_HEAD + ''.join(self.render_rows(df, version, delta)) + TABLE_TAIL
+
+    def render_patch(self, df, version, shown_version, shown_keys, delta=None):
+        """
+        Renders the changes that turn a table already on screen into the table for `df`.
+
+        Args:
+            df (pd.DataFrame): Rows to show; its index is the row key.
+            version: The snapshot version of `df`.
+            shown_version: The snapshot version of the rows on screen.
+            shown_keys (list): The row keys on screen, in order.
+            delta (SnapshotDelta, optional): Changes from the previous version.
+
+        Returns:
+            dict or None: 'remove' (keys to drop), 'rows' ({key: html} for rows
+            that are new on screen or changed), 'after' ({new key: key of the
+            row it follows, or None for the first row}) and 'order' (all keys,
+            only when rows on screen changed places). None if the rows on
+            screen are too old to patch and the whole table must be sent.
+        """
+        if shown_version == version:
+            changed = frozenset()
+        elif delta is not None and delta.from_version == shown_version and delta.to_version == version:
+            changed = frozenset(delta.updated)
+        else:
+            return None
+
+        keys = df.index.tolist()
+        key_set = set(keys)
+        shown = set(shown_keys)
+        fragments = self.render_rows(df, version, delta)
+        kept = [key for key in shown_keys if key in key_set]
+        reordered = kept != [key for key in keys if key in shown]
+        return {
+            'remove': [key for key in shown_keys if key not in key_set],
+            'rows': {
+                key: fragment for key, fragment in zip(keys, fragments)
+                if key not in shown or key in changed
+            },
+            'after': {} if reordered else {
+                key: keys[position - 1] if position else None
+                for position, key in enumerate(keys) if key not in shown
+            },
+            'order': keys if reordered else None,
+        }
+
+
+# A single renderer shared by every session in this server process
+table_renderer = TableRenderer()
+metrics.register_collector(table_renderer.gauges)
@@ -0,0 +1,138 @@
+# data_processing/__main__.py
+"""
+Fetches the shipping board from OneDrive, parses and cleans it, and exports it without the dashboard.
+
+    python -m data_processing --output board.parquet
+
+The output format follows the file extension (.csv, .parquet or .json).
+The version of the exported file is stored next to it in
+<output>.version.json, and a later run exits without downloading anything
+while the OneDrive file is unchanged, so the command can run from cron
+every few minutes. Settings are read as described in config.py.
+"""
+import argparse
+import contextlib
+import dataclasses
+import datetime
+import json
+import os
+import sys
+import time
+
+EXPORT_FORMATS = ('.csv', '.parquet', '.json')
+
+
+@contextlib.contextmanager
+def _stage(name, timings):
+    started = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - started
+
+
+def _version_path(output):
+    return f"{output}.version.json"
+
+
+def _read_exported_ctag(output):
+    try:
+        with open(_version_path(output), 'r', encoding='utf-8') as f:
+            return json.load(f).get('ctag')
+    except (OSError, ValueError):
+        return None
+
+
+def _export(df, output):
+    extension = os.path.splitext(output)[1].lower()
+    temp_path = f"{output}.tmp"
+    if extension == '.csv':
+        df.to_csv(temp_path, index=False)
+    elif extension == '.parquet':
+        df.to_parquet(temp_path, engine='pyarrow', index=False)
+    else:
+        df.to_json(temp_path, orient='records', date_format='iso')
+    os.replace(temp_path, output)
+
+
+def _write_version(output, version, rows):
+    record = dataclasses.asdict(version)
+    record.update(rows=rows, exported_at=datetime.datetime.now(datetime.timezone.utc).isoformat())
+    with open(_version_path(output), 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=2)
+
+
+def run(output, sheet_name=None, engine=None, force=False):
+    """
+    Runs fetch -> parse -> clean -> export once.
+
+    Args:
+        output (str): File to export to; the extension picks the format.
+        sheet_name (str, optional): Sheet to read. Defaults to settings.EXCEL_SHEET_NAME.
+        engine (str, optional): Parse engine. Defaults to settings.PARSE_ENGINE.
+        force (bool, optional): Export even when the file did not change since the last export.
+
+    Returns:
+        dict: Seconds spent per stage; empty when the file was unchanged.
+    """
+    # Imported here so `--help` and argument errors do not load pandas or requests
+    from config import settings
+    from data_processing import cleaning, parsing
+    from onedrive_api import files, workbook
+
+    sheet_name = sheet_name or settings.EXCEL_SHEET_NAME
+    engine = engine or settings.PARSE_ENGINE
+    timings = {}
+
+    with _stage('metadata', timings):
+        version = files.get_onedrive_file_metadata()
+    if not force and version.ctag and version.ctag == _read_exported_ctag(output):
+        return {}
+
+    if settings.FETCH_MODE in ('workbook', 'workbook_append'):
+        with _stage('fetch', timings):
+            header, rows = workbook.get_workbook_reader(sheet_name=sheet_name).read(
+                version, parsing.REQUIRED_COLUMNS, appended_only=settings.FETCH_MODE == 'workbook_append',
+            )
+        with _stage('parse', timings):
+            df = parsing.frame_from_values(header, rows)
+    else:
+        with _stage('fetch', timings):
+            stream, version = files.get_onedrive_file_content_if_changed(current_version=version)
+        with stream, _stage('parse', timings):
+            df = parsing.parse_workbook(stream, sheet_name=sheet_name, engine=engine)
+
+    with _stage('clean', timings):
+        df = cleaning.clean_data(df)
+    with _stage('export', timings):
+        _export(df, output)
+        _write_version(output, version, len(df))
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m data_processing', description=__doc__.strip().splitlines()[0],
+    )
+    parser.add_argument('--output', '-o', required=True, help='file to export to (.csv, .parquet or .json)')
+    parser.add_argument('--sheet', help='sheet to read (default: EXCEL_SHEET_NAME)')
+    parser.add_argument('--engine', help='parse engine (default: PARSE_ENGINE)')
+    parser.add_argument('--force', action='store_true', help='export even if the file is unchanged')
+    args = parser.parse_args(argv)
+    if os.path.splitext(args.output)[1].lower() not in EXPORT_FORMATS:
+        parser.error(f"--output must end in one of: {', '.join(EXPORT_FORMATS)}")
+
+    from config import settings
+    if settings.missing_required:
+        parser.error(f"Missing settings: {', '.join(settings.missing_required)}")
+
+    started = time.perf_counter()
+    timings = run(args.output, sheet_name=args.sheet, engine=args.engine, force=args.force)
+    if not timings:
+        print(f"Unchanged since the last export to {args.output}")
+        return 0
+    stages = ', '.join(f"{name} {seconds:.2f} s" for name, seconds in timings.items())
+    print(f"Exported {args.output} in {time.perf_counter() - started:.2f} s ({stages})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,41 @@
 # data_processing/cleaning.py
+import sys
+
+import numpy as np
 import pandas as pd
 
+TIME_COLUMNS = ['Preparation Start', 'Preparation End', 'Loading Start', 'Loading End']
+STATUS_COLUMNS = ['Status Preparation', 'Status Loading']
+VALUE_COLUMNS = ['Ter.', 'Ship no.', 'Dock Code', 'Truck Route']
+
+# Status codes, in the order they are checked against the status text
+STATUS_CODES = ['finished', 'delay', 'on_process', 'default']
+STATUS_STYLES = {
+    'finished': 'background-color: #28a745; color: white; font-weight: bold;',
+    'delay': 'background-color: #dc3545; color: white; font-weight: bold;',
+    'on_process': 'background-color: #ffc107; color: black; font-weight: bold;',
+    'default': 'background-color: white; color: black; font-weight: bold;',
+}
+STATUS_ICONS = {
+    'On Process': '⏳',
+    'Delay(F)': '❗',
+    'Finished': '✅',
+}
+
+# Text columns where at most this share of the values are distinct are stored as categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def display_column(col):
+    """Name of the precomputed display-string column for `col`."""
+    return f"{col} (display)"
+
+
+def status_code_column(col):
+    """Name of the precomputed status-code column for `col`."""
+    return f"{col} (code)"
+
+
 def clean_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     This is a safe version of the cleaning function.
@@ -11,4 +46,151 @@ def clean_data(df: pd.DataFrame) -> pd.DataFrame:
     
     # The original lines that were causing errors have been removed.
     # We now simply return the DataFrame.
-    return df
\ No newline at end of file
+    return df
+
+
+def _format_value(value):
+    # Whole numbers like Ter. and Ship no. are shown without a decimal part
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _format_status(value):
+    if value == '':
+        return '-'
+    status = str(value).strip()
+    icon = STATUS_ICONS.get(status)
+    return f"{icon} {status}" if icon else status
+
+
+def _status_code(value):
+    status = str(value).strip()
+    if 'Finished' in status:
+        return 'finished'
+    elif 'Delay' in status:
+        return 'delay'
+    elif 'On Process' in status:
+        return 'on_process'
+    return 'default'
+
+
+def _map_uniques(series, func, missing):
+    """
+    Applies `func` once per distinct non-blank value instead of once per cell.
+    """
+    uniques = series.dropna().unique()
+    mapping = {value: func(value) for value in uniques}
+    return series.map(mapping).fillna(missing).astype(object)
+
+
+def parse_time_of_day(series: pd.Series) -> pd.Series:
+    """
+    Parses time cells (time objects, '16:25', '09:20:00 AM', full datetimes) into
+    a timedelta since midnight. Values that cannot be parsed become NaT.
+    """
+    # Sheets repeat the same few hundred times, so only distinct values are parsed
+    uniques = series.dropna().unique()
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object).astype(str), errors='coerce', format='mixed')
+    time_of_day = parsed - parsed.dt.normalize()
+    # A Series keeps the mapping timedelta64 even when no value could be parsed
+    mapping = pd.Series(time_of_day.to_numpy(), index=uniques)
+    return series.map(mapping).astype('timedelta64[ns]')
+
+
+def format_time_of_day(series: pd.Series) -> pd.Series:
+    """
+    Formats a timedelta-since-midnight column as HH:MM strings, with '-' for blanks.
+    """
+    total_minutes = series.dt.total_seconds() // 60
+    hours = (total_minutes // 60).astype('Int64').astype(str).str.zfill(2)
+    minutes = (total_minutes % 60).astype('Int64').astype(str).str.zfill(2)
+    return (hours + ':' + minutes).where(series.notna(), '-').astype(object)
+
+
+def normalize_shipments(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepares a snapshot for display. Run once per snapshot, not per render.
+
+    - 'Completion time' becomes datetime64.
+    - The four time columns become timedelta since midnight.
+    - Every displayed column gets a precomputed display-string column.
+    - The status columns get a categorical status code, which selects the
+      cell style in STATUS_STYLES.
+    """
+    if 'Completion time' in df.columns:
+        df['Completion time'] = pd.to_datetime(df['Completion time'], errors='coerce')
+
+    for col in VALUE_COLUMNS:
+        if col in df.columns:
+            df[display_column(col)] = _map_uniques(df[col], _format_value, '-')
+
+    for col in TIME_COLUMNS:
+        if col in df.columns:
+            df[col] = parse_time_of_day(df[col])
+            df[display_column(col)] = format_time_of_day(df[col])
+
+    for col in STATUS_COLUMNS:
+        if col in df.columns:
+            df[display_column(col)] = _map_uniques(df[col], _format_status, '-')
+            codes = _map_uniques(df[col], _status_code, 'default')
+            df[status_code_column(col)] = pd.Categorical(codes, categories=STATUS_CODES)
+
+    return df
+
+
+def frame_memory_bytes(df: pd.DataFrame) -> int:
+    """Memory used by a DataFrame, including its index and the strings it holds."""
+    total = int(df.index.memory_usage(deep=True))
+    for col in df.columns:
+        values = df[col].to_numpy() if df[col].dtype == object else None
+        if values is not None and not values.flags.writeable:
+            # pandas cannot measure the strings of a read-only object array (see compact_snapshot)
+            total += values.nbytes + sum(sys.getsizeof(value) for value in values)
+        else:
+            total += int(df[col].memory_usage(index=False, deep=True))
+    return total
+
+
+def _read_only(values):
+    if isinstance(values, pd.Categorical):
+        codes = values.codes.copy()
+        codes.flags.writeable = False
+        return pd.Categorical.from_codes(codes, dtype=values.dtype)
+    if isinstance(values, np.ndarray):
+        values = values.copy()
+        values.flags.writeable = False
+    return values
+
+
+def _compact_column(series):
+    if series.dtype == object:
+        distinct = series.nunique(dropna=True)
+        if distinct <= len(series) * CATEGORY_MAX_UNIQUE_RATIO:
+            return series.astype('category')
+    elif pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast='integer')
+    return series
+
+
+def compact_snapshot(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrinks a normalized snapshot and makes it read-only. Run once per snapshot, after normalize_shipments.
+
+    - Text columns with few distinct values (Dock Code, Truck Route, the
+      statuses and the display strings) become categoricals.
+    - Integer columns like Ter. and Ship no. are downcast to the smallest
+      integer type that holds their values.
+    - Every column is backed by a read-only array. All sessions share the
+      snapshot, so an in-place write raises instead of changing the data
+      for everyone. Frames taken from it with `iloc` are independent copies.
+
+    Returns:
+        pd.DataFrame: The compacted frame with the same index and columns.
+    """
+    columns = {}
+    for col in df.columns:
+        series = _compact_column(df[col])
+        values = series.array if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+        columns[col] = _read_only(values)
+    return pd.DataFrame(columns, index=df.index, copy=False)
@@ -0,0 +1,100 @@
+# data_processing/diffing.py
+from dataclasses import dataclass
+
+import pandas as pd
+
+from data_processing.parsing import REQUIRED_COLUMNS
+
+# A shipment row is identified by these columns
+KEY_COLUMNS = ['Ship no.', 'Truck Route', 'Dock Code']
+# Separates the key parts, and the occurrence number of rows with the same key
+KEY_SEPARATOR = '|'
+OCCURRENCE_SEPARATOR = '#'
+
+
+@dataclass(frozen=True)
+class SnapshotDelta:
+    """
+    The rows that changed between two consecutive snapshot versions, by row key.
+    """
+    from_version: int
+    to_version: int
+    inserted: tuple
+    updated: tuple
+    deleted: tuple
+
+    @property
+    def changed(self):
+        """Keys whose rows from the old version can no longer be reused."""
+        return frozenset(self.updated) | frozenset(self.deleted)
+
+    @property
+    def is_empty(self):
+        return not (self.inserted or self.updated or self.deleted)
+
+    def __len__(self):
+        return len(self.inserted) + len(self.updated) + len(self.deleted)
+
+
+def _key_text(value):
+    # Whole numbers read as floats (a column with blanks) keep the same key as ints
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _key_part(series):
+    uniques = series.dropna().unique()
+    mapping = {value: _key_text(value) for value in uniques}
+    return series.map(mapping).fillna('').astype(str)
+
+
+def row_keys(df: pd.DataFrame) -> pd.Index:
+    """
+    Builds a unique, stable key for every row from KEY_COLUMNS.
+
+    Rows with the same Ship no., Truck Route and Dock Code are told apart by
+    the order in which they appear, e.g. "1042|R-7|D3#0" and "1042|R-7|D3#1".
+
+    Returns:
+        pd.Index: One string key per row.
+    """
+    parts = [_key_part(df[col]) if col in df.columns else pd.Series('', index=df.index) for col in KEY_COLUMNS]
+    base = parts[0].str.cat(parts[1:], sep=KEY_SEPARATOR)
+    occurrence = base.groupby(base, sort=False).cumcount().astype(str)
+    return pd.Index(base + OCCURRENCE_SEPARATOR + occurrence, name='Row key')
+
+
+def fingerprint(df: pd.DataFrame) -> pd.Series:
+    """
+    Hashes the source columns of every row, indexed by the frame's row keys.
+
+    Two versions of a row have the same hash exactly when none of its
+    source cells changed. Derived display columns are not hashed.
+    """
+    columns = [col for col in REQUIRED_COLUMNS if col in df.columns]
+    return pd.Series(pd.util.hash_pandas_object(df[columns], index=False).to_numpy(), index=df.index)
+
+
+def diff_fingerprints(old, new, from_version, to_version) -> SnapshotDelta:
+    """
+    Compares the fingerprints of two snapshot versions.
+
+    Args:
+        old (pd.Series): Fingerprint of the older version.
+        new (pd.Series): Fingerprint of the newer version.
+        from_version (int): Version number of the older snapshot.
+        to_version (int): Version number of the newer snapshot.
+
+    Returns:
+        SnapshotDelta: Inserted, updated and deleted row keys, each in row order.
+    """
+    common = new.index.intersection(old.index, sort=False)
+    changed = new.loc[common].to_numpy() != old.loc[common].to_numpy()
+    return SnapshotDelta(
+        from_version=from_version,
+        to_version=to_version,
+        inserted=tuple(new.index.difference(old.index, sort=False)),
+        updated=tuple(common[changed]),
+        deleted=tuple(old.index.difference(new.index, sort=False)),
+    )
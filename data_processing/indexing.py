@@ -0,0 +1,184 @@
+# data_processing/indexing.py
+import datetime
+
+import numpy as np
+import pandas as pd
+
+
+class _GroupIndex:
+    """
+    Row positions of a snapshot grouped by the values of one column.
+
+    Within each group, positions are sorted by 'Completion time' so a date
+    range inside a group is found with `searchsorted`.
+    """
+
+    def __init__(self, values, sorted_positions, sorted_times):
+        codes, uniques = pd.factorize(values, sort=True)
+        self.codes = codes  # per row of the snapshot, -1 for blanks
+        self.options = uniques.tolist() if hasattr(uniques, 'tolist') else list(uniques)
+        self._code_of = {value: code for code, value in enumerate(self.options)}
+
+        sorted_codes = codes[sorted_positions]
+        order = np.argsort(sorted_codes, kind='stable')
+        bounds = np.searchsorted(sorted_codes[order], np.arange(len(self.options) + 1))
+        self._positions = []
+        self._times = []
+        for code in range(len(self.options)):
+            members = order[bounds[code]:bounds[code + 1]]
+            self._positions.append(sorted_positions[members])
+            self._times.append(sorted_times[members])
+
+    def code_of(self, value):
+        return self._code_of.get(value, -1)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(array.nbytes for array in self._positions + self._times)
+
+    def group(self, value):
+        """Returns (positions, times) of the rows with this value, sorted by time."""
+        code = self.code_of(value)
+        if code < 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype='datetime64[ns]')
+        return self._positions[code], self._times[code]
+
+
+class SnapshotIndex:
+    """
+    Lookup structures for filtering one snapshot, built once when it is loaded.
+
+    - Rows with a 'Completion time', sorted by it, so date ranges are binary searches.
+    - Row positions grouped by 'Ter.' and by 'Ship no.', and by 'Site' when
+      the snapshot was merged from several sites.
+    - The sorted dropdown options and the date bounds for the sidebar.
+
+    Filtering returns row positions, and callers take only those rows instead
+    of masking and copying the whole frame.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.row_count = len(df)
+        if 'Completion time' in df.columns:
+            times = pd.to_datetime(df['Completion time'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        else:
+            times = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+        valid = np.flatnonzero(~np.isnat(times))
+        self._sorted_positions = valid[np.argsort(times[valid], kind='stable')]
+        self._sorted_times = times[self._sorted_positions]
+
+        empty = pd.Series([np.nan] * len(df), index=df.index)
+        self.terminals = _GroupIndex(
+            df['Ter.'] if 'Ter.' in df.columns else empty, self._sorted_positions, self._sorted_times
+        )
+        self.ship_nos = _GroupIndex(
+            df['Ship no.'] if 'Ship no.' in df.columns else empty, self._sorted_positions, self._sorted_times
+        )
+        self.sites = _GroupIndex(
+            df['Site'] if 'Site' in df.columns else empty, self._sorted_positions, self._sorted_times
+        )
+
+        if len(self._sorted_times):
+            self.min_date = pd.Timestamp(self._sorted_times[0]).date()
+            self.max_date = pd.Timestamp(self._sorted_times[-1]).date()
+        else:
+            self.min_date = self.max_date = None
+
+    @property
+    def nbytes(self):
+        """Memory held by the index arrays."""
+        return (
+            self._sorted_positions.nbytes + self._sorted_times.nbytes
+            + self.terminals.nbytes + self.ship_nos.nbytes + self.sites.nbytes
+        )
+
+    @property
+    def terminal_options(self):
+        return self.terminals.options
+
+    @property
+    def ship_no_options(self):
+        return self.ship_nos.options
+
+    @property
+    def site_options(self):
+        """The sites of a merged snapshot, or an empty list for a single workbook."""
+        return self.sites.options
+
+    @staticmethod
+    def _in_range(positions, times, start, end):
+        lo = np.searchsorted(times, np.datetime64(start, 'ns'), side='left')
+        hi = np.searchsorted(times, np.datetime64(end, 'ns'), side='right')
+        return positions[lo:hi]
+
+    def filter(self, start_date, end_date, terminal=None, ship_no=None, site=None):
+        """
+        Finds the rows completed between two dates, optionally for one terminal, ship no. and site.
+
+        Args:
+            start_date (datetime.date): First day to include.
+            end_date (datetime.date): Last day to include.
+            terminal (optional): 'Ter.' value to keep, or None for all.
+            ship_no (optional): 'Ship no.' value to keep, or None for all.
+            site (str, optional): 'Site' value to keep, or None for all.
+
+        Returns:
+            np.ndarray: Row positions in their original order.
+        """
+        start = datetime.datetime.combine(start_date, datetime.time.min)
+        end = datetime.datetime.combine(end_date, datetime.time.max)
+
+        if site is not None and terminal is None and ship_no is None:
+            return np.sort(self._in_range(*self.sites.group(site), start, end))
+        if terminal is None and ship_no is None:
+            positions = self._in_range(self._sorted_positions, self._sorted_times, start, end)
+        elif ship_no is None:
+            positions = self._in_range(*self.terminals.group(terminal), start, end)
+        elif terminal is None:
+            positions = self._in_range(*self.ship_nos.group(ship_no), start, end)
+        else:
+            # Start from the ship group, which is small, and check the terminal per row
+            positions = self._in_range(*self.ship_nos.group(ship_no), start, end)
+            positions = positions[self.terminals.codes[positions] == self.terminals.code_of(terminal)]
+        if site is not None:
+            positions = positions[self.sites.codes[positions] == self.sites.code_of(site)]
+        return np.sort(positions)
+
+    def split_by_terminal(self, positions):
+        """
+        Splits filtered row positions by terminal.
+
+        Returns:
+            list: (terminal, positions) pairs in terminal order, positions in original order.
+        """
+        return self._split(self.terminals, positions)
+
+    def split_by_ship_no(self, positions):
+        """
+        Splits filtered row positions by ship no.
+
+        Returns:
+            list: (ship no., positions) pairs in ship no. order, positions in original order.
+        """
+        return self._split(self.ship_nos, positions)
+
+    @staticmethod
+    def _split(groups, positions):
+        codes = groups.codes[positions]
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        present = np.unique(sorted_codes[sorted_codes >= 0])
+        starts = np.searchsorted(sorted_codes, present, side='left')
+        ends = np.searchsorted(sorted_codes, present, side='right')
+        return [
+            (groups.options[code], positions[order[lo:hi]])
+            for code, lo, hi in zip(present, starts, ends)
+        ]
+
+
+def page_offsets(row_count, rows_per_page):
+    """
+    Returns the (start, end) row offsets of each carousel page.
+    """
+    return [(start, min(start + rows_per_page, row_count)) for start in range(0, row_count, rows_per_page)]
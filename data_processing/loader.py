@@ -1,7 +1,8 @@
 # data_processing/loader.py
-import pandas as pd
-from onedrive_api import files
+from onedrive_api import files, workbook
 from config import settings # <-- Add this import
+from data_processing import parquet_cache, parsing
+from instrumentation import metrics
 
 def load_excel_from_onedrive(sheet_name=0):
     """
@@ -14,10 +15,74 @@ def load_excel_from_onedrive(sheet_name=0):
         pd.DataFrame: A DataFrame containing the Excel data.
     """ 
     try:
-        file_content_stream = files.get_onedrive_file_content()
-        # Use the sheet name from the config settings
-        df = pd.read_excel(file_content_stream, sheet_name=settings.EXCEL_SHEET_NAME, engine='openpyxl')
+        with files.get_onedrive_file_content() as file_content_stream:
+            # Use the sheet name from the config settings
+            df = parsing.parse_workbook(
+                file_content_stream,
+                sheet_name=settings.EXCEL_SHEET_NAME,
+                engine=settings.PARSE_ENGINE,
+            )
         return df
     except Exception as e:
         # Propagate the error or handle it as needed
         raise e
+
+
+def load_excel_from_onedrive_if_changed(known_version=None, source=None, parse=parsing.parse_workbook):
+    """
+    Loads the Excel file only if it changed since `known_version`.
+
+    A version that was parsed before (by this or another process) is read
+    from the local Parquet cache instead of being downloaded and parsed again.
+    Depending on `settings.FETCH_MODE`, a new version is either downloaded
+    as a whole file or read as cell values through the Graph workbook API.
+
+    Args:
+        known_version (files.FileVersion, optional): The version of the last loaded DataFrame.
+        source (sources.Source, optional): The site's workbook and sheet. Defaults to the
+            configured file and sheet.
+        parse (callable, optional): `parse(stream, sheet_name=..., engine=...)` for downloaded
+            workbooks, e.g. to parse in another process. Defaults to `parsing.parse_workbook`.
+
+    Returns:
+        tuple: (pd.DataFrame or None, files.FileVersion). The DataFrame is None when
+        the file is unchanged and the previous DataFrame can be reused.
+    """
+    if source is not None:
+        location = {'user_id': source.user_id, 'file_path': source.file_path}
+        sheet_name, site = source.sheet_name, source.site
+    else:
+        location = {}
+        sheet_name, site = settings.EXCEL_SHEET_NAME, None
+
+    current_version = files.get_onedrive_file_metadata(**location)
+    if known_version is not None and current_version.ctag == known_version.ctag:
+        return None, current_version
+
+    df = parquet_cache.read_cached_frame(current_version, sheet_name, site)
+    if df is not None:
+        metrics.increment('parquet_cache_hits')
+        return df, current_version
+    metrics.increment('parquet_cache_misses')
+
+    if settings.FETCH_MODE in ('workbook', 'workbook_append'):
+        with metrics.span('workbook_read'):
+            reader = workbook.get_workbook_reader(sheet_name=sheet_name, **location)
+            header, rows = reader.read(
+                current_version, parsing.REQUIRED_COLUMNS, appended_only=settings.FETCH_MODE == 'workbook_append',
+            )
+        with metrics.span('parse'):
+            df = parsing.frame_from_values(header, rows)
+        parquet_cache.write_cached_frame(current_version, sheet_name, df, site)
+        return df, current_version
+
+    file_content_stream, version = files.get_onedrive_file_content_if_changed(
+        known_version, current_version, **location,
+    )
+    if file_content_stream is None:
+        return None, version
+
+    with file_content_stream, metrics.span('parse'):
+        df = parse(file_content_stream, sheet_name=sheet_name, engine=settings.PARSE_ENGINE)
+    parquet_cache.write_cached_frame(version, sheet_name, df, site)
+    return df, version
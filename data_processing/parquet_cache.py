@@ -0,0 +1,78 @@
+# data_processing/parquet_cache.py
+import hashlib
+import os
+
+import pandas as pd
+
+from config import settings
+
+# How many parsed versions to keep on disk, per site
+MAX_CACHED_VERSIONS = 5
+
+
+def _cache_dir():
+    return settings.SNAPSHOT_CACHE_DIR
+
+
+def _site_prefix(site):
+    # Files of a site start with a short hash of its name, so each site's versions are pruned separately
+    return f"{hashlib.sha1(site.encode('utf-8')).hexdigest()[:8]}-" if site else ''
+
+
+def _cache_path(source_version, sheet_name, site=None):
+    key = f"{source_version.ctag}|{sheet_name}".encode('utf-8')
+    return os.path.join(_cache_dir(), f"{_site_prefix(site)}{hashlib.sha1(key).hexdigest()}.parquet")
+
+
+def read_cached_frame(source_version, sheet_name, site=None):
+    """
+    Returns the parsed DataFrame stored for this file version, or None if there is none.
+
+    Args:
+        source_version (files.FileVersion): The version of the source workbook.
+        sheet_name (str or int): The sheet that was parsed.
+        site (str, optional): The site the workbook belongs to, when several are loaded.
+    """
+    if source_version is None or not source_version.ctag:
+        return None
+    path = _cache_path(source_version, sheet_name, site)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path, engine='pyarrow')
+    except Exception:
+        # A broken cache file is just a cache miss
+        return None
+
+
+def write_cached_frame(source_version, sheet_name, df, site=None):
+    """
+    Stores a parsed DataFrame for this file version and removes old versions of the same site.
+    """
+    if source_version is None or not source_version.ctag:
+        return
+    try:
+        os.makedirs(_cache_dir(), exist_ok=True)
+        path = _cache_path(source_version, sheet_name, site)
+        temp_path = f"{path}.tmp"
+        df.to_parquet(temp_path, engine='pyarrow', index=False)
+        os.replace(temp_path, path)
+        _prune_cache(site)
+    except OSError:
+        # The cache is only an optimization; a read-only disk must not break loading
+        pass
+
+
+def _prune_cache(site=None):
+    directory = _cache_dir()
+    prefix = _site_prefix(site)
+    entries = [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith('.parquet') and (name.startswith(prefix) if prefix else '-' not in name)
+    ]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[MAX_CACHED_VERSIONS:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,249 @@
+# data_processing/parsing.py
+import datetime
+import importlib.util
+import io
+from operator import itemgetter
+
+import pandas as pd
+
+from data_processing.cleaning import TIME_COLUMNS
+
+# The only columns the dashboard uses
+REQUIRED_COLUMNS = [
+    'Completion time', 'Ter.', 'Dock Code', 'Truck Route', 'Status Preparation', 'Status Loading',
+    'Ship no.', 'Preparation Start', 'Preparation End', 'Loading Start', 'Loading End',
+]
+
+DATETIME_COLUMNS = ['Completion time']
+NUMERIC_COLUMNS = ['Ter.', 'Ship no.']
+TEXT_COLUMNS = [
+    'Dock Code', 'Truck Route', 'Status Preparation', 'Status Loading',
+    'Preparation Start', 'Preparation End', 'Loading Start', 'Loading End',
+]
+
+# Day zero of Excel's date serial numbers (1900 date system)
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+
+def _read_with_pandas(stream, sheet_name, columns, engine):
+    wanted = set(columns)
+    df = pd.read_excel(
+        stream,
+        sheet_name=sheet_name,
+        engine=engine,
+        usecols=lambda name: str(name).strip() in wanted,
+    )
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def read_openpyxl(stream, sheet_name, columns):
+    """
+    Reads the selected columns with pandas' openpyxl engine.
+    """
+    return _read_with_pandas(stream, sheet_name, columns, engine='openpyxl')
+
+
+def read_calamine(stream, sheet_name, columns):
+    """
+    Reads the selected columns with the Rust based calamine engine (needs `python-calamine`).
+    """
+    return _read_with_pandas(stream, sheet_name, columns, engine='calamine')
+
+
+def read_openpyxl_streaming(stream, sheet_name, columns):
+    """
+    Reads the selected columns with openpyxl in read-only mode.
+
+    Rows are streamed from the sheet XML one at a time and only the cells of
+    the wanted columns are kept, instead of building the whole sheet first.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if isinstance(sheet_name, str) else workbook.worksheets[sheet_name]
+        # Some writers store wrong sheet dimensions, which read-only mode trusts
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        header = [str(name).strip() if name is not None else '' for name in header]
+        # Keep the sheet's column order, like pandas does
+        wanted_names = set(columns)
+        found = {}
+        for position, name in enumerate(header):
+            if name in wanted_names and name not in found:
+                found[name] = position
+        if not found:
+            return pd.DataFrame()
+        wanted = list(found)
+        positions = list(found.values())
+
+        pick = itemgetter(*positions)
+        width = max(positions) + 1
+        values = []
+        for row in rows:
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            picked = pick(row)
+            values.append(picked if len(positions) > 1 else (picked,))
+    finally:
+        workbook.close()
+
+    # Drop trailing empty rows like pandas does
+    while values and all(value is None for value in values[-1]):
+        values.pop()
+
+    data = list(zip(*values)) if values else [()] * len(wanted)
+    return pd.DataFrame({name: list(column) for name, column in zip(wanted, data)}, columns=wanted)
+
+
+PARSE_ENGINES = {
+    'openpyxl': read_openpyxl,
+    'streaming': read_openpyxl_streaming,
+    'calamine': read_calamine,
+}
+
+
+def resolve_engine(engine):
+    """
+    Maps 'auto' to the fastest installed engine: calamine if available, otherwise streaming openpyxl.
+    """
+    if engine == 'auto':
+        return 'calamine' if importlib.util.find_spec('python_calamine') is not None else 'streaming'
+    return engine
+
+
+def _to_numeric_if_possible(series):
+    converted = pd.to_numeric(series, errors='coerce')
+    # Keep the original values if any non-blank cell is not a number
+    if converted.notna().sum() == series.notna().sum():
+        return converted
+    return _to_text(series)
+
+
+def _text_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _to_text(series):
+    uniques = series.dropna().unique()
+    mapping = {value: _text_value(value) for value in uniques}
+    return series.map(mapping).astype(object).where(series.notna(), None)
+
+
+def apply_column_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Gives the dashboard columns fixed dtypes.
+
+    Dates become datetime64, IDs become numbers when every value is numeric,
+    and everything else becomes text. This makes every parse engine return
+    the same frame and lets it be stored as Parquet.
+    """
+    for col in DATETIME_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = _to_numeric_if_possible(df[col])
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = _to_text(df[col])
+    return df
+
+
+def parse_workbook(stream, sheet_name=0, engine='auto', columns=REQUIRED_COLUMNS) -> pd.DataFrame:
+    """
+    Parses the dashboard columns of one sheet of an Excel workbook.
+
+    Args:
+        stream: A file object with the workbook content.
+        sheet_name (str or int, optional): The name or index of the sheet to read. Defaults to 0.
+        engine (str, optional): One of PARSE_ENGINES, or 'auto'. Defaults to 'auto'.
+        columns (list, optional): The columns to read. Defaults to REQUIRED_COLUMNS.
+
+    Returns:
+        pd.DataFrame: The selected columns with their dtypes applied.
+    """
+    engine = resolve_engine(engine)
+    if engine not in PARSE_ENGINES:
+        raise ValueError(f"Unknown parse engine '{engine}'. Choose one of: {', '.join(PARSE_ENGINES)}")
+    if sheet_name is None:
+        sheet_name = 0
+    df = PARSE_ENGINES[engine](stream, sheet_name, columns)
+    return apply_column_dtypes(df)
+
+
+def parse_workbook_bytes(content, sheet_name=0, engine='auto', columns=REQUIRED_COLUMNS) -> pd.DataFrame:
+    """
+    Parses workbook content given as bytes, like `parse_workbook`.
+
+    Bytes and the returned frame can be pickled, so this runs in worker
+    processes, which parse several workbooks at once without sharing the GIL.
+    """
+    return parse_workbook(io.BytesIO(content), sheet_name=sheet_name, engine=engine, columns=columns)
+
+
+def _from_excel_serial(value):
+    """Converts a date/time serial number to what openpyxl returns for such a cell."""
+    days = int(value)
+    # Excel stores milliseconds at most; rounding drops the float noise below that
+    moment = EXCEL_EPOCH + datetime.timedelta(milliseconds=round(value * 86_400_000))
+    return moment.time() if days == 0 else moment
+
+
+def _serials_to_values(series):
+    is_serial = series.map(type).isin([int, float])
+    if not is_serial.any():
+        return series
+    serials = series[is_serial].astype(float)
+    if is_serial.all() and (serials >= 1).all():
+        # Only dates, which convert in one vectorized step
+        return EXCEL_EPOCH + pd.to_timedelta((serials * 86_400_000).round(), unit='ms')
+    mapping = {value: _from_excel_serial(value) for value in serials.unique()}
+    converted = series.copy()
+    converted[is_serial] = serials.map(mapping)
+    return converted
+
+
+def frame_from_values(header, rows, columns=REQUIRED_COLUMNS) -> pd.DataFrame:
+    """
+    Builds the dashboard frame from range values returned by the Graph workbook API.
+
+    The API returns raw cell values: dates and times are serial numbers and
+    blank cells are empty strings. They are converted to the values openpyxl
+    would return, so the result matches `parse_workbook` on the same sheet.
+
+    Args:
+        header (list): The header row.
+        rows (list): The data rows, each a list aligned with `header`.
+        columns (list, optional): The columns to keep. Defaults to REQUIRED_COLUMNS.
+
+    Returns:
+        pd.DataFrame: The selected columns with their dtypes applied.
+    """
+    names = [str(name).strip() for name in header]
+    wanted = set(columns)
+    found = {}
+    for position, name in enumerate(names):
+        if name in wanted and name not in found:
+            found[name] = position
+    if not found:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(rows, columns=names).iloc[:, list(found.values())]
+    df.columns = list(found)
+    df = df.replace('', None)
+    # Drop trailing empty rows like pandas does
+    filled = df.notna().any(axis=1).to_numpy()
+    df = df.iloc[:filled.nonzero()[0][-1] + 1 if filled.any() else 0]
+
+    for col in DATETIME_COLUMNS + TIME_COLUMNS:
+        if col in df.columns:
+            df[col] = _serials_to_values(df[col].astype(object))
+    return apply_column_dtypes(df.reset_index(drop=True))
@@ -0,0 +1,203 @@
+# data_processing/poller.py
+import logging
+import random
+import threading
+
+from config import settings
+from data_processing import rollups, warm_start
+from data_processing.snapshot import restore_site_frames, snapshot_store
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveInterval:
+    """
+    A poll interval that follows how often the file changes.
+
+    Every poll that finds a new version shortens the interval, and every
+    poll that finds none lengthens it, within [min_seconds, max_seconds]. The
+    poller therefore polls quickly during loading windows, when the workbook
+    is edited often, and slowly overnight.
+    """
+
+    def __init__(self, initial_seconds, min_seconds, max_seconds, speedup=0.5, slowdown=1.25):
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.speedup = speedup
+        self.slowdown = slowdown
+        self.seconds = self._clamp(initial_seconds)
+
+    def _clamp(self, seconds):
+        return max(self.min_seconds, min(self.max_seconds, seconds))
+
+    def on_change(self):
+        self.seconds = self._clamp(self.seconds * self.speedup)
+
+    def on_unchanged(self):
+        self.seconds = self._clamp(self.seconds * self.slowdown)
+
+
+class SnapshotPoller:
+    """
+    One background thread per server process that refreshes the snapshot store.
+
+    The poller is the only thing that asks Graph for new data, so the request
+    rate does not depend on how many sessions are open. Each new snapshot
+    version is published to subscribers, and sessions only compare versions.
+
+    When a poll fails, the store keeps serving the last good snapshot and the
+    poller waits before trying again: as long as a throttling response's
+    Retry-After asks, otherwise with exponential backoff. Both waits have
+    random jitter so several processes don't retry in lockstep.
+    """
+
+    def __init__(self, store, interval_seconds=60, min_interval_seconds=None,
+                 max_interval_seconds=None, max_backoff_seconds=900):
+        self.store = store
+        self.interval = AdaptiveInterval(
+            interval_seconds,
+            min_interval_seconds if min_interval_seconds is not None else interval_seconds,
+            max_interval_seconds if max_interval_seconds is not None else interval_seconds,
+        )
+        self.max_backoff_seconds = max_backoff_seconds
+        self.published_version = None
+        self.last_error = None
+        self.consecutive_failures = 0
+        self.next_delay = self.interval.seconds
+        self._subscribers = []
+        self._condition = threading.Condition()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the polling thread if it is not running yet."""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='snapshot-poller', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the polling thread after its current poll."""
+        self._stop.set()
+        self._wake.set()
+
+    def request_refresh(self):
+        """Makes the poller check for new data now instead of at its next interval."""
+        self._wake.set()
+
+    def subscribe(self, callback):
+        """
+        Registers `callback(snapshot)` to be called from the poller thread for every new version.
+
+        Returns:
+            callable: A function that removes the subscription.
+        """
+        with self._condition:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._condition:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def wait_for_version(self, after_version, timeout=None):
+        """
+        Blocks until a version newer than `after_version` is published.
+
+        Returns:
+            Snapshot or None: The new snapshot, or None if the timeout passed first.
+        """
+        with self._condition:
+            published = self._condition.wait_for(
+                lambda: self.published_version is not None and self.published_version != after_version,
+                timeout=timeout,
+            )
+        return self.store.current() if published else None
+
+    def poll_once(self):
+        """
+        Refreshes the store once and publishes the snapshot if its version is new.
+
+        Returns:
+            float: Seconds to wait before the next poll.
+        """
+        try:
+            snapshot = self.store.refresh()
+        except Exception as e:
+            self.last_error = e
+            self.consecutive_failures += 1
+            metrics.increment('poll_failures')
+            self.next_delay = self._retry_delay(e)
+            logger.warning("Snapshot poll failed (%d in a row), retrying in %.0f s: %s",
+                           self.consecutive_failures, self.next_delay, e)
+            return self.next_delay
+
+        self.last_error = None
+        self.consecutive_failures = 0
+        if snapshot.version != self.published_version:
+            if self.published_version is not None:
+                self.interval.on_change()
+            self._publish(snapshot)
+        else:
+            self.interval.on_unchanged()
+        self.next_delay = self.interval.seconds
+        return self.next_delay
+
+    def _retry_delay(self, error):
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            # Never earlier than the server asked, and spread out a little after it
+            return retry_after * random.uniform(1.0, 1.2)
+        backoff = min(self.max_backoff_seconds, self.interval.seconds * 2 ** (self.consecutive_failures - 1))
+        return random.uniform(backoff / 2, backoff)
+
+    def _publish(self, snapshot):
+        with self._condition:
+            self.published_version = snapshot.version
+            subscribers = list(self._subscribers)
+            self._condition.notify_all()
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception:
+                logger.exception("Snapshot subscriber failed")
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = self.poll_once()
+            self._wake.wait(delay)
+            self._wake.clear()
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_poller():
+    """
+    Returns the process-wide poller for the shared snapshot store, starting it on first use.
+
+    On first use the last good snapshot of the previous server process is
+    restored, so sessions can show it while the poller fetches a fresh one.
+    Every published version also updates the KPI history, if it is enabled.
+    """
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            restore_site_frames(warm_start.restore_last_good(snapshot_store))
+            _poller = SnapshotPoller(
+                snapshot_store,
+                interval_seconds=settings.POLL_INTERVAL_SECONDS,
+                min_interval_seconds=settings.POLL_MIN_INTERVAL_SECONDS,
+                max_interval_seconds=settings.POLL_MAX_INTERVAL_SECONDS,
+            )
+            rollup_store = rollups.get_rollup_store()
+            if rollup_store is not None:
+                _poller.subscribe(rollup_store.apply)
+        _poller.start()
+        return _poller
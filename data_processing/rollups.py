@@ -0,0 +1,381 @@
+# data_processing/rollups.py
+import bisect
+import collections
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import settings
+from data_processing.cleaning import display_column, status_code_column
+from data_processing.sources import SITE_COLUMN
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# Columns a rollup is grouped by; 'Day' is the date of 'Completion time'
+GROUP_COLUMNS = ['Day', SITE_COLUMN, 'Ter.', 'Truck Route']
+# Additive measures of a rollup group, so groups of several days or sites are summed
+MEASURE_COLUMNS = [
+    'shipments', 'prep_minutes', 'prep_timed', 'load_minutes', 'load_timed',
+    'prep_delayed', 'prep_finished', 'load_delayed', 'load_finished',
+]
+# Names accepted by `kpis(by=...)` and the API, for each group column
+GROUP_ALIASES = {'day': 'Day', 'site': SITE_COLUMN, 'terminal': 'Ter.', 'route': 'Truck Route'}
+MINUTES_PER_DAY = 24 * 60
+# KPI results kept per rollup generation; dashboards repeat the same few queries
+MAX_CACHED_QUERIES = 64
+
+
+def _duration_minutes(df, start_col, end_col):
+    # Start and end are times of day; an end before the start ran past midnight
+    if start_col not in df.columns or end_col not in df.columns:
+        return np.full(len(df), np.nan)
+    minutes = (df[end_col] - df[start_col]).dt.total_seconds().to_numpy() / 60
+    return np.where(minutes < 0, minutes + MINUTES_PER_DAY, minutes)
+
+
+def _status_is(df, col, code):
+    column = status_code_column(col)
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return (df[column] == code).to_numpy(dtype=bool)
+
+
+def row_facts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduces snapshot rows to the facts the rollups are built from, one row per shipment.
+
+    Rows without a 'Completion time' belong to no day and are left out. The
+    terminal and route are kept as their display text, so every day of the
+    history groups them the same way.
+
+    Args:
+        df (pd.DataFrame): Normalized snapshot rows, indexed by row key.
+
+    Returns:
+        pd.DataFrame: GROUP_COLUMNS and the per-row measures, indexed by row key.
+    """
+    if 'Completion time' in df.columns:
+        days = pd.to_datetime(df['Completion time'], errors='coerce').dt.normalize()
+    else:
+        days = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    facts = pd.DataFrame({
+        'Day': days.to_numpy(dtype='datetime64[ns]'),
+        SITE_COLUMN: df[SITE_COLUMN].astype(str).to_numpy(object) if SITE_COLUMN in df.columns else '',
+        'Ter.': _display_text(df, 'Ter.'),
+        'Truck Route': _display_text(df, 'Truck Route'),
+        'prep_minutes': _duration_minutes(df, 'Preparation Start', 'Preparation End'),
+        'load_minutes': _duration_minutes(df, 'Loading Start', 'Loading End'),
+        'prep_delayed': _status_is(df, 'Status Preparation', 'delay'),
+        'prep_finished': _status_is(df, 'Status Preparation', 'finished'),
+        'load_delayed': _status_is(df, 'Status Loading', 'delay'),
+        'load_finished': _status_is(df, 'Status Loading', 'finished'),
+    }, index=pd.Index(df.index.astype(str), name='Row key'))
+    return facts[facts['Day'].notna()]
+
+
+def _group_text(value):
+    # Filter values are matched against the display text, where 1.0 is shown as '1'
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _display_text(df, col):
+    column = display_column(col)
+    if column in df.columns:
+        return df[column].astype(str).to_numpy(object)
+    return np.full(len(df), '-', dtype=object)
+
+
+def aggregate(facts: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rolls facts up into one row per (day, site, terminal, route) with the MEASURE_COLUMNS.
+    """
+    grouped = facts.groupby(GROUP_COLUMNS, sort=True)
+    rollup = grouped.agg(
+        shipments=('prep_minutes', 'size'),
+        prep_minutes=('prep_minutes', 'sum'),
+        prep_timed=('prep_minutes', 'count'),
+        load_minutes=('load_minutes', 'sum'),
+        load_timed=('load_minutes', 'count'),
+        prep_delayed=('prep_delayed', 'sum'),
+        prep_finished=('prep_finished', 'sum'),
+        load_delayed=('load_delayed', 'sum'),
+        load_finished=('load_finished', 'sum'),
+    )
+    return rollup.reset_index()
+
+
+def kpi_frame(rollup: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turns summed measures into KPIs: shipment counts, average durations and delay rates.
+    """
+    shipments = rollup['shipments'].replace(0, np.nan)
+    return pd.DataFrame({
+        'Shipments': rollup['shipments'].astype(int),
+        'Avg Prep (min)': rollup['prep_minutes'] / rollup['prep_timed'].replace(0, np.nan),
+        'Avg Load (min)': rollup['load_minutes'] / rollup['load_timed'].replace(0, np.nan),
+        'Prep Delay Rate': rollup['prep_delayed'] / shipments,
+        'Load Delay Rate': rollup['load_delayed'] / shipments,
+        'Prep Finished': rollup['prep_finished'].astype(int),
+        'Load Finished': rollup['load_finished'].astype(int),
+    }, index=rollup.index)
+
+
+class RollupStore:
+    """
+    Day-partitioned history of shipment facts and their rollups, kept up to date from each snapshot.
+
+    On disk, `directory` holds one Parquet file of facts and one of rollups
+    per day. In memory only the rollups are kept, so KPI queries over months
+    of history sum a few thousand pre-aggregated rows instead of grouping
+    every shipment.
+
+    `apply(snapshot)` uses the snapshot's delta: only the facts of changed
+    rows are rewritten, and only the days they fall on are rolled up again.
+    When the chain of versions is broken (the first snapshot after a start,
+    or a version that was skipped), the days each site of the snapshot
+    covers are compared with that site's stored facts, and the days that
+    differ are replaced.
+
+    Everything is tracked per site. Rows that leave a site's workbook from
+    days before its first remaining day are kept: the workbook is trimmed,
+    but the history is not. A site missing from a snapshot (its fetch failed
+    or timed out) keeps all of its history.
+
+    KPI results are cached until the rollups next change, so sessions
+    asking the same question between snapshot versions share one answer.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._rollups = None  # {day: rollup frame}, read from disk on first use
+        self._queries = collections.OrderedDict()  # KPI results of the current rollups
+        self._live = None  # facts of the last applied snapshot
+        self._applied_version = None
+        self.incremental_updates = 0
+        self.full_reconciles = 0
+
+    def _path(self, kind, day):
+        return os.path.join(self.directory, kind, f"{pd.Timestamp(day).date().isoformat()}.parquet")
+
+    def _load_rollups(self):
+        if self._rollups is not None:
+            return
+        self._rollups = {}
+        rollup_dir = os.path.join(self.directory, 'rollups')
+        if not os.path.isdir(rollup_dir):
+            return
+        for name in sorted(os.listdir(rollup_dir)):
+            if not name.endswith('.parquet'):
+                continue
+            try:
+                rollup = pd.read_parquet(os.path.join(rollup_dir, name), engine='pyarrow')
+                self._rollups[pd.Timestamp(name[:-len('.parquet')])] = rollup
+            except Exception:
+                logger.warning("Ignoring unreadable rollup file %s", name, exc_info=True)
+
+    def _read_facts(self, day):
+        path = self._path('facts', day)
+        if os.path.exists(path):
+            try:
+                return pd.read_parquet(path, engine='pyarrow')
+            except Exception:
+                logger.warning("Ignoring unreadable facts file %s", path, exc_info=True)
+        return None
+
+    def _write(self, kind, day, frame, index):
+        path = self._path(kind, day)
+        if frame is None or frame.empty:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        frame.to_parquet(temp_path, engine='pyarrow', index=index)
+        os.replace(temp_path, path)
+
+    def _replace_day(self, day, facts):
+        rollup = aggregate(facts) if facts is not None and not facts.empty else None
+        try:
+            self._write('facts', day, facts, index=True)
+            self._write('rollups', day, rollup, index=False)
+        except OSError:
+            # The history on disk is rebuilt by the next reconcile; the rollups in memory stay right
+            logger.warning("Could not write the history of %s", day, exc_info=True)
+        if rollup is None:
+            self._rollups.pop(day, None)
+        else:
+            self._rollups[day] = rollup
+        self._queries.clear()
+
+    def apply(self, snapshot):
+        """
+        Brings the history up to date with a new snapshot version.
+
+        Meant to be subscribed to the snapshot poller, which calls it once per version.
+        """
+        with self._lock, metrics.span('rollup_update'):
+            self._load_rollups()
+            delta = snapshot.delta
+            if self._live is not None and delta is not None and delta.from_version == self._applied_version:
+                self._apply_delta(snapshot, delta)
+                self.incremental_updates += 1
+            else:
+                self._reconcile(row_facts(snapshot.data))
+                self.full_reconciles += 1
+            self._applied_version = snapshot.version
+
+    def _apply_delta(self, snapshot, delta):
+        if delta.is_empty:
+            return
+        changed = list(delta.inserted) + list(delta.updated)
+        new = row_facts(snapshot.data.loc[changed]) if changed else self._live.iloc[:0]
+        # A mask, not drop/loc: those would hash every key of the live facts again
+        replaced = self._live.index.isin(list(delta.updated) + list(delta.deleted))
+        old = self._live[replaced]
+
+        live_days = new['Day'] if len(new) else None
+        self._live = pd.concat([self._live[~replaced], new])
+        deleted = old.index.isin(delta.deleted)
+        if deleted.any():
+            # Rows gone from days before their site's first remaining day were trimmed, not
+            # deleted; a site with no rows left keeps all of its history
+            first_days = self._live.groupby(SITE_COLUMN, sort=False)['Day'].min()
+            site_first = old[SITE_COLUMN].map(first_days)
+            trimmed = deleted & (site_first.isna() | (old['Day'] < site_first)).to_numpy()
+            old = old[~trimmed]
+
+        days = set(old['Day']) | (set(live_days) if live_days is not None else set())
+        for day in sorted(days):
+            facts = self._read_facts(day)
+            remove = old.index[old['Day'] == day].union(new.index[new['Day'] == day])
+            if facts is not None:
+                facts = facts.drop(facts.index.intersection(remove))
+            facts = pd.concat([frame for frame in (facts, new[new['Day'] == day]) if frame is not None])
+            self._replace_day(day, facts)
+
+    def _reconcile(self, facts):
+        self._live = facts
+        if facts.empty:
+            return
+        # Each site present in the snapshot owns the days from its first to its last row
+        spans = facts.groupby(SITE_COLUMN, sort=False)['Day'].agg(['min', 'max'])
+        first, last = spans['min'].min(), spans['max'].max()
+        by_day = {day: day_facts for day, day_facts in facts.groupby('Day', sort=True)}
+        stored = {day for day in self._rollups if first <= day <= last}
+        replaced = 0
+        for day in sorted(stored | set(by_day)):
+            owners = spans.index[(spans['min'] <= day) & (spans['max'] >= day)]
+            old = self._read_facts(day)
+            # Rows of the sites that do not cover this day, or are absent, stay as stored
+            kept = old[~old[SITE_COLUMN].isin(owners)] if old is not None else None
+            frames = [frame for frame in (kept, by_day.get(day)) if frame is not None and not frame.empty]
+            new = pd.concat(frames) if frames else None
+            if _same_facts(old, new):
+                continue
+            self._replace_day(day, new)
+            replaced += 1
+        logger.info("History reconciled with %d rows of %d days; %d days replaced", len(facts), len(by_day), replaced)
+
+    def _rollups_between(self, start_date, end_date):
+        # Only the days in the range are read, so a query costs the same however long the history is
+        self._load_rollups()
+        days = sorted(self._rollups)
+        lo = bisect.bisect_left(days, pd.Timestamp(start_date)) if start_date is not None else 0
+        hi = bisect.bisect_right(days, pd.Timestamp(end_date)) if end_date is not None else len(days)
+        frames = [self._rollups[day] for day in days[lo:hi]]
+        if not frames:
+            return pd.DataFrame(columns=GROUP_COLUMNS + MEASURE_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def kpis(self, start_date=None, end_date=None, by=('Truck Route',), site=None, terminal=None, route=None):
+        """
+        Answers a KPI query from the rollups, without reading any shipment rows.
+
+        Args:
+            start_date (datetime.date, optional): First day to include. Defaults to the first day of history.
+            end_date (datetime.date, optional): Last day to include. Defaults to the last day of history.
+            by (sequence, optional): Group columns (or their GROUP_ALIASES) of the result. Defaults to route.
+            site, terminal, route (optional): Only count this site, terminal or route.
+
+        Returns:
+            pd.DataFrame: One row per group, indexed by the `by` columns, with the KPI columns
+            of `kpi_frame`, sorted by shipments.
+        """
+        by = [GROUP_ALIASES.get(col, col) for col in by]
+        unknown = [col for col in by if col not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot group KPIs by {', '.join(unknown)}. Choose from: {', '.join(GROUP_ALIASES)}")
+        key = (start_date, end_date, tuple(by), site, terminal, route)
+        with self._lock, metrics.span('rollup_query'):
+            result = self._queries.get(key)
+            if result is None:
+                result = self._query(start_date, end_date, by, site, terminal, route)
+                self._queries[key] = result
+                while len(self._queries) > MAX_CACHED_QUERIES:
+                    self._queries.popitem(last=False)
+            else:
+                self._queries.move_to_end(key)
+        return result
+
+    def _query(self, start_date, end_date, by, site, terminal, route):
+        table = self._rollups_between(start_date, end_date)
+        mask = np.ones(len(table), dtype=bool)
+        for col, value in ((SITE_COLUMN, site), ('Ter.', terminal), ('Truck Route', route)):
+            if value is not None:
+                mask &= (table[col] == _group_text(value)).to_numpy()
+        rows = table[mask]
+        if by:
+            summed = rows.groupby(by, sort=True)[MEASURE_COLUMNS].sum()
+        else:
+            summed = rows[MEASURE_COLUMNS].sum().to_frame('All').T.rename_axis('Total')
+        return kpi_frame(summed).sort_values('Shipments', ascending=False, kind='stable')
+
+    def gauges(self):
+        """Returns the history's size and update counts as metric gauges, for `instrumentation.metrics`."""
+        rollups = self._rollups or {}
+        return {
+            'history_days': len(rollups),
+            'history_groups': sum(len(rollup) for rollup in rollups.values()),
+            'history_incremental_updates': self.incremental_updates,
+            'history_full_reconciles': self.full_reconciles,
+        }
+
+
+def _same_facts(old, new):
+    if old is None or new is None:
+        return (old is None or old.empty) and (new is None or new.empty)
+    if len(old) != len(new):
+        return False
+    return old.sort_index().equals(new.sort_index()[old.columns])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_rollup_store():
+    """
+    Returns the process-wide history in settings.HISTORY_DIR, or None when HISTORY_DIR is empty.
+    """
+    global _store
+    if not settings.HISTORY_DIR:
+        return None
+    with _store_lock:
+        if _store is None or _store.directory != settings.HISTORY_DIR:
+            _store = RollupStore(settings.HISTORY_DIR)
+        return _store
+
+
+def _gauges():
+    store = _store
+    return store.gauges() if store is not None else {}
+
+
+metrics.register_collector(_gauges)
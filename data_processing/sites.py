@@ -0,0 +1,298 @@
+# data_processing/sites.py
+import concurrent.futures
+import datetime
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+import pandas as pd
+
+from config import settings
+from data_processing import cleaning, loader, parsing
+from data_processing.diffing import KEY_SEPARATOR
+from data_processing.sources import SITE_COLUMN, configured_sources
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SiteState:
+    """
+    What a `SiteFetcher` knows about one site: its last loaded frame and version, and any fetch in flight.
+    """
+    source: object
+    frame: pd.DataFrame = None
+    version: object = None
+    loaded_at: datetime.datetime = None
+    error: Exception = None
+    future: concurrent.futures.Future = None
+    retry_not_before: float = 0.0  # monotonic time before which the site is not fetched again
+
+
+def merge_site_frames(frames):
+    """
+    Stacks the prepared frames of several sites into one snapshot frame.
+
+    Every row gets a SITE_COLUMN with its site, and its row key is prefixed
+    with the site, so keys stay unique and stable across sites.
+
+    Args:
+        frames (list): (site, pd.DataFrame) pairs, in site order.
+
+    Returns:
+        pd.DataFrame: The compacted, read-only merged frame.
+    """
+    parts = []
+    for site, df in frames:
+        part = df.copy(deep=False)
+        part.insert(0, SITE_COLUMN, site)
+        part.index = pd.Index(f"{site}{KEY_SEPARATOR}" + df.index.astype(str), name=df.index.name)
+        parts.append(part)
+    # Categoricals of different sites have different categories; compacting rebuilds them once
+    return cleaning.compact_snapshot(pd.concat(parts))
+
+
+def _versions_key(versions):
+    if not isinstance(versions, dict):
+        return None
+    return tuple((site, getattr(version, 'ctag', None)) for site, version in versions.items())
+
+
+class SiteFetcher:
+    """
+    Loads the workbooks of several sites at the same time and merges them into one frame.
+
+    Every site is fetched on a bounded thread pool (`fetch_workers`), since
+    fetching is mostly waiting on Graph. Downloaded workbooks are parsed on a
+    pool of `parse_processes` worker processes, because parsing holds the GIL
+    and would otherwise run one site at a time; with 0 they are parsed in the
+    fetching thread.
+
+    Each site keeps its own version. A site whose cTag did not move costs one
+    metadata request, and only the sites that changed are parsed and cleaned.
+    A refresh waits at most `timeout_seconds` for the sites: a site that is
+    slower, failing or throttled keeps its previous rows in the merged frame,
+    and its fetch carries on, so its new data joins a later refresh instead
+    of holding back the other sites. A refresh only fails when no site has
+    any data to show.
+    """
+
+    def __init__(self, sources, prepare, fetch_workers=4, parse_processes=2, timeout_seconds=30,
+                 load=loader.load_excel_from_onedrive_if_changed):
+        self.sources = tuple(sources)
+        self.timeout_seconds = timeout_seconds
+        self._prepare = prepare
+        self._load = load
+        self._sites = {source.site: SiteState(source) for source in self.sources}
+        self._io_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(fetch_workers, len(self.sources))), thread_name_prefix='site-fetch',
+        )
+        self._parse_processes = parse_processes
+        self._parse_pool = None
+        self._parse_pool_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._merged = None
+        self._merged_key = None
+
+    def _get_parse_pool(self):
+        if self._parse_processes <= 0:
+            return None
+        with self._parse_pool_lock:
+            if self._parse_pool is None:
+                # Spawned, not forked: forking a process that runs threads can copy held locks
+                self._parse_pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self._parse_processes, mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._parse_pool
+
+    def _parse(self, stream, sheet_name=0, engine='auto'):
+        pool = self._get_parse_pool()
+        if pool is None:
+            return parsing.parse_workbook(stream, sheet_name=sheet_name, engine=engine)
+        content = stream.read()
+        try:
+            return pool.submit(parsing.parse_workbook_bytes, content, sheet_name, engine).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); parse here and start a new pool next time
+            logger.warning("Parse worker process failed; parsing in this process instead")
+            with self._parse_pool_lock:
+                if self._parse_pool is pool:
+                    self._parse_pool = None
+            pool.shutdown(wait=False)
+            return parsing.parse_workbook_bytes(content, sheet_name, engine)
+
+    def _load_site(self, state):
+        # Without rows of this site in memory, an unchanged file must still be loaded
+        known_version = state.version if state.frame is not None else None
+        raw_df, version = self._load(known_version, source=state.source, parse=self._parse)
+        return (self._prepare(raw_df) if raw_df is not None else None), version
+
+    def _collect(self, state):
+        future, state.future = state.future, None
+        try:
+            frame, version = future.result()
+        except Exception as e:
+            state.error = e
+            retry_after = getattr(e, 'retry_after', None)
+            state.retry_not_before = time.monotonic() + retry_after if retry_after else 0.0
+            metrics.increment('site_fetch_failures')
+            logger.warning("Fetching site '%s' failed: %s", state.source.site, e)
+            return
+        state.error = None
+        state.version = version
+        if frame is not None:
+            state.frame = frame
+            state.loaded_at = datetime.datetime.now()
+
+    def fetch(self, known_version=None):
+        """
+        Fetches every site that is due and returns the merged frame if any site changed.
+
+        Args:
+            known_version (dict, optional): {site: FileVersion} of the current snapshot.
+
+        Returns:
+            tuple: (pd.DataFrame or None, {site: FileVersion}) of the sites with data. The
+            DataFrame is None when no site changed since `known_version`.
+
+        Raises:
+            Exception: The first site's error, if no site has any data.
+        """
+        with self._lock:
+            states = list(self._sites.values())
+            now = time.monotonic()
+            for state in states:
+                if state.future is None and now >= state.retry_not_before:
+                    state.future = self._io_pool.submit(self._load_site, state)
+            in_flight = [state.future for state in states if state.future is not None]
+            if in_flight:
+                concurrent.futures.wait(in_flight, timeout=self.timeout_seconds)
+            for state in states:
+                if state.future is not None and state.future.done():
+                    self._collect(state)
+
+            loaded = [state for state in states if state.frame is not None]
+            if not loaded:
+                errors = [state.error for state in states if state.error is not None]
+                if errors:
+                    raise errors[0]
+                raise TimeoutError(f"No site finished loading within {self.timeout_seconds:.0f} s")
+            slow = [state.source.site for state in states if state.future is not None]
+            if slow:
+                logger.warning("Sites still loading after %.0f s: %s", self.timeout_seconds, ', '.join(slow))
+
+            versions = {state.source.site: state.version for state in loaded}
+            key = _versions_key(versions)
+            if key == _versions_key(known_version):
+                return None, versions
+            if key != self._merged_key:
+                self._merged = merge_site_frames([(state.source.site, state.frame) for state in loaded])
+                self._merged_key = key
+            return self._merged, versions
+
+    def restore(self, frame, versions, loaded_at=None):
+        """
+        Fills the sites that have not loaded yet from a restored snapshot.
+
+        A site that fails or is slow on the first fetch after a restart then
+        keeps its restored rows in the merged frame instead of dropping out.
+        Its version is restored too, so an unchanged site is confirmed with
+        one metadata request.
+
+        Args:
+            frame (pd.DataFrame): A frame built by `merge_site_frames`.
+            versions (dict): {site: FileVersion} of `frame`.
+            loaded_at (datetime.datetime, optional): When `frame` was loaded.
+        """
+        if not isinstance(versions, dict) or SITE_COLUMN not in frame.columns:
+            return
+        frame_sites = frame[SITE_COLUMN].astype(str).to_numpy()
+        with self._lock:
+            for site, state in self._sites.items():
+                if state.frame is not None or site not in versions:
+                    continue
+                rows = frame[frame_sites == site].drop(columns=SITE_COLUMN)
+                # Undo merge_site_frames: drop the site prefix of the row keys
+                rows.index = pd.Index(rows.index.str.slice(len(site) + len(KEY_SEPARATOR)), name=frame.index.name)
+                state.frame = cleaning.compact_snapshot(rows)
+                state.version = versions[site]
+                state.loaded_at = loaded_at
+
+    def site_status(self):
+        """
+        Returns the state of every site, in configuration order.
+
+        Returns:
+            list: One dict per site with 'site', 'rows', 'ctag', 'loaded_at', 'error' and 'loading'.
+        """
+        # Not under the fetch lock, which a refresh holds while it waits for slow sites
+        return [
+            {
+                'site': state.source.site,
+                'rows': len(state.frame) if state.frame is not None else None,
+                'ctag': getattr(state.version, 'ctag', None),
+                'loaded_at': state.loaded_at,
+                'error': str(state.error) if state.error is not None else None,
+                'loading': state.future is not None,
+            }
+            for state in self._sites.values()
+        ]
+
+    def gauges(self):
+        """Returns the site counts as metric gauges, for `instrumentation.metrics`."""
+        states = list(self._sites.values())
+        return {
+            'sites': len(states),
+            'sites_loaded': sum(state.frame is not None for state in states),
+            'sites_failing': sum(state.error is not None for state in states),
+            'sites_loading': sum(state.future is not None for state in states),
+        }
+
+    def close(self):
+        """Stops the worker threads and processes once their current work is done."""
+        self._io_pool.shutdown(wait=False)
+        with self._parse_pool_lock:
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown(wait=False)
+                self._parse_pool = None
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_site_fetcher(prepare):
+    """
+    Returns the process-wide fetcher for the configured sources, creating it on first use.
+
+    A new fetcher replaces the old one when the configured sources change.
+
+    Args:
+        prepare (callable): Turns a parsed site frame into its cleaned, compacted snapshot frame.
+    """
+    global _fetcher
+    sources = tuple(configured_sources())
+    with _fetcher_lock:
+        if _fetcher is None or _fetcher.sources != sources:
+            if _fetcher is not None:
+                _fetcher.close()
+            _fetcher = SiteFetcher(
+                sources,
+                prepare,
+                fetch_workers=settings.FETCH_WORKERS,
+                parse_processes=settings.PARSE_PROCESSES,
+                timeout_seconds=settings.SITE_FETCH_TIMEOUT_SECONDS,
+            )
+        return _fetcher
+
+
+def _gauges():
+    fetcher = _fetcher
+    return fetcher.gauges() if fetcher is not None else {}
+
+
+metrics.register_collector(_gauges)
@@ -0,0 +1,329 @@
+# data_processing/snapshot.py
+import dataclasses
+import datetime
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+from data_processing import loader, cleaning, diffing, sites, sources, warm_start
+from data_processing.indexing import SnapshotIndex
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    An immutable, fully parsed and cleaned copy of the shipping workbook.
+
+    Snapshots are shared by every session in the process, so callers must
+    treat `data` as read-only and never modify it in place. `index` holds the
+    lookup structures for filtering `data`, built once when it was loaded.
+
+    `data` is indexed by row key (see `diffing.row_keys`). `fingerprint`
+    hashes every row, and `delta` lists the rows that changed since the
+    previous version (None for the first one). `memory_bytes` is the memory
+    held by `data`, which is shared by every session.
+
+    `restored` is True for a snapshot read back from disk after a restart
+    (see `warm_start`), until a fetch has confirmed or replaced it.
+
+    When several sites are configured (see `sources`), `data` holds the rows
+    of every site with a 'Site' column, and `source_version` is a dict of
+    each site's FileVersion.
+    """
+    data: pd.DataFrame
+    version: int
+    loaded_at: datetime.datetime
+    source_version: object = None
+    checked_at: datetime.datetime = None
+    index: SnapshotIndex = None
+    fingerprint: pd.Series = None
+    delta: diffing.SnapshotDelta = None
+    memory_bytes: int = None
+    restored: bool = False
+
+
+def fetch_dashboard_frame(known_version=None):
+    """
+    Downloads, parses and cleans the workbook into the frame used by the dashboard.
+
+    With SOURCES configured, the workbooks of all sites are fetched together
+    and merged (see `sites.SiteFetcher`).
+
+    Args:
+        known_version (optional): Source version of the current snapshot.
+
+    Returns:
+        tuple: (pd.DataFrame or None, source version). The DataFrame is None when
+        the workbook has not changed since `known_version`.
+    """
+    if sources.uses_sites():
+        return sites.get_site_fetcher(prepare_frame).fetch(known_version)
+
+    raw_df, source_version = loader.load_excel_from_onedrive_if_changed(known_version)
+    if raw_df is None:
+        return None, source_version
+    return prepare_frame(raw_df), source_version
+
+
+def restore_site_frames(snapshot):
+    """
+    Hands the rows of a restored snapshot to the site fetcher, when SOURCES is configured.
+
+    Sites that fail or are slower than SITE_FETCH_TIMEOUT_SECONDS on the
+    first fetch after a restart then keep their restored rows.
+    """
+    if snapshot is not None and sources.uses_sites():
+        sites.get_site_fetcher(prepare_frame).restore(snapshot.data, snapshot.source_version, snapshot.loaded_at)
+
+
+def prepare_frame(raw_df):
+    """
+    Cleans, keys and compacts a parsed sheet into the read-only frame of a snapshot.
+    """
+    with metrics.span('clean'):
+        cleaned_df = cleaning.clean_data(raw_df)
+        cleaned_df = cleaning.normalize_shipments(cleaned_df)
+        cleaned_df.index = diffing.row_keys(cleaned_df)
+
+    normalized_bytes = cleaning.frame_memory_bytes(cleaned_df)
+    with metrics.span('compact'):
+        compact_df = cleaning.compact_snapshot(cleaned_df)
+    logger.info(
+        "Snapshot of %d rows compacted from %.1f MB to %.1f MB",
+        len(compact_df), normalized_bytes / 1e6, cleaning.frame_memory_bytes(compact_df) / 1e6,
+    )
+    return compact_df
+
+
+class SnapshotStore:
+    """
+    Process-wide holder of the latest workbook snapshot.
+
+    All sessions read the same snapshot. When it is older than its TTL the
+    next caller fetches a new one, and any callers arriving while that fetch
+    is running wait for its result instead of starting their own.
+
+    `fetch` receives the source version of the current snapshot and returns
+    `(data, source_version)`, with `data` set to None when the source is
+    unchanged; the current snapshot is then kept and only its check time moves.
+
+    A failed fetch never discards the current snapshot; it is kept and
+    reported as stale. If the error carries a `retry_after` (Graph
+    throttling), no caller fetches again until that time has passed.
+
+    Every new version is compared with the previous one row by row, using
+    `fingerprint`, so consumers can update only the rows that changed.
+
+    Every new version is also handed to `persist`, and after a restart
+    `restore` serves that copy until the first fetch has finished.
+    """
+
+    def __init__(self, fetch=fetch_dashboard_frame, ttl_seconds=60, build_index=SnapshotIndex,
+                 fingerprint=diffing.fingerprint, persist=None):
+        self._fetch = fetch
+        self._build_index = build_index
+        self._fingerprint = fingerprint
+        self._persist = persist
+        self.ttl_seconds = ttl_seconds
+        self._snapshot = None
+        self._fetched_at = None  # monotonic time of the last successful fetch
+        self._condition = threading.Condition()
+        self._fetching = False
+        self._fetch_generation = 0
+        self._last_error = None
+        self._retry_not_before = 0.0  # monotonic time before which fetches are refused
+        self.fetch_count = 0
+        self.cache_hits = 0
+        self.coalesced_waits = 0
+        self.unchanged_fetches = 0
+
+    @property
+    def fetches_avoided(self):
+        """Number of requests that were served without starting a new fetch."""
+        return self.cache_hits + self.coalesced_waits
+
+    def current(self):
+        """Returns the latest snapshot without fetching, or None if nothing is loaded yet."""
+        return self._snapshot
+
+    @property
+    def last_error(self):
+        """The error of the most recent fetch, or None if it succeeded."""
+        return self._last_error
+
+    @property
+    def is_stale(self):
+        """True when a snapshot is available but the most recent fetch failed."""
+        return self._snapshot is not None and self._last_error is not None
+
+    def restore(self, data, source_version, loaded_at, checked_at=None):
+        """
+        Serves a previously saved snapshot until the first fetch, if nothing is loaded yet.
+
+        The restored snapshot never counts as fresh, so the next `get` or
+        `refresh` still fetches. When the source is unchanged that fetch only
+        confirms the restored data, without downloading the workbook.
+
+        Returns:
+            Snapshot or None: The restored snapshot, or None if the store already had one.
+        """
+        snapshot = self._build_snapshot(data, 1, loaded_at, source_version, checked_at or loaded_at, None)
+        snapshot = dataclasses.replace(snapshot, restored=True)
+        with self._condition:
+            if self._snapshot is not None:
+                return None
+            self._snapshot = snapshot
+        return snapshot
+
+    def _build_snapshot(self, data, version, loaded_at, source_version, checked_at, previous):
+        fingerprint = None
+        if self._fingerprint:
+            with metrics.span('fingerprint'):
+                fingerprint = self._fingerprint(data)
+        delta = None
+        if fingerprint is not None and previous is not None and previous.fingerprint is not None:
+            with metrics.span('diff'):
+                delta = diffing.diff_fingerprints(previous.fingerprint, fingerprint, previous.version, version)
+        index = None
+        if self._build_index:
+            with metrics.span('snapshot_index'):
+                index = self._build_index(data)
+        return Snapshot(
+            data=data,
+            version=version,
+            loaded_at=loaded_at,
+            source_version=source_version,
+            checked_at=checked_at,
+            index=index,
+            fingerprint=fingerprint,
+            delta=delta,
+            memory_bytes=cleaning.frame_memory_bytes(data) if isinstance(data, pd.DataFrame) else None,
+        )
+
+    def get(self, ttl_seconds=None):
+        """
+        Returns a snapshot that is at most `ttl_seconds` old, fetching a new one if needed.
+
+        Args:
+            ttl_seconds (int, optional): Maximum acceptable age. Defaults to the store's TTL.
+
+        Returns:
+            Snapshot: The shared snapshot.
+
+        Raises:
+            Exception: Whatever the fetch raised, if a new snapshot was needed and could not be loaded.
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        return self._fetch_once(ttl)
+
+    def refresh(self):
+        """
+        Forces a new fetch, or joins the one already in progress.
+        """
+        return self._fetch_once()
+
+    def _fetch_once(self, ttl=None):
+        with self._condition:
+            if ttl is not None and self._is_fresh(ttl):
+                self.cache_hits += 1
+                return self._snapshot
+            if self._last_error is not None and time.monotonic() < self._retry_not_before:
+                # The server asked us to back off; don't send it another request yet.
+                raise self._last_error
+            if self._fetching:
+                # Someone else is already fetching; wait for their result.
+                generation = self._fetch_generation
+                self.coalesced_waits += 1
+                while self._fetching and self._fetch_generation == generation:
+                    self._condition.wait()
+                if self._last_error is not None:
+                    raise self._last_error
+                return self._snapshot
+            self._fetching = True
+
+        # Timed from here: fetching, building, publishing and saving one version
+        with metrics.span('refresh'):
+            return self._fetch_and_publish()
+
+    def _fetch_and_publish(self):
+        snapshot = None
+        error = None
+        previous = self._snapshot
+        try:
+            data, source_version = self._fetch(previous.source_version if previous is not None else None)
+            now = datetime.datetime.now()
+            if data is None and previous is not None:
+                snapshot = dataclasses.replace(
+                    previous, source_version=source_version, checked_at=now, restored=False,
+                )
+            else:
+                version = previous.version + 1 if previous is not None else 1
+                snapshot = self._build_snapshot(data, version, now, source_version, now, previous)
+        except Exception as e:
+            error = e
+
+        with self._condition:
+            self.fetch_count += 1
+            if snapshot is not None and snapshot.version == getattr(previous, 'version', None):
+                self.unchanged_fetches += 1
+            if snapshot is not None:
+                self._snapshot = snapshot
+                self._fetched_at = time.monotonic()
+            self._last_error = error
+            retry_after = getattr(error, 'retry_after', None)
+            self._retry_not_before = time.monotonic() + retry_after if retry_after else 0.0
+            self._fetching = False
+            self._fetch_generation += 1
+            self._condition.notify_all()
+
+        if error is not None:
+            raise error
+        if self._persist is not None and snapshot.version != getattr(previous, 'version', None):
+            self._persist(snapshot)
+        return snapshot
+
+    def _is_fresh(self, ttl):
+        return self._fetched_at is not None and time.monotonic() - self._fetched_at < ttl
+
+    def stats(self):
+        """Returns the store counters as a dictionary."""
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot is not None else None,
+            'fetches': self.fetch_count,
+            'cache_hits': self.cache_hits,
+            'coalesced_waits': self.coalesced_waits,
+            'fetches_avoided': self.fetches_avoided,
+            'unchanged_fetches': self.unchanged_fetches,
+            'stale': self.is_stale,
+            'memory_bytes': snapshot.memory_bytes if snapshot is not None else None,
+            'restored': snapshot.restored if snapshot is not None else False,
+        }
+
+    def gauges(self):
+        """Returns the store's state as metric gauges, for `instrumentation.metrics`."""
+        snapshot = self._snapshot
+        return {
+            'snapshot_version': snapshot.version if snapshot is not None else None,
+            'snapshot_rows': len(snapshot.data) if snapshot is not None else None,
+            'snapshot_memory_bytes': snapshot.memory_bytes if snapshot is not None else None,
+            'snapshot_age_seconds': (
+                (datetime.datetime.now() - snapshot.loaded_at).total_seconds() if snapshot is not None else None
+            ),
+            'snapshot_stale': self.is_stale,
+            'snapshot_restored': snapshot.restored if snapshot is not None else False,
+            'snapshot_fetches': self.fetch_count,
+            'snapshot_unchanged_fetches': self.unchanged_fetches,
+            'snapshot_fetches_avoided': self.fetches_avoided,
+        }
+
+
+# A single store shared by every session in this server process; its last good snapshot is kept on disk
+snapshot_store = SnapshotStore(persist=warm_start.save_last_good)
+metrics.register_collector(snapshot_store.gauges)
@@ -0,0 +1,77 @@
+# data_processing/sources.py
+import json
+from dataclasses import dataclass
+
+from config import settings
+
+# Name of the site column added to a snapshot merged from several sources
+SITE_COLUMN = 'Site'
+# Site name of the single source built from TARGET_FILE_PATH
+DEFAULT_SITE = 'default'
+
+
+@dataclass(frozen=True)
+class Source:
+    """
+    One worksheet to load: a sheet of a workbook in a user's OneDrive, shown as one site.
+    """
+    site: str
+    user_id: str
+    file_path: str
+    sheet_name: object = 0
+
+
+def _parse_sources(value):
+    # A TOML array of tables arrives as a list; an environment variable as JSON text
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError as e:
+            raise ValueError(f"SOURCES must be a JSON list of sources: {e}") from None
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("SOURCES must be a list of sources")
+    return value
+
+
+def configured_sources(config=settings):
+    """
+    Returns the sources to load, from `config.SOURCES` or else the single configured file.
+
+    Each entry of SOURCES needs a `site` and a `file_path`; `user_id` and
+    `sheet_name` default to ONEDRIVE_USER_ID and EXCEL_SHEET_NAME.
+
+    Returns:
+        list: Source objects in configuration order.
+
+    Raises:
+        ValueError: If an entry is incomplete or two entries share a site.
+    """
+    if not config.SOURCES:
+        return [Source(
+            site=DEFAULT_SITE,
+            user_id=config.ONEDRIVE_USER_ID,
+            file_path=config.TARGET_FILE_PATH,
+            sheet_name=config.EXCEL_SHEET_NAME if config.EXCEL_SHEET_NAME is not None else 0,
+        )]
+
+    sources = []
+    for entry in _parse_sources(config.SOURCES):
+        if not isinstance(entry, dict) or not entry.get('site') or not entry.get('file_path'):
+            raise ValueError(f"Every source needs a 'site' and a 'file_path', got {entry!r}")
+        sheet_name = entry.get('sheet_name', config.EXCEL_SHEET_NAME)
+        sources.append(Source(
+            site=str(entry['site']),
+            user_id=entry.get('user_id') or config.ONEDRIVE_USER_ID,
+            file_path=entry['file_path'],
+            sheet_name=sheet_name if sheet_name is not None else 0,
+        ))
+    sites = [source.site for source in sources]
+    duplicates = sorted({site for site in sites if sites.count(site) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate site names in SOURCES: {', '.join(duplicates)}")
+    return sources
+
+
+def uses_sites(config=settings):
+    """True when SOURCES is configured, so snapshots are merged from sites and tagged with them."""
+    return bool(config.SOURCES)
@@ -0,0 +1,147 @@
+# data_processing/warm_start.py
+import dataclasses
+import datetime
+import json
+import logging
+import os
+
+from config import settings
+from data_processing import cleaning
+from onedrive_api.files import FileVersion
+
+logger = logging.getLogger(__name__)
+
+# Key of the snapshot metadata in the Arrow schema metadata
+METADATA_KEY = b'dashboard.snapshot'
+# Bumped when the stored layout changes; files of another format are ignored
+FORMAT_VERSION = 1
+
+
+def _last_good_path():
+    return settings.WARM_START_PATH
+
+
+def _timestamp(value):
+    return value.isoformat() if value is not None else None
+
+
+def _parse_timestamp(value):
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def _version_to_json(source_version):
+    # One FileVersion, or {site: FileVersion} for a snapshot merged from several sites
+    if isinstance(source_version, dict):
+        return {'sites': {site: dataclasses.asdict(version) for site, version in source_version.items()}}
+    return dataclasses.asdict(source_version) if dataclasses.is_dataclass(source_version) else None
+
+
+def _version_from_json(value):
+    if not value:
+        return None
+    if 'sites' in value:
+        return {site: FileVersion(**version) for site, version in value['sites'].items()}
+    return FileVersion(**value)
+
+
+def save_last_good(snapshot, path=None):
+    """
+    Writes a snapshot and its source version to disk as an Arrow IPC (Feather) file.
+
+    The file replaces the previous one atomically, so a crash while writing
+    leaves the last complete snapshot in place. Failures are logged and
+    otherwise ignored; the file only speeds up the next start.
+
+    Args:
+        snapshot (Snapshot): The snapshot to keep.
+        path (str, optional): Target file. Defaults to settings.WARM_START_PATH.
+    """
+    path = path or _last_good_path()
+    if not path:
+        return
+    source_version = snapshot.source_version
+    metadata = {
+        'format': FORMAT_VERSION,
+        'loaded_at': _timestamp(snapshot.loaded_at),
+        'checked_at': _timestamp(snapshot.checked_at),
+        'source_version': _version_to_json(source_version),
+        'saved_at': _timestamp(datetime.datetime.now()),
+    }
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        table = pa.Table.from_pandas(snapshot.data, preserve_index=True)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}), METADATA_KEY: json.dumps(metadata).encode('utf-8'),
+        })
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f"{path}.tmp"
+        feather.write_feather(table, temp_path, compression='lz4')
+        os.replace(temp_path, path)
+    except Exception:
+        logger.warning("Could not save the last good snapshot to %s", path, exc_info=True)
+
+
+def load_last_good(path=None, max_age_seconds=None):
+    """
+    Reads the snapshot written by `save_last_good`.
+
+    Args:
+        path (str, optional): File to read. Defaults to settings.WARM_START_PATH.
+        max_age_seconds (int, optional): Snapshots loaded longer ago than this are
+            ignored. Defaults to settings.WARM_START_MAX_AGE_SECONDS.
+
+    Returns:
+        tuple or None: (pd.DataFrame, source version, loaded_at, checked_at), or None when
+        there is no usable file. The source version is a FileVersion, a dict of them by
+        site, or None.
+    """
+    path = path or _last_good_path()
+    if max_age_seconds is None:
+        max_age_seconds = settings.WARM_START_MAX_AGE_SECONDS
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        import pyarrow.feather as feather
+
+        # Not memory-mapped, so the file can be replaced while the snapshot is in use
+        table = feather.read_table(path, memory_map=False)
+        metadata = json.loads((table.schema.metadata or {})[METADATA_KEY])
+        if metadata.get('format') != FORMAT_VERSION:
+            return None
+        loaded_at = _parse_timestamp(metadata['loaded_at'])
+        if max_age_seconds and (datetime.datetime.now() - loaded_at).total_seconds() > max_age_seconds:
+            logger.info("Last good snapshot from %s is too old to show", loaded_at)
+            return None
+        source_version = _version_from_json(metadata.get('source_version'))
+        data = cleaning.compact_snapshot(table.to_pandas())
+    except Exception:
+        # A broken or foreign file just means a cold start
+        logger.warning("Could not read the last good snapshot from %s", path, exc_info=True)
+        return None
+    return (
+        data,
+        source_version,
+        loaded_at,
+        _parse_timestamp(metadata.get('checked_at')),
+    )
+
+
+def restore_last_good(store, path=None):
+    """
+    Puts the snapshot saved by a previous server process into an empty store.
+
+    Returns:
+        Snapshot or None: The restored snapshot, or None if nothing was restored.
+    """
+    if store.current() is not None:
+        return None
+    saved = load_last_good(path)
+    if saved is None:
+        return None
+    data, source_version, loaded_at, checked_at = saved
+    snapshot = store.restore(data, source_version, loaded_at, checked_at)
+    if snapshot is not None:
+        logger.info("Serving the snapshot loaded at %s until a fresh one is fetched", loaded_at)
+    return snapshot
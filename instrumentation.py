@@ -0,0 +1,222 @@
+# instrumentation.py
+import collections
+import contextlib
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Prefix of every exported metric name
+METRIC_PREFIX = "shipping_board_"
+# How many of the most recent durations of a stage the percentiles are computed from
+DEFAULT_WINDOW = 500
+# Exported quantiles, and the key of each in `stage_stats`
+QUANTILES = ((0.5, 'p50'), (0.95, 'p95'))
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RollingSummary:
+    """
+    Count and total of all observations, and percentiles over the most recent `window` of them.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.last = None
+        self._recent = collections.deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.last = value
+        self._recent.append(value)
+
+    def quantile(self, q):
+        """Returns the q-quantile (nearest rank) of the recent observations, or None if there are none."""
+        if not self._recent:
+            return None
+        ordered = sorted(self._recent)
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class MetricsRegistry:
+    """
+    Process-wide timings and counters of the data pipeline.
+
+    - `span(stage)` times a block and adds its duration to that stage's
+      rolling summary (count, sum, last, p50, p95).
+    - `increment(name)` adds to a counter, e.g. bytes downloaded or cache hits.
+    - `set_gauge(name, value)` records a current value, e.g. the snapshot's row count.
+    - `register_collector(func)` adds gauges that are read when metrics are
+      exported, for objects that already count things themselves.
+
+    Everything is kept in memory and is cheap enough to leave on; a span
+    costs two clock reads and a lock.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._counters = collections.Counter()
+        self._gauges = {}
+        self._collectors = []
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        """Times the enclosed block as one run of `stage`, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            summary = self._summaries.get(stage)
+            if summary is None:
+                summary = self._summaries[stage] = RollingSummary(self.window)
+            summary.observe(seconds)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def reset(self):
+        """Clears all timings, counters and gauges, e.g. between benchmark runs. Collectors stay registered."""
+        with self._lock:
+            self._summaries.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def register_collector(self, collect):
+        """Adds `collect()`, which returns {gauge name: value}, to every export."""
+        with self._lock:
+            if collect not in self._collectors:
+                self._collectors.append(collect)
+
+    def _collected_gauges(self):
+        with self._lock:
+            gauges = dict(self._gauges)
+            collectors = list(self._collectors)
+        for collect in collectors:
+            try:
+                gauges.update(collect())
+            except Exception:
+                # A broken collector must not break the metrics of everything else
+                pass
+        return gauges
+
+    def stage_stats(self):
+        """
+        Returns {stage: {'count', 'sum', 'last', 'p50', 'p95'}} in seconds, sorted by stage.
+        """
+        with self._lock:
+            return {
+                stage: {
+                    'count': summary.count,
+                    'sum': summary.total,
+                    'last': summary.last,
+                    **{key: summary.quantile(q) for q, key in QUANTILES},
+                }
+                for stage, summary in sorted(self._summaries.items())
+            }
+
+    def counters(self):
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def gauges(self):
+        return dict(sorted(self._collected_gauges().items()))
+
+    def prometheus_text(self):
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        stages = self.stage_stats()
+        if stages:
+            name = f"{METRIC_PREFIX}stage_seconds"
+            lines.append(f"# HELP {name} Duration of pipeline stages; quantiles over the most recent runs.")
+            lines.append(f"# TYPE {name} summary")
+            for stage, stats in stages.items():
+                for q, key in QUANTILES:
+                    lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {_number(stats[key])}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {_number(stats["sum"])}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {stats["count"]}')
+        for counter, value in self.counters().items():
+            name = f"{METRIC_PREFIX}{counter}_total"
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {_number(value)}")
+        for gauge, value in self.gauges().items():
+            name = f"{METRIC_PREFIX}{gauge}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _number(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def start_metrics_server(port, host="127.0.0.1", registry=None):
+    """
+    Serves `GET /metrics` for Prometheus on its own daemon thread, once per process and port.
+
+    The endpoint has no authentication, so it only listens on the local host
+    unless another `host` is given.
+
+    If the port cannot be opened, a warning is logged once and metrics are
+    only available in-process.
+
+    Returns:
+        ThreadingHTTPServer or None: The running server, or None if it could not start.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    registry = registry or metrics
+    with _servers_lock:
+        if port in _servers:
+            return _servers[port]
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            logger.warning("Could not serve metrics on port %d: %s", port, e)
+            server = None
+        else:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+        _servers[port] = server
+        return server
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+# A single registry shared by everything in this process
+metrics = MetricsRegistry()
@@ -1,14 +1,14 @@
 # main.py (Temporary Diagnostic Script)
-import requests
 import json
-from onedrive_api.auth import get_access_token
-from dashboard_app import streamlit_app
 
 
 def find_site_id():
     """
     Connects to the Graph API and searches for a SharePoint site.
     """
+    from onedrive_api.auth import get_access_token
+    from onedrive_api.client import get_graph_client
+
     print("Attempting to get access token...")
     try:
         token = get_access_token()
@@ -24,7 +24,7 @@ def find_site_id():
 
     print(f"Searching for site with URL: {search_url}")
 
-    response = requests.get(search_url, headers=headers)
+    response = get_graph_client().session.get(search_url, headers=headers)
 
     if response.status_code == 200:
         print("\n--- SUCCESS! Found Site Information: ---")
@@ -38,5 +38,8 @@ def find_site_id():
         print(f"Response: {response.text}")
 
 if __name__ == "__main__":
+    # Imported here so importing this module does not load Streamlit and the whole dashboard
+    from dashboard_app import streamlit_app
+
     # This calls the main_dashboard function from your streamlit_app.py file
     streamlit_app.main_dashboard()
\ No newline at end of file
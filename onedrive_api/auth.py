@@ -1,33 +1,17 @@
 # onedrive_api/auth.py
-import msal
-from .errors import OneDriveAuthError
-from config import settings
+from .client import get_graph_client
 
 def get_access_token():
     """
     Acquires an access token from Azure AD using the client credentials flow.
 
+    The token comes from the shared GraphClient, which reuses it from its
+    cache until it is close to expiring.
+
     Returns:
         str: The access token.
     
     Raises:
         OneDriveAuthError: If token acquisition fails.
     """
-    app = msal.ConfidentialClientApplication(
-        client_id=settings.CLIENT_ID,
-        authority=settings.AUTHORITY,
-        client_credential=settings.CLIENT_SECRET,
-    )
-
-    # First, try to get a token from the cache
-    result = app.acquire_token_silent(scopes=settings.GRAPH_API_SCOPES, account=None)
-
-    # If no suitable token is in the cache, acquire a new one from Azure AD
-    if not result:
-        result = app.acquire_token_for_client(scopes=settings.GRAPH_API_SCOPES)
-
-    if "access_token" in result:
-        return result['access_token']
-    else:
-        error_description = result.get("error_description", "No error description provided.")
-        raise OneDriveAuthError(f"Could not acquire access token: {error_description}")
\ No newline at end of file
+    return get_graph_client().get_access_token()
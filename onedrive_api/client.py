@@ -0,0 +1,148 @@
+# onedrive_api/client.py
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .errors import OneDriveAuthError
+from config import settings
+from instrumentation import metrics
+
+
+class _PooledAdapter(HTTPAdapter):
+    """
+    Connection pool that can pin the CA bundle used for TLS.
+
+    Set on the adapter because `requests` lets REQUESTS_CA_BUNDLE override
+    `Session.verify`, and MSAL sends its requests through the same session.
+    """
+
+    def __init__(self, verify=None, **kwargs):
+        self.ca_bundle = verify
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if self.ca_bundle:
+            kwargs['verify'] = self.ca_bundle
+        return super().send(request, **kwargs)
+
+
+class GraphClient:
+    """
+    Long-lived Microsoft Graph client.
+
+    Owns one MSAL application with a token cache, so tokens are reused until
+    shortly before they expire, and one pooled keep-alive `requests.Session`,
+    so TLS connections to Graph are reused between refreshes.
+    """
+
+    def __init__(self, client_id, authority, client_secret, scopes,
+                 token_cache_path=None, refresh_margin_seconds=300, pool_size=10, verify=None):
+        self.client_id = client_id
+        self.authority = authority
+        self.client_secret = client_secret
+        self.scopes = scopes
+        self.token_cache_path = token_cache_path
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._lock = threading.Lock()
+        self._access_token = None
+        self._expires_at = 0.0
+
+        import msal  # imported here so importing the package does not load MSAL
+
+        self._token_cache = msal.SerializableTokenCache()
+        if token_cache_path and os.path.exists(token_cache_path):
+            with open(token_cache_path, 'r', encoding='utf-8') as f:
+                self._token_cache.deserialize(f.read())
+
+        # Created on first use, because MSAL contacts the authority when it is built
+        self._app = None
+
+        self.session = requests.Session()
+        adapter = _PooledAdapter(pool_connections=pool_size, pool_maxsize=pool_size, verify=verify)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get_access_token(self, force_refresh=False):
+        """
+        Returns a valid access token, acquiring a new one if the current one is about to expire.
+
+        Args:
+            force_refresh (bool, optional): Ignore the in-memory token. Defaults to False.
+
+        Returns:
+            str: The access token.
+
+        Raises:
+            OneDriveAuthError: If token acquisition fails.
+        """
+        with self._lock:
+            if (not force_refresh and self._access_token
+                    and time.time() < self._expires_at - self.refresh_margin_seconds):
+                return self._access_token
+
+            if self._app is None:
+                self._app = self._build_app()
+
+            # MSAL looks in its own cache first and only calls Azure AD when needed
+            with metrics.span('graph_token'):
+                result = self._app.acquire_token_for_client(scopes=self.scopes)
+
+            if "access_token" not in result:
+                error_description = result.get("error_description", "No error description provided.")
+                raise OneDriveAuthError(f"Could not acquire access token: {error_description}")
+
+            self._access_token = result['access_token']
+            self._expires_at = time.time() + int(result.get('expires_in', 0))
+            self._save_token_cache()
+            return self._access_token
+
+    def _build_app(self):
+        import msal  # only needed once a token is requested
+
+        return msal.ConfidentialClientApplication(
+            client_id=self.client_id,
+            authority=self.authority,
+            client_credential=self.client_secret,
+            token_cache=self._token_cache,
+            http_client=self.session,
+            # Only the public cloud can be looked up in Microsoft's instance metadata
+            instance_discovery=self.authority.startswith("https://login.microsoftonline.com/"),
+        )
+
+    def _save_token_cache(self):
+        if not self.token_cache_path or not self._token_cache.has_state_changed:
+            return
+        temp_path = f"{self.token_cache_path}.tmp"
+        with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+            f.write(self._token_cache.serialize())
+        os.replace(temp_path, self.token_cache_path)
+        self._token_cache.has_state_changed = False
+
+    def auth_headers(self):
+        """Returns the Authorization header for Graph requests."""
+        return { 'Authorization': f'Bearer {self.get_access_token()}' }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_graph_client():
+    """
+    Returns the process-wide GraphClient, creating it from the settings on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GraphClient(
+                client_id=settings.CLIENT_ID,
+                authority=settings.AUTHORITY,
+                client_secret=settings.CLIENT_SECRET,
+                scopes=settings.GRAPH_API_SCOPES,
+                token_cache_path=settings.TOKEN_CACHE_PATH,
+                verify=settings.CA_BUNDLE,
+            )
+        return _client
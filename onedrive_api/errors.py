@@ -10,4 +10,11 @@ class OneDriveAuthError(OneDriveError):
 
 class OneDriveFileError(OneDriveError):
     """Raised for file operation errors."""
-    pass
\ No newline at end of file
+    pass
+
+class OneDriveThrottledError(OneDriveFileError):
+    """Raised when Graph throttles a request (HTTP 429 or 503)."""
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        # Seconds the server asked us to wait, or None if it did not say
+        self.retry_after = retry_after
@@ -1,32 +1,272 @@
 # onedrive_api/files.py
+import email.utils
+import logging
+import tempfile
+import time
+from dataclasses import dataclass
+
 import requests
-from io import BytesIO
+
 from .auth import get_access_token
-from .errors import OneDriveFileError
+from .client import get_graph_client
+from .errors import OneDriveFileError, OneDriveThrottledError
 from config import settings
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# Downloads are read in chunks of this size
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Downloads larger than this roll over from memory to a temporary file on disk
+DOWNLOAD_SPOOL_MAX_BYTES = 16 * 1024 * 1024
+# How many times a dropped download is resumed with a Range request
+DOWNLOAD_MAX_RESUMES = 3
 
-def get_onedrive_file_content():
+
+@dataclass(frozen=True)
+class FileVersion:
     """
-    Downloads a specific Excel file from a user's OneDrive.
+    Version information of a driveItem, taken from its Graph metadata.
+    """
+    etag: str
+    ctag: str
+    last_modified: str
+    size: int
+
+    @classmethod
+    def from_item(cls, item):
+        return cls(
+            etag=item.get('eTag'),
+            ctag=item.get('cTag'),
+            last_modified=item.get('lastModifiedDateTime'),
+            size=item.get('size'),
+        )
+
+
+@dataclass(frozen=True)
+class DownloadStats:
     """
+    Size and speed of a finished download.
+    """
+    bytes_downloaded: int
+    seconds: float
+    resumes: int
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes_downloaded / self.seconds if self.seconds > 0 else 0.0
+
+
+# Stats of the most recent download in this process
+last_download_stats = None
+
+
+def _get_auth_headers():
     try:
         access_token = get_access_token()
     except Exception as e:
         raise OneDriveFileError(f"Authentication failed: {e}")
+    return { 'Authorization': f'Bearer {access_token}' }
 
+
+def _get_item_url(user_id=None, file_path=None):
     # --- THIS IS THE CORRECT URL FOR A USER'S ONEDRIVE ---
-    file_url = (
-        f"https://graph.microsoft.com/v1.0/users/{settings.ONEDRIVE_USER_ID}"
-        f"/drive/root:{settings.TARGET_FILE_PATH}:/content"
+    # Defaults to the configured file; each site of data_processing.sources passes its own
+    return (
+        f"{settings.GRAPH_BASE_URL}/users/{user_id or settings.ONEDRIVE_USER_ID}"
+        f"/drive/root:{file_path or settings.TARGET_FILE_PATH}:"
+    )
+
+
+def _parse_retry_after(value):
+    """Converts a Retry-After header (seconds or an HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _raise_for_response(response, action):
+    message = (
+        f"Failed to {action}. Status: {response.status_code}, "
+        f"Response: {response.text}"
+    )
+    if response.status_code in (429, 503):
+        metrics.increment('graph_throttled_responses')
+        raise OneDriveThrottledError(message, retry_after=_parse_retry_after(response.headers.get('Retry-After')))
+    metrics.increment('graph_error_responses')
+    raise OneDriveFileError(message)
+
+
+def _stream_download(url, headers, expected_size=None):
+    """
+    Streams a download into a SpooledTemporaryFile.
+
+    The body is written chunk by chunk, so it is never held in memory twice,
+    and files larger than DOWNLOAD_SPOOL_MAX_BYTES are moved to disk. If the
+    connection drops, the download continues from the last received byte
+    with a Range request against the (pre-authenticated) download URL.
+
+    Returns:
+        SpooledTemporaryFile or None: The downloaded file positioned at the start,
+        or None if the server answered 304 Not Modified.
+
+    Raises:
+        OneDriveFileError: If the download fails or cannot be resumed.
+    """
+    global last_download_stats
+
+    spool = tempfile.SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_MAX_BYTES)
+    session = get_graph_client().session
+    started = time.monotonic()
+    written = 0
+    resumes = 0
+    validator = None
+    request_url = url
+    request_headers = dict(headers)
+
+    try:
+        while True:
+            try:
+                with session.get(request_url, headers=request_headers, stream=True) as response:
+                    if response.status_code == 304:
+                        metrics.increment('downloads_not_modified')
+                        spool.close()
+                        return None
+                    if response.status_code == 200 and written:
+                        # The server ignored the Range header, so start over
+                        spool.seek(0)
+                        spool.truncate()
+                        written = 0
+                    elif response.status_code not in (200, 206):
+                        _raise_for_response(response, "download file")
+
+                    # Resume against the URL the redirect led to, which needs no token
+                    request_url = response.url
+                    validator = response.headers.get('ETag')
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        spool.write(chunk)
+                        written += len(chunk)
+
+                if expected_size is not None and written < expected_size:
+                    raise requests.exceptions.ConnectionError(
+                        f"Connection closed after {written} of {expected_size} bytes"
+                    )
+                break
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                resumes += 1
+                if resumes > DOWNLOAD_MAX_RESUMES:
+                    raise OneDriveFileError(f"Download failed after {resumes - 1} resumes: {e}")
+                logger.warning("Download interrupted at %d bytes, resuming: %s", written, e)
+                request_headers = {'Range': f'bytes={written}-'}
+                if request_url == url:
+                    request_headers.update(headers)
+                    request_headers.pop('If-None-Match', None)
+                if validator:
+                    request_headers['If-Range'] = validator
+    except Exception:
+        spool.close()
+        raise
+
+    last_download_stats = DownloadStats(
+        bytes_downloaded=written,
+        seconds=time.monotonic() - started,
+        resumes=resumes,
     )
+    metrics.observe('graph_download', last_download_stats.seconds)
+    metrics.increment('downloads')
+    metrics.increment('download_bytes', written)
+    metrics.increment('download_resumes', resumes)
+    logger.info(
+        "Downloaded %d bytes in %.2f s (%.0f bytes/s, %d resumes)",
+        written, last_download_stats.seconds, last_download_stats.bytes_per_second, resumes,
+    )
+    spool.seek(0)
+    return spool
+
+
+def get_onedrive_file_content(user_id=None, file_path=None):
+    """
+    Downloads a specific Excel file from a user's OneDrive.
+
+    Args:
+        user_id (str, optional): Owner of the OneDrive. Defaults to settings.ONEDRIVE_USER_ID.
+        file_path (str, optional): Path of the file. Defaults to settings.TARGET_FILE_PATH.
+
+    Returns:
+        SpooledTemporaryFile: The file content, positioned at the start.
+    """
+    headers = _get_auth_headers()
+    return _stream_download(f"{_get_item_url(user_id, file_path)}/content", headers)
+
+
+def get_onedrive_file_metadata(headers=None, user_id=None, file_path=None):
+    """
+    Reads the version metadata (eTag, cTag, lastModifiedDateTime, size) of the Excel file.
+
+    Args:
+        headers (dict, optional): Authorization headers, to reuse a token the caller already has.
+        user_id (str, optional): Owner of the OneDrive. Defaults to settings.ONEDRIVE_USER_ID.
+        file_path (str, optional): Path of the file. Defaults to settings.TARGET_FILE_PATH.
 
-    headers = { 'Authorization': f'Bearer {access_token}' }
-    response = requests.get(file_url, headers=headers)
+    Returns:
+        FileVersion: The current version of the file.
+
+    Raises:
+        OneDriveFileError: If the metadata request fails.
+    """
+    headers = headers or _get_auth_headers()
+    params = {'$select': 'eTag,cTag,lastModifiedDateTime,size'}
+    with metrics.span('graph_metadata'):
+        response = get_graph_client().session.get(_get_item_url(user_id, file_path), headers=headers, params=params)
 
     if response.status_code == 200:
-        return BytesIO(response.content)
-    else:
-        raise OneDriveFileError(
-            f"Failed to download file. Status: {response.status_code}, "
-            f"Response: {response.text}"
-        )
\ No newline at end of file
+        return FileVersion.from_item(response.json())
+    _raise_for_response(response, "read file metadata")
+
+
+def get_onedrive_file_content_if_changed(known_version=None, current_version=None, user_id=None, file_path=None):
+    """
+    Downloads the Excel file only if its content changed since `known_version`.
+
+    The small metadata request is made first. The content is only downloaded
+    when the cTag (which tracks content changes, unlike the eTag) has moved,
+    and the download itself is sent with If-None-Match so a race with an
+    unchanged file still ends in a 304 without a body.
+
+    Args:
+        known_version (FileVersion, optional): The version that was last downloaded.
+        current_version (FileVersion, optional): Metadata the caller already read, to skip that request.
+        user_id (str, optional): Owner of the OneDrive. Defaults to settings.ONEDRIVE_USER_ID.
+        file_path (str, optional): Path of the file. Defaults to settings.TARGET_FILE_PATH.
+
+    Returns:
+        tuple: (file object or None, FileVersion). The file is None when the file is unchanged.
+
+    Raises:
+        OneDriveFileError: If a request fails.
+    """
+    headers = _get_auth_headers()
+    if current_version is None:
+        current_version = get_onedrive_file_metadata(headers=headers, user_id=user_id, file_path=file_path)
+
+    if known_version is not None and current_version.ctag == known_version.ctag:
+        return None, current_version
+
+    content_headers = dict(headers)
+    if known_version is not None and known_version.ctag:
+        content_headers['If-None-Match'] = known_version.ctag
+    content = _stream_download(
+        f"{_get_item_url(user_id, file_path)}/content", content_headers, expected_size=current_version.size,
+    )
+
+    if content is None:
+        return None, known_version
+    return content, current_version
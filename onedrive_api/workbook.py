@@ -0,0 +1,272 @@
+# onedrive_api/workbook.py
+import logging
+import re
+import threading
+import time
+from urllib.parse import quote
+
+from .client import get_graph_client
+from .errors import OneDriveFileError
+from .files import _get_auth_headers, _get_item_url, _raise_for_response
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rows requested per range call; Graph rejects responses that are too large
+WORKBOOK_ROWS_PER_REQUEST = 5000
+# Graph drops idle workbook sessions after about 5 minutes
+WORKBOOK_SESSION_IDLE_SECONDS = 240
+
+_ADDRESS_PATTERN = re.compile(r"^(?:.*!)?\$?([A-Z]+)\$?(\d+)(?::\$?([A-Z]+)\$?(\d+))?$")
+
+
+def column_letter(index):
+    """Converts a 0-based column index to its letters (0 -> 'A', 26 -> 'AA')."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def column_index(letters):
+    """Converts column letters to a 0-based index ('A' -> 0, 'AA' -> 26)."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def parse_address(address):
+    """
+    Splits an A1 address like "Sheet1!B2:K100" into its bounds.
+
+    Returns:
+        tuple: (first column, first row, last column, last row); columns are
+        0-based indexes and rows are 1-based like in Excel.
+    """
+    match = _ADDRESS_PATTERN.match(address)
+    if match is None:
+        raise OneDriveFileError(f"Unexpected range address: {address}")
+    first_col, first_row, last_col, last_row = match.groups()
+    return (
+        column_index(first_col), int(first_row),
+        column_index(last_col or first_col), int(last_row or first_row),
+    )
+
+
+def _column_runs(positions):
+    """Groups sorted column positions into (first, last) runs of adjacent columns."""
+    runs = []
+    for position in positions:
+        if runs and position == runs[-1][1] + 1:
+            runs[-1][1] = position
+        else:
+            runs.append([position, position])
+    return [tuple(run) for run in runs]
+
+
+class WorkbookSession:
+    """
+    A Graph workbook session on the target file, or on the file at `item_url`.
+
+    The session is created without persisting changes, since the dashboard
+    only reads, and is reused for every request on the same file version.
+    A new session is opened when the file changes, when the session has been
+    idle long enough for Graph to drop it, or when Graph reports it is gone.
+    """
+
+    def __init__(self, idle_seconds=WORKBOOK_SESSION_IDLE_SECONDS, item_url=None):
+        self.idle_seconds = idle_seconds
+        self.item_url = item_url
+        self.session_id = None
+        self.ctag = None
+        self.sessions_created = 0
+        self._last_used = 0.0
+
+    def _workbook_url(self):
+        return f"{self.item_url or _get_item_url()}/workbook"
+
+    def _create(self, ctag):
+        headers = _get_auth_headers()
+        response = get_graph_client().session.post(
+            f"{self._workbook_url()}/createSession", headers=headers, json={'persistChanges': False},
+        )
+        if response.status_code not in (200, 201):
+            _raise_for_response(response, "create workbook session")
+        self.session_id = response.json()['id']
+        self.ctag = ctag
+        self.sessions_created += 1
+
+    def close(self):
+        """Closes the session on the server, ignoring failures."""
+        if self.session_id is None:
+            return
+        session_id, self.session_id = self.session_id, None
+        try:
+            headers = _get_auth_headers()
+            headers['workbook-session-id'] = session_id
+            get_graph_client().session.post(f"{self._workbook_url()}/closeSession", headers=headers)
+        except Exception as e:
+            logger.debug("Could not close workbook session: %s", e)
+
+    def get(self, path, ctag, params=None):
+        """
+        Sends a GET request to a workbook endpoint within the session.
+
+        Args:
+            path (str): The path below /workbook, e.g. "/worksheets".
+            ctag (str): The cTag of the file version being read.
+            params (dict, optional): Query parameters.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            OneDriveFileError: If the request fails.
+        """
+        if self.session_id is not None and (
+                ctag != self.ctag or time.monotonic() - self._last_used > self.idle_seconds):
+            self.close()
+        for attempt in range(2):
+            if self.session_id is None:
+                self._create(ctag)
+            headers = _get_auth_headers()
+            headers['workbook-session-id'] = self.session_id
+            response = get_graph_client().session.get(f"{self._workbook_url()}{path}", headers=headers, params=params)
+            self._last_used = time.monotonic()
+            if response.status_code == 200:
+                return response.json()
+            if attempt == 0 and response.status_code in (400, 404) and 'session' in response.text.lower():
+                # The session expired on the server; open a new one and retry once
+                self.session_id = None
+                continue
+            _raise_for_response(response, f"read workbook {path}")
+
+
+class WorkbookRangeReader:
+    """
+    Reads the used range of one worksheet through the Graph workbook API.
+
+    Only the cell values of the wanted columns are requested, as JSON, in
+    blocks of WORKBOOK_ROWS_PER_REQUEST rows, so other sheets, formatting,
+    pivots and images are never transferred.
+
+    With `appended_only=True` the reader asks only for the rows below the
+    last row it has seen and appends them to the rows it kept from the
+    previous read. That is only correct for sheets where existing rows are
+    never edited; if the header changes or the sheet gets shorter, the whole
+    range is read again.
+    """
+
+    def __init__(self, sheet_name=None, rows_per_request=WORKBOOK_ROWS_PER_REQUEST, item_url=None):
+        self.sheet_name = sheet_name
+        self.rows_per_request = rows_per_request
+        self.session = WorkbookSession(item_url=item_url)
+        self.requests_made = 0
+        self._lock = threading.Lock()
+        self._header = None
+        self._rows = []
+        self._last_row = 0
+
+    def _get(self, path, ctag, params=None):
+        self.requests_made += 1
+        return self.session.get(path, ctag, params=params)
+
+    def _worksheet_path(self, ctag):
+        sheet_name = self.sheet_name
+        if not isinstance(sheet_name, str):
+            sheets = self._get('/worksheets', ctag, params={'$select': 'name,position'})['value']
+            sheets.sort(key=lambda sheet: sheet.get('position', 0))
+            index = sheet_name or 0
+            if index >= len(sheets):
+                raise OneDriveFileError(f"The workbook has no worksheet at position {index}")
+            sheet_name = sheets[index]['name']
+        return f"/worksheets/{quote(sheet_name, safe='')}"
+
+    def _range_values(self, sheet_path, ctag, first_col, first_row, last_col, last_row):
+        address = f"{column_letter(first_col)}{first_row}:{column_letter(last_col)}{last_row}"
+        return self._get(f"{sheet_path}/range(address='{address}')", ctag, params={'$select': 'values'})['values']
+
+    def read(self, version, columns, appended_only=False):
+        """
+        Reads the header and the data rows of the wanted columns.
+
+        Args:
+            version (files.FileVersion): The file version being read.
+            columns (list): Header names of the columns to read.
+            appended_only (bool, optional): Only read rows below the last seen row. Defaults to False.
+
+        Returns:
+            tuple: (header, rows) with the wanted columns in sheet order.
+        """
+        with self._lock:
+            ctag = version.ctag
+            sheet_path = self._worksheet_path(ctag)
+            used = self._get(f"{sheet_path}/usedRange(valuesOnly=true)", ctag, params={'$select': 'address'})
+            first_col, first_row, last_col, last_row = parse_address(used['address'])
+
+            full_header = self._range_values(sheet_path, ctag, first_col, first_row, last_col, first_row)[0]
+            names = [str(name).strip() for name in full_header]
+            wanted = set(columns)
+            # The first column with each wanted name, in sheet order
+            found = {}
+            for position, name in enumerate(names):
+                if name in wanted and name not in found:
+                    found[name] = position
+            header = list(found)
+            positions = list(found.values())
+            if not positions:
+                return header, []
+
+            if appended_only and header == self._header and last_row >= self._last_row:
+                start_row = self._last_row + 1
+                rows = list(self._rows)
+            else:
+                start_row = first_row + 1
+                rows = []
+
+            runs = _column_runs([first_col + position for position in positions])
+            for block_start in range(start_row, last_row + 1, self.rows_per_request):
+                block_end = min(block_start + self.rows_per_request - 1, last_row)
+                blocks = [
+                    self._range_values(sheet_path, ctag, run_first, block_start, run_last, block_end)
+                    for run_first, run_last in runs
+                ]
+                if len(blocks) == 1:
+                    rows.extend(blocks[0])
+                else:
+                    rows.extend([cell for block in parts for cell in block] for parts in zip(*blocks))
+
+            self._header = header
+            self._rows = rows
+            self._last_row = last_row
+            logger.info(
+                "Read %d rows x %d columns from the workbook API (%d new)",
+                len(rows), len(header), max(0, last_row - start_row + 1),
+            )
+            return header, rows
+
+
+_readers = {}
+_reader_lock = threading.Lock()
+
+
+def get_workbook_reader(user_id=None, file_path=None, sheet_name=None):
+    """
+    Returns the process-wide reader for a worksheet, creating it on first use.
+
+    Without arguments this is the configured worksheet of the configured
+    file. Every site (see data_processing.sources) has a reader of its own, so
+    appended rows and workbook sessions are tracked per file and sheet.
+    """
+    if sheet_name is None:
+        sheet_name = settings.EXCEL_SHEET_NAME
+    key = (user_id, file_path, sheet_name)
+    with _reader_lock:
+        reader = _readers.get(key)
+        if reader is None:
+            item_url = _get_item_url(user_id, file_path) if user_id or file_path else None
+            reader = _readers[key] = WorkbookRangeReader(sheet_name=sheet_name, item_url=item_url)
+        return reader
@@ -0,0 +1,52 @@
+# tests/test_api.py
+import pandas as pd
+
+from dashboard_api.app import create_app
+from data_processing import cleaning, diffing
+from data_processing.poller import SnapshotPoller
+from data_processing.snapshot import SnapshotStore
+
+
+def _client():
+    raw = pd.DataFrame({
+        'Completion time': ['2025-06-30 08:00', '2025-06-30 09:00', '2025-06-30 10:00'],
+        'Ter.': [1, 2, None],  # the blank cell makes the column float
+        'Ship no.': [1001, 1002, 1003],
+        'Dock Code': ['D1', 'D2', 'D1'],
+        'Truck Route': ['R-1', 'R-2', 'R-3'],
+        'Preparation Start': ['07:00', '07:30', '08:00'],
+        'Preparation End': ['07:20', '07:50', '08:20'],
+        'Loading Start': ['07:30', '08:00', '08:30'],
+        'Loading End': ['07:50', '08:20', '08:50'],
+        'Status Preparation': ['Finished', 'Finished', 'On Process'],
+        'Status Loading': ['Finished', 'Delay', ''],
+    })
+
+    def fetch(known_version):
+        df = cleaning.normalize_shipments(cleaning.clean_data(raw.copy()))
+        df.index = diffing.row_keys(df)
+        return cleaning.compact_snapshot(df), None
+
+    store = SnapshotStore(fetch=fetch)
+    store.refresh()
+    app = create_app(store=store, poller=SnapshotPoller(store, interval_seconds=3600))
+    return app.test_client()
+
+
+def test_snapshot_terminal_filter_with_blank_terminal_cell():
+    client = _client()
+
+    response = client.get('/api/snapshot?terminal=1')
+
+    assert response.status_code == 200
+    assert len(response.get_json()['rows']) == 1
+
+
+def test_snapshot_filter_value_not_in_snapshot_is_empty():
+    client = _client()
+
+    for query in ('terminal=9', 'ship_no=1001&terminal=9', 'site=north'):
+        response = client.get(f'/api/snapshot?{query}')
+
+        assert response.status_code == 200
+        assert response.get_json()['rows'] == []
@@ -0,0 +1,34 @@
+# tests/test_cleaning.py
+import pandas as pd
+
+from data_processing import cleaning
+
+
+def test_normalize_shipments_with_unparseable_time_column():
+    df = pd.DataFrame({
+        'Loading Start': ['-', 'TBD', '', None],
+        'Loading End': ['16:25', '-', None, '09:20:00 AM'],
+    })
+
+    normalized = cleaning.normalize_shipments(df)
+
+    assert normalized['Loading Start'].dtype == 'timedelta64[ns]'
+    assert normalized['Loading Start'].isna().all()
+    assert list(normalized[cleaning.display_column('Loading Start')]) == ['-', '-', '-', '-']
+    assert list(normalized[cleaning.display_column('Loading End')]) == ['16:25', '-', '-', '09:20']
+
+
+def test_frame_memory_bytes_of_compacted_frame_with_object_column():
+    # Mostly distinct times stay an object column, which compacting makes read-only
+    times = [f"{hour:02d}:{minute:02d}" for hour in range(10) for minute in range(10)]
+    df = pd.DataFrame({
+        'Ship no.': range(len(times)),
+        'Dock Code': ['D1', 'D2'] * (len(times) // 2),
+        cleaning.display_column('Loading Start'): times,
+    })
+
+    compact = cleaning.compact_snapshot(df)
+
+    assert compact[cleaning.display_column('Loading Start')].dtype == object
+    assert not compact[cleaning.display_column('Loading Start')].to_numpy().flags.writeable
+    assert cleaning.frame_memory_bytes(compact) >= len(times) * len(times[0])
@@ -0,0 +1,121 @@
+# tests/test_rollups.py
+import pandas as pd
+
+from data_processing import rollups, sites
+from data_processing.snapshot import SnapshotStore, prepare_frame
+
+
+def _frame(rows):
+    """Prepared snapshot rows from (day, ship no., loading status) triples."""
+    raw = pd.DataFrame([
+        {
+            'Completion time': pd.Timestamp('2025-06-01 10:00') + pd.Timedelta(days=day),
+            'Ter.': 1 + ship % 2,
+            'Ship no.': ship,
+            'Dock Code': 'D1',
+            'Truck Route': f"R-{ship % 3}",
+            'Preparation Start': '07:00',
+            'Preparation End': '07:30',
+            'Loading Start': '23:40',
+            'Loading End': '00:10',
+            'Status Preparation': 'Finished',
+            'Status Loading': status,
+        }
+        for day, ship, status in rows
+    ])
+    return prepare_frame(raw)
+
+
+def _rows(days, ships_per_day=4, first_ship=0, status='Finished'):
+    return [(day, first_ship + day * ships_per_day + n, status) for day in days for n in range(ships_per_day)]
+
+
+def _merged(**site_rows):
+    return sites.merge_site_frames([(site, _frame(rows)) for site, rows in site_rows.items()])
+
+
+class _Source:
+    """A snapshot store whose fetch returns whatever frame is set."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.store = SnapshotStore(fetch=lambda known_version: (self.frame, None))
+
+    def publish(self, frame):
+        self.frame = frame
+        return self.store.refresh()
+
+
+def _assert_history_is(history, frame):
+    # The history must equal the rollups recomputed from every row it should hold
+    expected = rollups.aggregate(rollups.row_facts(frame)).groupby(rollups.GROUP_COLUMNS)[rollups.MEASURE_COLUMNS]
+    pd.testing.assert_frame_equal(
+        history.kpis(by=rollups.GROUP_COLUMNS).sort_index(),
+        rollups.kpi_frame(expected.sum()).sort_index(),
+        check_dtype=False,
+        check_index_type=False,
+    )
+
+
+def test_delta_updates_match_a_full_recompute(tmp_path):
+    history = rollups.RollupStore(str(tmp_path))
+    v1 = _rows(range(4))
+    source = _Source(_frame(v1))
+    history.apply(source.store.refresh())
+    _assert_history_is(history, _frame(v1))
+
+    # Updated statuses, a deleted row and an inserted one
+    v2 = [(day, ship, 'Delay' if ship % 5 == 0 else status) for day, ship, status in v1 if ship != 9]
+    v2.append((3, 100, 'On Process'))
+    history.apply(source.publish(_frame(v2)))
+    _assert_history_is(history, _frame(v2))
+
+    # Day 0 is trimmed from the workbook and day 4 starts
+    v3 = [row for row in v2 if row[0] > 0] + _rows([4])
+    history.apply(source.publish(_frame(v3)))
+    _assert_history_is(history, _frame([row for row in v2 if row[0] == 0] + v3))
+    assert history.incremental_updates == 2
+
+    # After a restart the history is reconciled with the snapshot and still complete
+    restarted = rollups.RollupStore(str(tmp_path))
+    restarted.apply(source.store.current())
+    _assert_history_is(restarted, _frame([row for row in v2 if row[0] == 0] + v3))
+    assert restarted.full_reconciles == 1
+
+
+def test_site_trimming_its_days_keeps_their_history(tmp_path):
+    history = rollups.RollupStore(str(tmp_path))
+    a_rows, b_rows = _rows(range(4)), _rows(range(4), first_ship=1000)
+    source = _Source(_merged(A=a_rows, B=b_rows))
+    history.apply(source.store.refresh())
+
+    # Site B still covers days 0 and 1, which site A trimmed
+    history.apply(source.publish(_merged(A=[row for row in a_rows if row[0] >= 2], B=b_rows)))
+
+    assert history.incremental_updates == 1
+    _assert_history_is(history, _merged(A=a_rows, B=b_rows))
+
+
+def test_site_missing_after_a_restart_keeps_its_history(tmp_path):
+    a_rows, b_rows = _rows(range(4)), _rows(range(4), first_ship=1000)
+    history = rollups.RollupStore(str(tmp_path))
+    history.apply(_Source(_merged(A=a_rows, B=b_rows)).store.refresh())
+
+    # After a restart, site B failed and site A changed
+    a_changed = [(day, ship, 'Delay') for day, ship, _ in a_rows]
+    restarted = rollups.RollupStore(str(tmp_path))
+    restarted.apply(_Source(_merged(A=a_changed)).store.refresh())
+
+    _assert_history_is(restarted, _merged(A=a_changed, B=b_rows))
+    by_site = restarted.kpis(by=('site',))['Shipments'].to_dict()
+    assert by_site == {'A': len(a_rows), 'B': len(b_rows)}
+
+
+def test_kpis_for_a_date_range(tmp_path):
+    history = rollups.RollupStore(str(tmp_path))
+    history.apply(_Source(_frame(_rows(range(10)))).store.refresh())
+
+    kpis = history.kpis(start_date=pd.Timestamp('2025-06-03').date(), end_date=pd.Timestamp('2025-06-05').date(), by=())
+
+    assert kpis['Shipments'].tolist() == [12]
+    assert history.kpis(start_date=pd.Timestamp('2026-01-01').date(), by=('day',)).empty
@@ -0,0 +1,148 @@
+# tests/test_sites.py
+import concurrent.futures
+import datetime
+import io
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from data_processing import sites
+from data_processing.snapshot import SnapshotStore, prepare_frame
+from data_processing.sources import SITE_COLUMN, Source
+from onedrive_api.files import FileVersion
+
+SOURCES = [Source('A', 'user', '/A.xlsx'), Source('B', 'user', '/B.xlsx')]
+
+
+def _raw(ships, status='Finished'):
+    return pd.DataFrame({
+        'Completion time': ['2025-06-30 10:00'] * len(ships),
+        'Ter.': [1] * len(ships),
+        'Ship no.': ships,
+        'Dock Code': ['D1'] * len(ships),
+        'Truck Route': ['R-1'] * len(ships),
+        'Status Loading': [status] * len(ships),
+    })
+
+
+class _Workbooks:
+    """Stands in for the loader: each site returns its current workbook, fails, or waits at a gate."""
+
+    def __init__(self):
+        self.workbooks = {'A': (_raw([1, 2, 3]), 'a1'), 'B': (_raw([11, 12]), 'b1')}
+        self.errors = {}
+        self.gates = {}
+        self.downloads = []
+
+    def load(self, known_version, source, parse):
+        gate = self.gates.get(source.site)
+        if gate is not None:
+            gate.wait(10)
+        if source.site in self.errors:
+            raise self.errors[source.site]
+        raw, ctag = self.workbooks[source.site]
+        if known_version is not None and known_version.ctag == ctag:
+            return None, known_version
+        self.downloads.append(source.site)
+        return raw.copy(), FileVersion(etag=ctag, ctag=ctag, last_modified=None, size=None)
+
+
+def _fetcher(workbooks, timeout_seconds=5):
+    return sites.SiteFetcher(SOURCES, prepare_frame, parse_processes=0, timeout_seconds=timeout_seconds,
+                             load=workbooks.load)
+
+
+def _ships(frame, site):
+    return sorted(frame.loc[frame[SITE_COLUMN] == site, 'Ship no.'].astype(int))
+
+
+def test_failing_site_keeps_its_rows():
+    workbooks = _Workbooks()
+    fetcher = _fetcher(workbooks)
+    _, versions = fetcher.fetch()
+
+    workbooks.workbooks['A'] = (_raw([1, 2, 3, 4]), 'a2')
+    workbooks.errors['B'] = RuntimeError('Graph is down')
+    merged, versions = fetcher.fetch(versions)
+
+    assert _ships(merged, 'A') == [1, 2, 3, 4]
+    assert _ships(merged, 'B') == [11, 12]
+    assert [status['error'] for status in fetcher.site_status()] == [None, 'Graph is down']
+
+
+def test_slow_site_keeps_its_rows_and_joins_a_later_refresh():
+    workbooks = _Workbooks()
+    fetcher = _fetcher(workbooks, timeout_seconds=0.2)
+    _, versions = fetcher.fetch()
+
+    workbooks.workbooks['A'] = (_raw([1, 2, 3, 4]), 'a2')
+    workbooks.workbooks['B'] = (_raw([11, 12, 13]), 'b2')
+    workbooks.gates['B'] = threading.Event()
+    merged, versions = fetcher.fetch(versions)
+
+    assert _ships(merged, 'A') == [1, 2, 3, 4]
+    assert _ships(merged, 'B') == [11, 12]
+    assert fetcher.gauges()['sites_loading'] == 1
+
+    workbooks.gates['B'].set()
+    fetcher.timeout_seconds = 5
+    merged, versions = fetcher.fetch(versions)
+
+    assert _ships(merged, 'B') == [11, 12, 13]
+
+
+def test_restored_rows_kept_when_a_site_is_down_at_startup():
+    # The snapshot the previous server process saved, before this restart
+    previous = _Workbooks()
+    _, saved_versions = _fetcher(previous).fetch()
+    saved = sites.merge_site_frames([
+        ('A', prepare_frame(previous.workbooks['A'][0])), ('B', prepare_frame(previous.workbooks['B'][0])),
+    ])
+
+    workbooks = _Workbooks()
+    workbooks.errors['B'] = RuntimeError('Graph is down')
+    fetcher = _fetcher(workbooks)
+    store = SnapshotStore(fetch=fetcher.fetch)
+    restored = store.restore(saved, saved_versions, datetime.datetime.now())
+    fetcher.restore(restored.data, restored.source_version, restored.loaded_at)
+
+    # Site A is unchanged: the restored snapshot is confirmed without any download
+    snapshot = store.refresh()
+    assert snapshot.version == 1 and not snapshot.restored
+    assert workbooks.downloads == []
+
+    workbooks.workbooks['A'] = (_raw([1, 2, 3, 4]), 'a2')
+    snapshot = store.refresh()
+
+    assert _ships(snapshot.data, 'A') == [1, 2, 3, 4]
+    assert _ships(snapshot.data, 'B') == [11, 12]
+    assert list(snapshot.delta.inserted) == ['A|4|R-1|D1#0']
+
+
+class _BrokenPool:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, *args):
+        future = concurrent.futures.Future()
+        future.set_exception(BrokenProcessPool('worker killed'))
+        return future
+
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+def test_parse_falls_back_to_this_process_when_the_pool_breaks():
+    content = io.BytesIO()
+    _raw([1, 2]).to_excel(content, index=False)
+    content.seek(0)
+    fetcher = sites.SiteFetcher(SOURCES, prepare_frame, parse_processes=1)
+    broken = fetcher._parse_pool = _BrokenPool()
+
+    df = fetcher._parse(content)
+
+    assert df['Ship no.'].tolist() == [1, 2]
+    assert broken.shut_down
+    assert fetcher._parse_pool is None
+    fetcher.close()